@@ -1,13 +1,64 @@
+import os
+import json
+import time
+import asyncio
 import logging
-from fastapi import FastAPI
+from os.path import join
+from email.utils import parsedate_to_datetime
+from contextlib import asynccontextmanager, nullcontext
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    PlainTextResponse,
+    StreamingResponse,
+)
 from pydantic import BaseModel
+from starlette.routing import Match
 import uvicorn
 
-from llm.gemini import GeminiClient
+from mir.metrics import REGISTRY, tracing
+from mir.transcode import FORMATS, TranscodeCache
+from llm.intent import OPEN, QueryIntent
+from llm.concurrency import OverloadedError
+from llm.response_cache import ResponseCache
+
+if TYPE_CHECKING:
+    # LangChain, FAISS and the Google clients load in the background after startup
+    from llm.gemini import GeminiClient
+    from llm.segments import SegmentIndex
 
 logger = logging.getLogger(__name__)
 
+MEDIA_TYPES = {".wav": "audio/wav", ".flac": "audio/flac", ".ogg": "audio/ogg"}
+# Tracks only change when the catalogue is rebuilt, and the ETag catches that
+TRACK_CACHE_CONTROL = "public, max-age=3600"
+# A few seconds of uncompressed stereo is well under this
+MAX_CLIP_BYTES = 8 * 2**20
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "mairio_request_seconds", "HTTP request latency", labels=("route",)
+)
+REQUESTS = REGISTRY.counter(
+    "mairio_requests_total", "HTTP requests served", labels=("route", "status")
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "mairio_requests_in_flight", "HTTP requests being served", labels=("route",)
+)
+# Sampled from the client and cache when /metrics is scraped
+QUERY_SLOTS = REGISTRY.gauge(
+    "mairio_query_slots", "Queries holding or waiting for a slot", labels=("state",)
+)
+CACHE_ENTRIES = REGISTRY.gauge(
+    "mairio_response_cache_entries", "Answers held by the response cache"
+)
+CACHE_HIT_RATIO = REGISTRY.gauge(
+    "mairio_response_cache_hit_ratio", "Share of open queries served from cache"
+)
+
 
 class QueryRequest(BaseModel):
     query: str
@@ -15,17 +66,47 @@ class QueryRequest(BaseModel):
 
 class GeminiApp:
     def __init__(
-        self, api_key: str, audio_metadata_path: str, model: str = "gemini-2.0-flash"
+        self,
+        api_key: str,
+        audio_metadata_path: str,
+        model: str = "gemini-2.0-flash",
+        cache_threshold: float = 0.95,
+        cache_ttl: float = 3600.0,
+        cache_size: int = 512,
+        client_options: Optional[dict] = None,
+        trace_requests: bool = False,
+        music_dir: str = r"data\music",
+        transcode_dir: str = r"data\cache\transcodes",
+        transcode_max_bytes: int = 512 * 2**20,
     ):
-        logger.info("Initializing GeminiClient.")
-        self.client = GeminiClient(
-            api_key=api_key, audio_metadata_path=audio_metadata_path, model=model
+        self.api_key = api_key
+        self.audio_metadata_path = audio_metadata_path
+        self.model = model
+        # Extra GeminiClient arguments, e.g. stub models for benchmarks
+        self.client_options = client_options or {}
+        # Logs every stage timing of each request, which is too noisy to leave on
+        self.trace_requests = trace_requests
+        self.music_dir = music_dir
+        # Compressed copies for /tracks/{name}?format=..., encoded on first request
+        self.transcodes = TranscodeCache(
+            directory=transcode_dir, max_bytes=transcode_max_bytes
+        )
+        # Built by _load_client once the server is already accepting connections
+        self._client: Optional["GeminiClient"] = None
+        self.startup = {"stage": "waiting", "ready": False, "error": None}
+        self._started = time.perf_counter()
+        # Validated against the hash of the client's metadata file on every lookup
+        self.response_cache = ResponseCache(
+            threshold=cache_threshold, ttl=cache_ttl, max_entries=cache_size
         )
         logger.info("Initializing MAIR.IO API/App")
         self.app = FastAPI(
-            title="MAIR.IO API", summary="Endpoint for MAIR.IO's backend"
+            title="MAIR.IO API",
+            summary="Endpoint for MAIR.IO's backend",
+            lifespan=self._lifespan,
         )
         self._configure_cors()
+        self.app.middleware("http")(self._observe_request)
         self._setup_routes()
 
     def _configure_cors(self):
@@ -37,13 +118,329 @@ class GeminiApp:
             allow_headers=["*"],  # Allows all headers
         )
 
+    async def _observe_request(
+        self, request: Request, call_next: Callable[[Request], Awaitable[Response]]
+    ) -> Response:
+        route = self._route_template(request)
+        status = "500"
+        # Streaming responses are timed until their headers are sent
+        trace = (
+            tracing(report=lambda stages: self._log_trace(request, stages))
+            if self.trace_requests
+            else nullcontext()
+        )
+        start = time.perf_counter()
+        with IN_FLIGHT.track(route=route), trace:
+            try:
+                response = await call_next(request)
+                status = str(response.status_code)
+                return response
+            finally:
+                REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+                REQUESTS.inc(route=route, status=status)
+
+    def _route_template(self, request: Request) -> str:
+        # Labelling by template keeps /similar/{name} to a single series
+        for route in self.app.routes:
+            match, _ = route.matches(request.scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    @staticmethod
+    def _log_trace(request: Request, stages: list[tuple[str, float]]) -> None:
+        # Health checks and static lookups time no stages and would only add noise
+        if not stages:
+            return
+        timings = ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages
+        )
+        logger.info(f"Trace {request.method} {request.url.path}: {timings}")
+
+    @property
+    def client(self) -> "GeminiClient":
+        if self._client is None:
+            raise HTTPException(
+                status_code=503, detail=f"Not ready: {self.startup['stage']}"
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI) -> AsyncIterator[None]:
+        loader = asyncio.create_task(self._load_client())
+        yield
+        loader.cancel()
+
+    async def _load_client(self) -> None:
+        try:
+            # The import and index loading block, so they run on a worker thread
+            self._client = await asyncio.to_thread(self._create_client)
+            self._set_stage("warming up")
+            await self._client.warm_up()
+        except Exception as e:
+            logger.exception("GeminiClient failed to load")
+            self.startup["error"] = f"{type(e).__name__}: {e}"
+            self._set_stage("failed")
+            return
+        self.startup["ready"] = True
+        self._set_stage("ready")
+
+    def _create_client(self) -> "GeminiClient":
+        self._set_stage("importing")
+        from llm.gemini import GeminiClient
+
+        logger.info("Initializing GeminiClient.")
+        return GeminiClient(
+            api_key=self.api_key,
+            audio_metadata_path=self.audio_metadata_path,
+            model=self.model,
+            on_progress=self._set_stage,
+            **self.client_options,
+        )
+
+    def _set_stage(self, stage: str) -> None:
+        self.startup["stage"] = stage
+        self.startup["elapsed_seconds"] = round(time.perf_counter() - self._started, 3)
+        logger.info(f"Startup: {stage} ({self.startup['elapsed_seconds']}s)")
+
     def _setup_routes(self) -> None:
         # self.app.get("/")(self.hello)
+        self.app.get("/healthz")(self.healthz)
+        self.app.get("/readyz")(self.readyz)
         self.app.post("/chat")(self.chat_query)
+        self.app.post("/chat/stream")(self.chat_stream)
+        self.app.get("/chat/cache")(self.cache_stats)
+        self.app.get("/similar/{name}")(self.similar_tracks)
+        self.app.get("/similar/{name}/segments")(self.similar_segments)
+        self.app.get("/tracks/{name}/segments")(self.track_segments)
+        self.app.post("/identify")(self.identify_clip)
+        self.app.get("/metrics")(self.metrics)
+        self.app.api_route("/tracks/{name}", methods=["GET", "HEAD"])(self.track_file)
+
+    async def healthz(self) -> dict:
+        return {"status": "ok"}
+
+    async def readyz(self) -> JSONResponse:
+        return JSONResponse(
+            content=self.startup, status_code=200 if self.startup["ready"] else 503
+        )
 
     async def chat_query(self, request: QueryRequest) -> dict:
-        result = await self.client.invoke(request.query)
-        return {"response": result["response"], "context": result["context"]}
+        # Classified once here; the graph reuses the intent instead of routing again
+        intent = self.client.router.classify(request.query)
+        # Deterministic lookups are answered faster than a cache lookup
+        if intent.intent != OPEN:
+            result = await self._invoke(request.query, intent=intent)
+            return {"response": result["response"], "context": result["context"]}
+
+        cached, vector = await self._cached_response(request.query)
+        if cached is not None:
+            return cached
+
+        start = time.perf_counter()
+        result = await self._invoke(request.query, intent=intent)
+        response = {"response": result["response"], "context": result["context"]}
+        self.response_cache.put(
+            query=request.query,
+            result=response,
+            latency=time.perf_counter() - start,
+            vector=vector,
+        )
+        return response
+
+    async def chat_stream(self, request: QueryRequest) -> StreamingResponse:
+        """Server-sent events: one `context` event, `token` events, then `done`."""
+        # Raises 503 while loading, before any bytes of the stream are sent
+        client = self.client
+        return StreamingResponse(
+            self._stream_events(client, request.query), media_type="text/event-stream"
+        )
+
+    async def _stream_events(
+        self, client: "GeminiClient", query: str
+    ) -> AsyncIterator[str]:
+        intent = client.router.classify(query)
+        routed = intent.intent != OPEN
+        cached, vector = (None, None) if routed else await self._cached_response(query)
+        if cached is not None:
+            yield self._event("context", cached["context"])
+            yield self._event("token", cached["response"])
+            yield self._event("done", None)
+            return
+
+        start = time.perf_counter()
+        context, tokens = [], []
+        try:
+            async for kind, data in client.stream(query, intent=intent):
+                if kind == "context":
+                    context = data
+                else:
+                    tokens.append(data)
+                yield self._event(kind, data)
+        except (OverloadedError, TimeoutError) as e:
+            # Headers are already sent, so the failure is reported in-band
+            logger.warning(f"Stream for {query!r} failed: {e}")
+            yield self._event("error", str(e))
+            return
+        yield self._event("done", None)
+        if not routed:
+            self.response_cache.put(
+                query=query,
+                result={"response": "".join(tokens), "context": context},
+                latency=time.perf_counter() - start,
+                vector=vector,
+            )
+
+    async def _invoke(self, query: str, intent: Optional[QueryIntent] = None) -> dict:
+        try:
+            return await self.client.invoke(query, intent=intent)
+        except OverloadedError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except TimeoutError:
+            raise HTTPException(status_code=504, detail="Query timed out")
+
+    async def _cached_response(
+        self, query: str
+    ) -> tuple[Optional[dict], Optional[list[float]]]:
+        self.response_cache.validate(version=self.client.metadata_version)
+        cached = self.response_cache.get_exact(query)
+        vector = None
+        if cached is None:
+            # Served from the embedding cache again when the query is retrieved
+            vector = await self.client.embeddings.aembed_query(query)
+            cached = self.response_cache.get_similar(vector)
+        return cached, vector
+
+    @staticmethod
+    def _event(kind: str, data) -> str:
+        return f"event: {kind}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+    async def cache_stats(self) -> dict:
+        return self.response_cache.summary()
+
+    async def similar_tracks(self, name: str, k: int = 5) -> dict:
+        if name not in self.client.acoustic_index:
+            raise HTTPException(status_code=404, detail=f"Unknown track {name}")
+        return {"name": name, "similar": self.client.similar_tracks(name=name, k=k)}
+
+    async def track_file(
+        self, name: str, request: Request, format: Optional[str] = None
+    ) -> Response:
+        """Streams a track's audio, honouring Range and conditional requests.
+
+        `format=flac` or `format=ogg` serves a compressed copy instead of the WAV.
+        """
+        source = join(self.music_dir, name)
+        # Only plain file names, so requests can't reach outside the music directory
+        if os.path.basename(name) != name or not os.path.isfile(source):
+            raise HTTPException(status_code=404, detail=f"Unknown track {name}")
+        if format is None or format == "wav":
+            path = source
+        elif format in FORMATS:
+            path = await asyncio.to_thread(self.transcodes.path, source, format)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported format {format}, expected wav or one of "
+                f"{', '.join(FORMATS)}",
+            )
+
+        extension = os.path.splitext(path)[1]
+        # FileResponse answers Range and If-Range requests itself
+        response = FileResponse(
+            path,
+            stat_result=os.stat(path),
+            media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+            filename=os.path.splitext(name)[0] + extension,
+            content_disposition_type="inline",
+            headers={"Cache-Control": TRACK_CACHE_CONTROL},
+        )
+        if self._not_modified(request=request, response=response):
+            return Response(
+                status_code=304,
+                headers={
+                    key: response.headers[key]
+                    for key in ("etag", "last-modified", "cache-control")
+                },
+            )
+        return response
+
+    @staticmethod
+    def _not_modified(request: Request, response: Response) -> bool:
+        if if_none_match := request.headers.get("if-none-match"):
+            # Weak comparison, as for GET; If-Modified-Since is ignored alongside it
+            etag = response.headers["etag"].removeprefix("W/")
+            return any(
+                tag.strip().removeprefix("W/") in (etag, "*")
+                for tag in if_none_match.split(",")
+            )
+        if if_modified_since := request.headers.get("if-modified-since"):
+            try:
+                return parsedate_to_datetime(
+                    response.headers["last-modified"]
+                ) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def metrics(self) -> PlainTextResponse:
+        """Prometheus text exposition of request, stage and cache metrics."""
+        if self._client is not None:
+            QUERY_SLOTS.set(self._client.limiter.active, state="active")
+            QUERY_SLOTS.set(self._client.limiter.waiting, state="waiting")
+        CACHE_ENTRIES.set(len(self.response_cache))
+        CACHE_HIT_RATIO.set(self.response_cache.hit_ratio)
+        return PlainTextResponse(
+            REGISTRY.render(), media_type="text/plain; version=0.0.4"
+        )
+
+    async def similar_segments(
+        self, name: str, at: float = 0.0, k: int = 5, other_tracks: bool = False
+    ) -> dict:
+        """Passages, in any track, that sound like `name` at `at` seconds."""
+        store = self._segment_index(name).store
+        return {
+            "name": name,
+            "segment": store.segment(store.row_at(name=name, seconds=at)),
+            "similar": self.client.similar_segments(
+                name=name, seconds=at, k=k, other_tracks=other_tracks
+            ),
+        }
+
+    async def track_segments(self, name: str) -> dict:
+        """Per-segment energy and local key of a track, in time order."""
+        return {
+            "name": name,
+            "segments": self._segment_index(name).store.timeline(name),
+        }
+
+    def _segment_index(self, name: str) -> "SegmentIndex":
+        if self.client.segment_index is None:
+            raise HTTPException(status_code=404, detail="Segment index not built")
+        if name not in self.client.segment_index:
+            raise HTTPException(status_code=404, detail=f"Unknown track {name}")
+        return self.client.segment_index
+
+    async def identify_clip(self, request: Request) -> dict:
+        """Names the track a short recording (WAV, FLAC or OGG body) comes from."""
+        if self.client.fingerprint_index is None:
+            raise HTTPException(status_code=404, detail="Fingerprint index not built")
+        # Read as a raw body, so the route needs no multipart parser
+        audio = bytearray()
+        async for chunk in request.stream():
+            audio.extend(chunk)
+            if len(audio) > MAX_CLIP_BYTES:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Clips are limited to {MAX_CLIP_BYTES} bytes",
+                )
+        if not audio:
+            raise HTTPException(status_code=400, detail="Empty request body")
+        try:
+            match = await asyncio.to_thread(self.client.identify_clip, bytes(audio))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"match": match}
 
     async def hello(self) -> dict:
         return {"message": "Hello World"}
@@ -0,0 +1,79 @@
+"""Cost of adding tracks to a classified catalogue, incrementally versus rebuilt.
+
+Builds an AudioClassifier over a catalogue of random mood features, then times
+adding a small batch of new tracks with `add`, against classifying the grown
+catalogue from scratch, which is what every change used to cost. Also reports
+how many existing moods each batch relabelled.
+
+Usage:
+    python -m benchmarks.classify --scale 1000 10000 100000 --batch 10
+"""
+
+import json
+import argparse
+import logging
+import numpy as np
+from mir.classify import MOOD_FEATURES, AudioClassifier
+from benchmarks.timing import measure
+
+logger = logging.getLogger(__name__)
+
+
+def random_tracks(count: int, rng, prefix: str) -> dict:
+    features = rng.normal(size=(count, len(MOOD_FEATURES)))
+    return {
+        f"{prefix}_{i}.wav": dict(zip(MOOD_FEATURES, row.tolist()))
+        for i, row in enumerate(features)
+    }
+
+
+def run(
+    scales: list[int], batch: int = 10, repeats: int = 5, seed: int = 0
+) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for scale in scales:
+        catalogue = random_tracks(scale, rng, prefix="Theme")
+        classifier = AudioClassifier(audio_metadata=catalogue)
+        batches = iter(
+            [random_tracks(batch, rng, prefix=f"Effect_{i}") for i in range(repeats)]
+        )
+        relabelled = []
+        incremental = measure(
+            lambda: relabelled.append(len(classifier.add(next(batches)))),
+            repeats=repeats,
+        )
+        grown = {**catalogue, **random_tracks(batch, rng, prefix="Effect")}
+        rebuild = measure(
+            lambda: AudioClassifier(audio_metadata=grown), repeats=repeats
+        )
+        for mode, timings in (("incremental", incremental), ("rebuild", rebuild)):
+            results.append(
+                {
+                    "benchmark": f"classify.{mode}",
+                    "tracks": scale,
+                    "batch": batch,
+                    **timings,
+                }
+            )
+        results[-2]["relabelled_per_batch"] = round(float(np.mean(relabelled)), 2)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(
+        json.dumps(
+            run(scales=args.scale, batch=args.batch, repeats=args.repeats), indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Prompt size with the raw JSON context versus the projected context.
+
+Builds the same prompts twice, once with `context_fields=None` (every record as
+raw JSON, every schema field described) and once with the default projection,
+for a top-k retrieval and for a filter that selects the whole catalogue. Tokens
+are counted with tiktoken's cl100k_base as an offline proxy for Gemini's
+tokenizer, or estimated at four characters per token when tiktoken or its
+encoding file (downloaded on first use) is unavailable.
+
+Usage:
+    python -m benchmarks.context --k 4
+"""
+
+import os
+import json
+import argparse
+import logging
+import tempfile
+from llm.context import CONTEXT_FIELDS
+from llm.gemini import GeminiClient
+from llm.providers import STUB
+from benchmarks.timing import measure
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+QUERY = "Which track sounds the most menacing, and why?"
+
+
+def load_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, encoding) -> int:
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text))
+
+
+def run(metadata_path: str, k: int = 4, repeats: int = 20) -> list[dict]:
+    results = []
+    encoding = load_encoding()
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, fields in (("raw", None), ("projected", CONTEXT_FIELDS)):
+            client = GeminiClient(
+                api_key="",
+                audio_metadata_path=metadata_path,
+                index_dir=os.path.join(workdir, "index"),
+                embedding_cache_path=os.path.join(workdir, "embeddings.sqlite"),
+                provider=STUB,
+                context_fields=fields,
+            )
+            scenarios = {
+                f"top_{k}": client.vector_store.similarity_search(QUERY, k=k),
+                "catalogue": client.documents,
+            }
+            for scenario, documents in scenarios.items():
+                prompt = client.format_prompt(QUERY, documents).to_string()
+                results.append(
+                    {
+                        "benchmark": f"context.{scenario}",
+                        "context": label,
+                        "documents": len(documents),
+                        "characters": len(prompt),
+                        "tokens": count_tokens(prompt, encoding=encoding),
+                        "tokenizer": encoding.name if encoding else "chars/4",
+                        **measure(
+                            lambda: client.format_prompt(QUERY, documents),
+                            repeats=repeats,
+                        ),
+                    }
+                )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--metadata", default=os.path.join("data", "metadata", "audio_metadata.json")
+    )
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    print(json.dumps(run(metadata_path=args.metadata, k=args.k, repeats=args.repeats)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Wall-clock scaling of AudioProcessor feature extraction with worker count.
+
+Usage:
+    python -m benchmarks.extraction --music-dir data/music --workers 1 2 4 8
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+from mir.process import AudioProcessor, extract_features
+
+logger = logging.getLogger(__name__)
+
+
+def run(music_dir: str, worker_counts: list[int], limit: int = 0) -> list[dict]:
+    audio_files = sorted(
+        file for file in os.listdir(music_dir) if file.lower().endswith(".wav")
+    )
+    if limit:
+        audio_files = audio_files[:limit]
+
+    # librosa JIT-compiles on first use; keep that out of the first timing.
+    # Forked workers inherit the warmed-up state from this process.
+    extract_features(file=audio_files[0], music_dir=music_dir)
+
+    results = []
+    baseline = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        processor = AudioProcessor(
+            audio_files=audio_files, workers=workers, music_dir=music_dir
+        )
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        results.append(
+            {
+                "workers": workers,
+                "files": len(audio_files),
+                "failed": len(processor.failed_files),
+                "seconds": round(elapsed, 3),
+                "speedup": round(baseline / elapsed, 2),
+            }
+        )
+        logger.info(f"{workers} worker(s): {elapsed:.2f}s")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--music-dir", default=os.path.join("data", "music"))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--limit", type=int, default=0, help="Only use N files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    results = run(
+        music_dir=args.music_dir, worker_counts=args.workers, limit=args.limit
+    )
+    print(f"{'workers':>8} {'files':>6} {'seconds':>9} {'speedup':>8}")
+    for row in results:
+        print(
+            f"{row['workers']:>8} {row['files']:>6} {row['seconds']:>9} {row['speedup']:>8}"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Cost of each feature family in AudioProcessor._create_metadata.
+
+Families run in dependency order on one FeatureEngine per track, so each timing
+is the incremental cost of that family given the intermediates before it (the
+STFT is charged to "stft", not to whichever feature happens to need it first).
+The full sequential _create_metadata is timed too, for reference.
+
+Usage:
+    python -m benchmarks.features --tracks 8 --seconds 20
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+import tempfile
+import numpy as np
+import librosa
+from mir.features import FeatureEngine
+from mir.key import KeyEstimator
+from mir.process import AudioProcessor, extract_features
+from benchmarks.synthetic import write_corpus
+from benchmarks.timing import summarize
+
+logger = logging.getLogger(__name__)
+
+# (family, step) in the order extract_features needs them
+FAMILIES = [
+    ("stft", lambda engine: engine.stft_magnitude),
+    ("mel", lambda engine: engine.log_mel_spectrogram),
+    ("onset", lambda engine: (engine.onset_envelope, engine.beat_onset_envelope)),
+    ("beat", lambda engine: engine.beat_track()),
+    (
+        "tempogram",
+        lambda engine: librosa.feature.tempogram(
+            onset_envelope=engine.onset_envelope, sr=engine.sampling_rate
+        ),
+    ),
+    (
+        "spectral",
+        lambda engine: (engine.spectral_centroid(), engine.spectral_contrast()),
+    ),
+    ("rms", lambda engine: engine.rms()),
+    ("zero_crossing_rate", lambda engine: engine.zero_crossing_rate()),
+    ("mfcc", lambda engine: engine.mfcc(n_mfcc=13)),
+    ("chroma", lambda engine: engine.chroma(bins_per_octave=24)),
+    ("tonnetz", lambda engine: engine.tonnetz()),
+]
+
+
+def run(music_dir: str, audio_files: list[str]) -> list[dict]:
+    # Filter banks and JIT caches are built once per process
+    extract_features(file=audio_files[0], music_dir=music_dir)
+
+    samples: dict[str, list[float]] = {"decode": []}
+    samples.update({family: [] for family, _ in FAMILIES})
+    chroma_means = []
+    for file in audio_files:
+        start = time.perf_counter()
+        waveform, sampling_rate = librosa.load(path=os.path.join(music_dir, file))
+        samples["decode"].append(time.perf_counter() - start)
+
+        engine = FeatureEngine(waveform=waveform, sampling_rate=sampling_rate)
+        for family, step in FAMILIES:
+            start = time.perf_counter()
+            step(engine)
+            samples[family].append(time.perf_counter() - start)
+        chroma_means.append(np.mean(engine.chroma(bins_per_octave=24), axis=1))
+
+    start = time.perf_counter()
+    KeyEstimator().estimate(np.array(chroma_means))
+    samples["key_estimation_batch"] = [time.perf_counter() - start]
+
+    start = time.perf_counter()
+    AudioProcessor(audio_files=audio_files, workers=1, music_dir=music_dir)
+    samples["create_metadata_total"] = [time.perf_counter() - start]
+
+    return [
+        {"benchmark": f"features.{family}", **summarize(timings)}
+        for family, timings in samples.items()
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with tempfile.TemporaryDirectory() as music_dir:
+        audio_files = write_corpus(
+            directory=music_dir, tracks=args.tracks, seconds=args.seconds
+        )
+        results = run(music_dir=music_dir, audio_files=audio_files)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
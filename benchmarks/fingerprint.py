@@ -0,0 +1,142 @@
+"""Clip identification latency and accuracy under added noise.
+
+Fingerprints every track into a FingerprintIndex, then cuts clips of each
+length at random offsets within the audible part of the track (most effects
+trail off into silence, which no fingerprint can identify), mixes in white
+noise at each signal-to-noise ratio and times `identify` on them. A clip
+counts as correct when it names the track it was cut from; the offset error
+is reported separately, since effects that repeat a phrase can line up
+equally well at more than one offset.
+
+Usage:
+    python -m benchmarks.fingerprint --music-dir data/music --seconds 2 3 5
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+from typing import Optional
+import numpy as np
+from mir.fingerprint import (
+    SAMPLING_RATE,
+    FingerprintIndex,
+    load_audio,
+    reference_fingerprint,
+)
+from benchmarks.timing import measure, summarize
+
+logger = logging.getLogger(__name__)
+
+# None is the clean clip
+SNRS = (None, 10.0, 0.0, -5.0)
+# Frames quieter than this, relative to the loudest, count as silence
+SILENCE_DB = -40.0
+
+
+def audible_end(waveform: np.ndarray, frame: int = 2048) -> int:
+    """Sample index after which the track stays silent."""
+    power = np.convolve(waveform**2, np.ones(frame) / frame, mode="same")
+    audible = np.nonzero(power > power.max() * 10 ** (SILENCE_DB / 10))[0]
+    return int(audible[-1]) + 1 if len(audible) else len(waveform)
+
+
+def add_noise(clip: np.ndarray, snr: Optional[float], rng) -> np.ndarray:
+    if snr is None:
+        return clip
+    power = float(np.mean(clip**2)) or 1e-12
+    noise = rng.standard_normal(len(clip)) * np.sqrt(power / 10 ** (snr / 10))
+    return (clip + noise).astype(np.float32)
+
+
+def run(
+    music_dir: str,
+    audio_files: list[str],
+    clip_seconds: tuple[float, ...] = (2.0, 3.0, 5.0),
+    snrs: tuple[Optional[float], ...] = SNRS,
+    clips: int = 3,
+    seed: int = 0,
+) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    waveforms = {
+        file: load_audio(os.path.join(music_dir, file)) for file in audio_files
+    }
+    fingerprints = {}
+    build = measure(
+        lambda: fingerprints.update(
+            {
+                file: reference_fingerprint(waveform)
+                for file, waveform in waveforms.items()
+            }
+        ),
+        repeats=1,
+    )
+    index = FingerprintIndex.from_fingerprints(fingerprints=fingerprints)
+    results = [
+        {
+            "benchmark": "fingerprint.build",
+            "tracks": len(waveforms),
+            "hashes": len(index),
+            **build,
+        }
+    ]
+    for seconds in clip_seconds:
+        length = int(seconds * SAMPLING_RATE)
+        for snr in snrs:
+            samples, correct, offset_errors = [], 0, []
+            for file, waveform in waveforms.items():
+                end = audible_end(waveform)
+                for _ in range(clips):
+                    # Tracks shorter than the clip are used whole
+                    start = int(rng.integers(0, max(end - length, 0) + 1))
+                    clip = add_noise(waveform[start : start + length], snr, rng)
+                    began = time.perf_counter()
+                    match = index.identify(clip)
+                    samples.append(time.perf_counter() - began)
+                    if match is not None and match.name == file:
+                        correct += 1
+                        offset_errors.append(
+                            abs(match.offset_seconds - start / SAMPLING_RATE)
+                        )
+            results.append(
+                {
+                    "benchmark": "fingerprint.identify",
+                    "clip_seconds": seconds,
+                    "snr_db": snr,
+                    "accuracy": round(correct / len(samples), 3),
+                    "median_offset_error_seconds": round(
+                        float(np.median(offset_errors)), 3
+                    )
+                    if offset_errors
+                    else None,
+                    **summarize(samples),
+                }
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--music-dir", default=os.path.join("data", "music"))
+    parser.add_argument("--seconds", type=float, nargs="+", default=[2.0, 3.0, 5.0])
+    parser.add_argument("--clips", type=int, default=3)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    audio_files = sorted(os.listdir(args.music_dir))
+    print(
+        json.dumps(
+            run(
+                music_dir=args.music_dir,
+                audio_files=audio_files,
+                clip_seconds=tuple(args.seconds),
+                clips=args.clips,
+            ),
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
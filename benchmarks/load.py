@@ -0,0 +1,167 @@
+"""Drives /chat at a fixed request rate and reports throughput and latency.
+
+Requests are sent open-loop: each one leaves at its scheduled time whether or not
+earlier ones have finished, so a slow server shows up as growing latency rather
+than a quietly lowered rate. Queries cycle through `--distinct` phrasings, which
+sets how often the response cache can answer. With `--local`, a GeminiApp on the
+"stub" provider is started in-process so no Gemini quota is used.
+
+Usage:
+    python -m benchmarks.load --local --rps 50 --duration 20 --latency 0.5
+    python -m benchmarks.load --url http://127.0.0.1:8000 --rps 5 --duration 60
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import argparse
+import logging
+import tempfile
+import threading
+from collections import Counter
+from typing import Optional
+import httpx
+import uvicorn
+from app.web import GeminiApp
+from llm.providers import STUB
+from benchmarks.timing import percentile, summarize
+
+logger = logging.getLogger(__name__)
+
+OPEN_QUERY = "Which track sounds the most like a level theme, take {i}?"
+ROUTED_QUERY = "How many tracks are in C Major?"
+
+
+def queries(count: int, distinct: int, routed_share: float) -> list[str]:
+    routed_every = round(1 / routed_share) if routed_share > 0 else 0
+    return [
+        ROUTED_QUERY
+        if routed_every and i % routed_every == 0
+        else OPEN_QUERY.format(i=i % distinct)
+        for i in range(count)
+    ]
+
+
+async def drive(url: str, rps: float, duration: float, **query_options) -> dict:
+    batch = queries(count=max(int(rps * duration), 1), **query_options)
+    latencies: list[float] = []
+    outcomes: Counter = Counter()
+
+    async def send(http: httpx.AsyncClient, query: str, at: float) -> None:
+        await asyncio.sleep(max(at - time.perf_counter(), 0))
+        sent = time.perf_counter()
+        try:
+            response = await http.post("/chat", json={"query": query})
+            outcomes[str(response.status_code)] += 1
+        except httpx.HTTPError as e:
+            outcomes[type(e).__name__] += 1
+            return
+        latencies.append(time.perf_counter() - sent)
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=120) as http:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(send(http, query, at=start + i / rps) for i, query in enumerate(batch))
+        )
+        elapsed = time.perf_counter() - start
+
+    report = {
+        "target_rps": rps,
+        "requests": len(batch),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(outcomes.get("200", 0) / elapsed, 2),
+        "outcomes": dict(outcomes),
+    }
+    if latencies:
+        report["latency"] = {
+            **summarize(latencies),
+            "p99_ms": round(percentile(sorted(latencies), 0.99) * 1e3, 3),
+        }
+    return report
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_locally(
+    metadata_path: str, workdir: str, latency: float, mode: str
+) -> tuple[uvicorn.Server, threading.Thread, str]:
+    """Starts a stub-provider GeminiApp on a background thread, once it is ready."""
+    app = GeminiApp(
+        api_key="",
+        audio_metadata_path=metadata_path,
+        client_options={
+            "provider": STUB,
+            "chat_options": {"latency": latency, "mode": mode},
+            "index_dir": os.path.join(workdir, "index"),
+            "embedding_cache_path": os.path.join(workdir, "embeddings.sqlite"),
+        },
+    )
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(app.app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not app.startup["ready"]:
+        if app.startup["stage"] == "failed":
+            raise RuntimeError(app.startup["error"])
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--distinct", type=int, default=1000)
+    parser.add_argument("--routed-share", type=float, default=0.0)
+    parser.add_argument(
+        "--local", action="store_true", help="Serve a stub-provider app in-process"
+    )
+    parser.add_argument(
+        "--metadata", default=os.path.join("data", "metadata", "audio_metadata.json")
+    )
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--mode", choices=["canned", "echo"], default="canned")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    server: Optional[uvicorn.Server] = None
+    thread: Optional[threading.Thread] = None
+    with tempfile.TemporaryDirectory() as workdir:
+        url = args.url
+        if args.local:
+            server, thread, url = serve_locally(
+                metadata_path=args.metadata,
+                workdir=workdir,
+                latency=args.latency,
+                mode=args.mode,
+            )
+        try:
+            report = asyncio.run(
+                drive(
+                    url=url,
+                    rps=args.rps,
+                    duration=args.duration,
+                    distinct=args.distinct,
+                    routed_share=args.routed_share,
+                )
+            )
+        finally:
+            if server is not None:
+                # The index and embedding cache live in workdir, so wait for shutdown
+                server.should_exit = True
+                thread.join(timeout=10)
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
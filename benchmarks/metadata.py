@@ -0,0 +1,130 @@
+"""Building, writing and reading the metadata collection, per track versus batched.
+
+Replicates the bundled metadata up to each scale, then times the old per-track
+path (one AudioMetadata per track, model_dump and an indented json.dump, stdlib
+json.load and model_validate_json) against the batched one (a TypeAdapter over
+the whole collection, compact pydantic-core JSON, and single-pass validate_json).
+Loads also time model_construct over the parsed records, as a trusted path that
+skips validation would, and a lazy open that validates one track on access.
+
+Usage:
+    python -m benchmarks.metadata --scale 1 100 1000
+"""
+
+import os
+import json
+import argparse
+import logging
+import tempfile
+from pydantic_core import from_json
+from mir.metadata_model import AudioMetadata, AudioMetadataCollection
+from benchmarks.timing import measure
+
+logger = logging.getLogger(__name__)
+
+
+def per_track_validate(records: dict) -> AudioMetadataCollection:
+    return AudioMetadataCollection(
+        root={name: AudioMetadata(**record) for name, record in records.items()}
+    )
+
+
+def per_track_save(collection: AudioMetadataCollection, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(
+            {name: track.model_dump() for name, track in collection.root.items()},
+            f,
+            indent=4,
+        )
+
+
+def per_track_load(path: str) -> AudioMetadataCollection:
+    with open(path, "r") as f:
+        json.load(f)
+        f.seek(0)
+        return AudioMetadataCollection.model_validate_json(f.read())
+
+
+def trusted_load(path: str) -> AudioMetadataCollection:
+    with open(path, "rb") as f:
+        records = from_json(f.read())
+    return AudioMetadataCollection.model_construct(
+        root={
+            name: AudioMetadata.model_construct(**record)
+            for name, record in records.items()
+        }
+    )
+
+
+def lazy_load_one(path: str) -> AudioMetadata:
+    collection = AudioMetadataCollection.open(path)
+    return collection[next(iter(collection))]
+
+
+def run(metadata_path: str, scales: list[int], repeats: int = 5) -> list[dict]:
+    with open(metadata_path, "r") as f:
+        catalogue = json.load(f)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in scales:
+            records = {
+                f"{copy}_{name}": record
+                for copy in range(scale)
+                for name, record in catalogue.items()
+            }
+            collection = AudioMetadataCollection.validate_records(records)
+            old_path = os.path.join(workdir, f"per_track_{scale}.json")
+            new_path = os.path.join(workdir, f"batched_{scale}.json")
+            per_track_save(collection, old_path)
+            collection.save(new_path)
+            timings = {
+                "validate.per_track": lambda: per_track_validate(records),
+                "validate.batched": lambda: AudioMetadataCollection.validate_records(
+                    records
+                ),
+                "save.per_track": lambda: per_track_save(collection, old_path),
+                "save.batched": lambda: collection.save(new_path),
+                "load.per_track": lambda: per_track_load(old_path),
+                "load.batched": lambda: AudioMetadataCollection.load(new_path),
+                "load.trusted_construct": lambda: trusted_load(new_path),
+                "load.lazy_one_track": lambda: lazy_load_one(new_path),
+            }
+            for benchmark, function in timings.items():
+                results.append(
+                    {
+                        "benchmark": f"metadata.{benchmark}",
+                        "tracks": len(records),
+                        **measure(function, repeats=repeats),
+                    }
+                )
+            for path, label in ((old_path, "per_track"), (new_path, "batched")):
+                results.append(
+                    {
+                        "benchmark": f"metadata.file_size.{label}",
+                        "tracks": len(records),
+                        "bytes": os.path.getsize(path),
+                    }
+                )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--metadata", default=os.path.join("data", "metadata", "audio_metadata.json")
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    print(
+        json.dumps(
+            run(metadata_path=args.metadata, scales=args.scale, repeats=args.repeats),
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
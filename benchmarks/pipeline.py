@@ -0,0 +1,89 @@
+"""Cold and warm AudioPipeline construction and metadata validation.
+
+Cold builds the pipeline with no cached metadata, so every track is extracted.
+Warm builds it again once the metadata json and manifest exist, which is the
+path every server start takes. Runs in a scratch working directory, since the
+pipeline's cache paths are relative.
+
+Usage:
+    python -m benchmarks.pipeline --tracks 8 --seconds 20
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+import tempfile
+from mir.pipeline import AudioPipeline
+from benchmarks.synthetic import write_corpus
+from benchmarks.timing import measure, summarize
+
+logger = logging.getLogger(__name__)
+
+
+def run(music_dir: str, audio_files: list[str], repeats: int = 5) -> list[dict]:
+    results = []
+    start = time.perf_counter()
+    pipeline = AudioPipeline(audio_files=audio_files, music_dir=music_dir)
+    pipeline.create_metadata_json()
+    results.append(
+        {
+            "benchmark": "pipeline.cold",
+            "tracks": len(audio_files),
+            **summarize([time.perf_counter() - start]),
+        }
+    )
+
+    results.append(
+        {
+            "benchmark": "pipeline.warm",
+            **measure(
+                lambda: AudioPipeline(audio_files=audio_files, music_dir=music_dir),
+                repeats=repeats,
+            ),
+        }
+    )
+
+    audio_metadata = pipeline.processor.audio_metadata
+    results.append(
+        {
+            "benchmark": "pipeline.generate_validated_metadata",
+            "validated": len(pipeline.metadata_collection.root),
+            **measure(
+                lambda: pipeline._generate_validated_metadata(
+                    audio_metadata=audio_metadata
+                ),
+                repeats=repeats,
+            ),
+        }
+    )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tracks", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        music_dir = os.path.join(workdir, "music")
+        audio_files = write_corpus(
+            directory=music_dir, tracks=args.tracks, seconds=args.seconds
+        )
+        os.chdir(workdir)
+        try:
+            results = run(
+                music_dir=music_dir, audio_files=audio_files, repeats=args.repeats
+            )
+        finally:
+            os.chdir(cwd)
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Index build, search and /chat round-trip timings against local stub models.
+
+The real GeminiClient and GeminiApp are used with the "stub" provider's hash
+embeddings and canned chat model in place of Gemini, so nothing leaves the
+machine. The catalogue can be replicated to measure larger indexes.
+
+Usage:
+    python -m benchmarks.retrieval --scale 1 10 --requests 50
+"""
+
+import os
+import json
+import time
+import argparse
+import logging
+import tempfile
+from fastapi.testclient import TestClient
+from app.web import GeminiApp
+from llm.gemini import GeminiClient
+from llm.providers import STUB
+from benchmarks.timing import measure, summarize
+
+logger = logging.getLogger(__name__)
+
+OPEN_QUERY = "Which track sounds the most like a level theme, take {i}?"
+ROUTED_QUERY = "List all the C Major tracks"
+
+
+def scaled_metadata(source: str, scale: int, directory: str) -> str:
+    """Copy of the metadata json with every track repeated `scale` times."""
+    with open(source, "r") as f:
+        metadata = json.load(f)
+    scaled = {
+        (name if copy == 0 else name.replace(".wav", f"_{copy}.wav")): record
+        for copy in range(scale)
+        for name, record in metadata.items()
+    }
+    path = os.path.join(directory, f"audio_metadata_x{scale}.json")
+    with open(path, "w") as f:
+        json.dump(scaled, f)
+    return path
+
+
+def run_index(metadata_path: str, workdir: str, repeats: int) -> list[dict]:
+    options = {
+        "api_key": "offline",
+        "audio_metadata_path": metadata_path,
+        "index_dir": os.path.join(workdir, "index"),
+        "embedding_cache_path": os.path.join(workdir, "embeddings.sqlite"),
+        "provider": STUB,
+    }
+    start = time.perf_counter()
+    client = GeminiClient(**options)
+    build = time.perf_counter() - start
+    tracks = len(client.documents)
+
+    results = [
+        {"benchmark": "index.build", "tracks": tracks, **summarize([build])},
+        {
+            "benchmark": "index.load",
+            "tracks": tracks,
+            **measure(lambda: GeminiClient(**options), repeats=repeats),
+        },
+        {
+            "benchmark": "index.faiss_search",
+            "tracks": tracks,
+            **measure(
+                lambda: client.vector_store.similarity_search("bright fast theme"),
+                repeats=repeats * 20,
+            ),
+        },
+        {
+            "benchmark": "index.acoustic_search",
+            "tracks": tracks,
+            **measure(
+                lambda: client.acoustic_index.similar(client.acoustic_index.names[0]),
+                repeats=repeats * 20,
+            ),
+        },
+    ]
+    return results
+
+
+def run_chat(metadata_path: str, workdir: str, requests: int) -> list[dict]:
+    app = GeminiApp(
+        api_key="offline",
+        audio_metadata_path=metadata_path,
+        client_options={
+            "index_dir": os.path.join(workdir, "index"),
+            "embedding_cache_path": os.path.join(workdir, "embeddings.sqlite"),
+            "provider": STUB,
+        },
+    )
+    with TestClient(app.app) as http:
+        while http.get("/readyz").status_code != 200:
+            if app.startup["stage"] == "failed":
+                raise RuntimeError(app.startup["error"])
+            time.sleep(0.05)
+
+        def timed(query: str) -> float:
+            start = time.perf_counter()
+            http.post("/chat", json={"query": query}).raise_for_status()
+            return time.perf_counter() - start
+
+        uncached = [timed(OPEN_QUERY.format(i=i)) for i in range(requests)]
+        cached = [timed(OPEN_QUERY.format(i=0)) for _ in range(requests)]
+        routed = [timed(ROUTED_QUERY) for _ in range(requests)]
+    return [
+        {"benchmark": "chat.llm_uncached", **summarize(uncached)},
+        {"benchmark": "chat.llm_cached", **summarize(cached)},
+        {"benchmark": "chat.routed", **summarize(routed)},
+    ]
+
+
+def run(metadata_path: str, scales: list[int], requests: int, repeats: int) -> list:
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scaled_metadata(source=metadata_path, scale=scale, directory=workdir)
+            for row in run_index(metadata_path=path, workdir=workdir, repeats=repeats):
+                results.append({"scale": scale, **row})
+            for row in run_chat(metadata_path=path, workdir=workdir, requests=requests):
+                results.append({"scale": scale, **row})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--metadata", default=os.path.join("data", "metadata", "audio_metadata.json")
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    results = run(
+        metadata_path=args.metadata,
+        scales=args.scale,
+        requests=args.requests,
+        repeats=args.repeats,
+    )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Peak memory of streaming vs in-memory extraction on synthetic long tracks.
+
+Writes stereo 44.1 kHz WAVs of increasing length (tones, noise bursts and clicks),
+then measures the tracemalloc peak of each extractor. Exits non-zero if the
+streaming extractor's peak grows with track length.
+
+Usage:
+    python -m benchmarks.streaming_memory --minutes 2 8
+"""
+
+import os
+import json
+import argparse
+import logging
+import tempfile
+import tracemalloc
+import numpy as np
+import soundfile as sf
+from mir.process import extract_features, extract_features_streaming
+
+logger = logging.getLogger(__name__)
+
+
+def write_long_wav(
+    path: str, seconds: float, sampling_rate: int = 44100, chunk_seconds: float = 10.0
+) -> None:
+    """Writes the file chunk by chunk so generating it stays cheap too."""
+    rng = np.random.default_rng(0)
+    chunk = int(chunk_seconds * sampling_rate)
+    total = int(seconds * sampling_rate)
+    with sf.SoundFile(
+        path, mode="w", samplerate=sampling_rate, channels=2, subtype="PCM_16"
+    ) as f:
+        for start in range(0, total, chunk):
+            t = np.arange(start, min(start + chunk, total)) / sampling_rate
+            # Slowly moving tone, a noise floor and a click every half second
+            signal = 0.3 * np.sin(2 * np.pi * (220 + 20 * np.sin(t / 7)) * t)
+            signal += 0.05 * rng.standard_normal(len(t))
+            signal[(t % 0.5) < 0.005] += 0.5
+            f.write(np.stack([signal, signal], axis=1).clip(-1, 1))
+
+
+def peak_megabytes(extractor, file: str, music_dir: str) -> float:
+    tracemalloc.start()
+    extractor(file=file, music_dir=music_dir)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--minutes", type=float, nargs="+", default=[2, 8])
+    parser.add_argument(
+        "--skip-in-memory", action="store_true", help="Only measure streaming"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=1.05,
+        help="Max allowed ratio between the longest and shortest streaming peaks",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    results = []
+    with tempfile.TemporaryDirectory() as music_dir:
+        # Filter banks and JIT caches are built once per process; keep them out of
+        # the first measurement
+        write_long_wav(path=os.path.join(music_dir, "warmup.wav"), seconds=5)
+        extract_features_streaming(file="warmup.wav", music_dir=music_dir)
+        extract_features(file="warmup.wav", music_dir=music_dir)
+
+        for minutes in sorted(args.minutes):
+            file = f"synthetic_{minutes:g}min.wav"
+            write_long_wav(path=os.path.join(music_dir, file), seconds=minutes * 60)
+            row = {
+                "file": file,
+                "minutes": minutes,
+                "streaming_peak_mb": round(
+                    peak_megabytes(extract_features_streaming, file, music_dir), 1
+                ),
+            }
+            if not args.skip_in_memory:
+                row["in_memory_peak_mb"] = round(
+                    peak_megabytes(extract_features, file, music_dir), 1
+                )
+            logger.info(row)
+            results.append(row)
+    print(json.dumps(results))
+
+    baseline = results[0]["streaming_peak_mb"]
+    grown = {
+        row["file"]: row["streaming_peak_mb"] / baseline
+        for row in results[1:]
+        if row["streaming_peak_mb"] > args.tolerance * baseline
+    }
+    if grown:
+        raise RuntimeError(
+            f"Streaming peak memory grew with track length, relative to "
+            f"{results[0]['file']}: "
+            + ", ".join(f"{file} {ratio:.2f}x" for file, ratio in grown.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Runs every benchmark on a synthetic corpus and writes one JSON report.
+
+Reports carry the git commit, Python version and corpus settings alongside the
+timings, so runs from different commits can be diffed directly.
+
+Usage:
+    python -m benchmarks.suite --output benchmarks/results/latest.json
+    python -m benchmarks.suite --only features pipeline --tracks 4 --seconds 10
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import platform
+import tempfile
+import subprocess
+from benchmarks import (
+    classify,
+    context,
+    features,
+    fingerprint,
+    metadata,
+    pipeline,
+    retrieval,
+)
+from benchmarks.synthetic import write_corpus
+
+logger = logging.getLogger(__name__)
+
+SUITES = (
+    "features",
+    "pipeline",
+    "fingerprint",
+    "classify",
+    "metadata",
+    "retrieval",
+    "context",
+)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args: argparse.Namespace) -> dict:
+    results = []
+    metadata_path = os.path.abspath(args.metadata)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        music_dir = os.path.join(workdir, "music")
+        audio_files = write_corpus(
+            directory=music_dir, tracks=args.tracks, seconds=args.seconds
+        )
+        if "features" in args.only:
+            results += features.run(music_dir=music_dir, audio_files=audio_files)
+        if "pipeline" in args.only:
+            # The pipeline's cache paths are relative to the working directory
+            os.chdir(workdir)
+            try:
+                results += pipeline.run(
+                    music_dir=music_dir, audio_files=audio_files, repeats=args.repeats
+                )
+            finally:
+                os.chdir(cwd)
+        if "fingerprint" in args.only:
+            results += fingerprint.run(music_dir=music_dir, audio_files=audio_files)
+    if "classify" in args.only:
+        results += classify.run(scales=[1000, 10000], repeats=args.repeats)
+    if "metadata" in args.only:
+        results += metadata.run(
+            metadata_path=metadata_path, scales=[1, 100], repeats=args.repeats
+        )
+    if "retrieval" in args.only:
+        results += retrieval.run(
+            metadata_path=metadata_path,
+            scales=args.scale,
+            requests=args.requests,
+            repeats=args.repeats,
+        )
+    if "context" in args.only:
+        results += context.run(metadata_path=metadata_path, repeats=args.repeats)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "tracks": args.tracks,
+            "seconds": args.seconds,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--tracks", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--metadata", default=os.path.join("data", "metadata", "audio_metadata.json")
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Shared timing helpers for the benchmark modules."""
+
+import time
+import statistics
+from typing import Callable
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples: list[float]) -> dict:
+    """Seconds -> milliseconds summary of repeated timings."""
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0] * 1e3, 3),
+        "median_ms": round(statistics.median(ordered) * 1e3, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1e3, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1e3, 3),
+    }
+
+
+def measure(function: Callable[[], object], repeats: int = 5) -> dict:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
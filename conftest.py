@@ -0,0 +1,2 @@
+# Puts the repository root on sys.path, so tests import mir, llm and app as the
+# application does
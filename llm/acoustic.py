@@ -0,0 +1,109 @@
+import logging
+from typing import Optional
+import numpy as np
+from numpy.typing import NDArray
+import faiss
+from mir.metadata_model import AudioMetadataCollection
+from mir.store import FeatureStore
+
+logger = logging.getLogger(__name__)
+
+# Numeric descriptors that make up a track's acoustic vector
+ACOUSTIC_VECTOR_FIELDS = (
+    "mfcc_profile",
+    "chroma_mean",
+    "tonal_features",
+    "spectral_contrast_mean",
+)
+ACOUSTIC_SCALAR_FIELDS = (
+    "tempo",
+    "rhythm_regularity",
+    "spectral_centroid_mean",
+    "bass_contrast",
+    "treble_contrast",
+    "energy_mean",
+    "energy_std",
+    "zero_crossing_rate_mean",
+    "mfcc_spread",
+    "complexity_score",
+    "tonal_stability",
+)
+
+
+class AcousticIndex:
+    """Local "sounds like" retrieval over the extracted audio features.
+
+    Every feature is z-scored across the catalogue, and each vector feature is
+    scaled by 1/sqrt(width) so a 13-wide MFCC profile weighs as much as a single
+    scalar. The rows are L2-normalised into an inner-product FAISS index, so a
+    search returns cosine similarities without calling an embedding service.
+    """
+
+    def __init__(
+        self,
+        collection: Optional[AudioMetadataCollection] = None,
+        store: Optional[FeatureStore] = None,
+    ):
+        # The columns of a saved FeatureStore are read as they are, without a
+        # model per track; a bare collection is converted first
+        if store is None:
+            store = FeatureStore.from_collection(collection=collection)
+        self.names = [str(name) for name in store.names]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self.vectors = self._build_vectors(store=store)
+        self.index = faiss.IndexFlatIP(self.vectors.shape[1])
+        self.index.add(self.vectors)
+        logger.info(
+            f"Acoustic index built over {len(self.names)} tracks "
+            f"({self.vectors.shape[1]} dimensions)"
+        )
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._positions
+
+    def similar(self, name: str, k: int = 5) -> list[tuple[str, float]]:
+        """The k tracks that sound most like `name`, with cosine similarity."""
+        position = self._positions[name]
+        results = self.search(vector=self.vectors[position], k=k + 1)
+        return [(match, score) for match, score in results if match != name][:k]
+
+    def search(self, vector: NDArray, k: int = 5) -> list[tuple[str, float]]:
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        scores, positions = self.index.search(query, min(k, len(self.names)))
+        return [
+            (self.names[position], float(score))
+            for score, position in zip(scores[0], positions[0])
+            if position >= 0
+        ]
+
+    def _build_vectors(self, store: FeatureStore) -> NDArray:
+        blocks = []
+        for field in ACOUSTIC_VECTOR_FIELDS:
+            block = np.asarray(store.vectors.get(field, np.zeros((0, 0))))
+            if not block.size or np.isnan(block).all():
+                # Metadata written before the field was saved, e.g. the bundled
+                # catalogue without chroma_mean; the vectors simply lack that block
+                logger.warning(f"No track has {field}, leaving it out of the index")
+                continue
+            missing = int(np.isnan(block).all(axis=1).sum())
+            if missing:
+                # Standardized to the catalogue mean, so these rows are neutral on it
+                logger.warning(f"{missing} tracks lack {field}, zero-filling it")
+            block = block.astype(np.float64)
+            blocks.append(self._standardize(block) / np.sqrt(block.shape[1]))
+        blocks.append(self._standardize(store.matrix(list(ACOUSTIC_SCALAR_FIELDS))))
+
+        vectors = np.hstack(blocks)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    @staticmethod
+    def _standardize(block: NDArray) -> NDArray:
+        std = np.nanstd(block, axis=0)
+        block = (block - np.nanmean(block, axis=0)) / np.where(std > 0, std, 1.0)
+        # A missing feature sits at the catalogue mean
+        return np.nan_to_num(block)
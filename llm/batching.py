@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import NamedTuple, Optional
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+from mir.metrics import timed
+from llm.embeddings import CachedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+class PendingQuery(NamedTuple):
+    query: str
+    k: int
+    future: asyncio.Future
+
+
+class QueryBatcher:
+    """Coalesces concurrent similarity searches into one embedding and one search.
+
+    Queries arriving within `window` seconds of the first are embedded together
+    (cache misses go to the provider in one batch) and searched with a single
+    FAISS call over the stacked vectors; each caller then gets its own top-k. A
+    request waits at most `window` before its batch is sent, or less once
+    `max_batch` queries are pending.
+    """
+
+    def __init__(
+        self,
+        embeddings: CachedEmbeddings,
+        vector_store: FAISS,
+        window: float = 0.005,
+        max_batch: int = 64,
+        normalize: bool = False,
+    ):
+        self.embeddings = embeddings
+        self.vector_store = vector_store
+        # Set when the index holds unit vectors, i.e. FAISS(normalize_L2=True)
+        self.normalize = normalize
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: list[PendingQuery] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; in-flight batches live here
+        self._tasks: set[asyncio.Task] = set()
+        self.stats = {"batches": 0, "queries": 0}
+
+    @property
+    def mean_batch_size(self) -> float:
+        batches = self.stats["batches"]
+        return self.stats["queries"] / batches if batches else 0.0
+
+    async def search(self, query: str, k: int = 4) -> list[Document]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(PendingQuery(query=query, k=k, future=future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[PendingQuery]) -> None:
+        self.stats["batches"] += 1
+        self.stats["queries"] += len(batch)
+        try:
+            with timed("retrieve.embedding"):
+                vectors = await self.embeddings.aembed_queries(
+                    [pending.query for pending in batch]
+                )
+            matrix = np.asarray(vectors, dtype=np.float32)
+            if self.normalize:
+                matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+            k = min(max(pending.k for pending in batch), self.vector_store.index.ntotal)
+            # One search over every query, off the event loop
+            with timed("retrieve.faiss_search"):
+                _, positions = await asyncio.to_thread(
+                    self.vector_store.index.search, matrix, k
+                )
+        except Exception as e:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        id_map = self.vector_store.index_to_docstore_id
+        for pending, row in zip(batch, positions):
+            if pending.future.done():
+                # The caller was cancelled or timed out while the batch ran
+                continue
+            pending.future.set_result(
+                [
+                    self.vector_store.docstore.search(id_map[position])
+                    for position in row[: pending.k]
+                    if position >= 0
+                ]
+            )
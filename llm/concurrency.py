@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class OverloadedError(RuntimeError):
+    """Raised when a request cannot get a slot: the queue is full or waited too long."""
+
+
+class ConcurrencyLimiter:
+    """Caps how many queries run at once, with a bounded, time-limited queue.
+
+    At most `max_concurrency` queries run; up to `max_queue` more wait for a slot
+    for at most `queue_timeout` seconds before being turned away with
+    OverloadedError. A running query is cancelled with TimeoutError after
+    `timeout` seconds, so a slow upstream cannot hold a slot forever.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        timeout: float = 60.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+        elif self.waiting >= self.max_queue:
+            raise OverloadedError(f"{self.waiting} queries are already waiting")
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise OverloadedError(
+                    f"No free slot after waiting {self.queue_timeout} seconds"
+                ) from None
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def run(self, function: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        async with self.slot():
+            return await asyncio.wait_for(function(*args, **kwargs), self.timeout)
+
+    async def stream(self, iterator: AsyncIterator[T]) -> AsyncIterator[T]:
+        async with self.slot():
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            try:
+                while True:
+                    # Each chunk gets whatever is left, so a stalled upstream
+                    # cannot hold the slot between chunks either
+                    remaining = max(deadline - loop.time(), 0.0)
+                    try:
+                        item = await asyncio.wait_for(anext(iterator), remaining)
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(
+                            f"Stream exceeded {self.timeout} seconds"
+                        ) from None
+                    yield item
+            finally:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
@@ -0,0 +1,80 @@
+import json
+import logging
+from typing import Optional
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Scalar fields the prompt needs to compare tracks; arrays like mfcc_profile are
+# left out, and the description carries the plain-language summary
+CONTEXT_FIELDS = (
+    "key",
+    "tempo",
+    "mood",
+    "function",
+    "energy_mean",
+    "energy_std",
+    "complexity_score",
+    "bass_contrast",
+    "treble_contrast",
+    "spectral_centroid_mean",
+    "rhythm_regularity",
+    "tonal_stability",
+    "zero_crossing_rate_mean",
+    "description",
+)
+
+
+class ContextProjector:
+    """Renders retrieved track documents compactly for the prompt.
+
+    Each track becomes one line of `field=value` pairs with numbers rounded to
+    `precision` significant digits, followed by its description. With `fields`
+    set to None the raw JSON records are passed through unchanged.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        fields: Optional[tuple[str, ...]] = CONTEXT_FIELDS,
+        precision: int = 4,
+    ):
+        # Track names in document order; the records themselves don't carry them
+        self.names = names
+        self.fields = fields
+        self.precision = precision
+        # Rendered text per document; records never change once indexed
+        self._rendered: dict[int, str] = {}
+
+    def render(self, documents: list[Document]) -> str:
+        if self.fields is None:
+            return "\n\n".join(doc.page_content for doc in documents)
+        return "\n\n".join(self._render_document(doc) for doc in documents)
+
+    def _render_document(self, document: Document) -> str:
+        # JSONLoader numbers documents from 1
+        position = document.metadata["seq_num"] - 1
+        if position not in self._rendered:
+            self._rendered[position] = self._project(
+                name=self.names[position], record=json.loads(document.page_content)
+            )
+        return self._rendered[position]
+
+    def _project(self, name: str, record: dict) -> str:
+        pairs = [
+            f"{field}={self._format(record[field])}"
+            for field in self.fields
+            if field != "description" and field in record
+        ]
+        lines = [f"{name}: {', '.join(pairs)}"]
+        if "description" in self.fields and record.get("description"):
+            lines.append(record["description"].strip())
+        return "\n".join(lines)
+
+    def _format(self, value) -> str:
+        if isinstance(value, bool) or not isinstance(value, (int, float, list)):
+            return str(value)
+        if isinstance(value, list):
+            return "[" + ", ".join(self._format(item) for item in value) + "]"
+        # Significant digits suit both energy (~0.05) and spectral centroid (~1000)
+        return f"{float(f'{value:.{self.precision}g}'):g}"
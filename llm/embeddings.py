@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Share of disk_max_entries evicted at once when the disk cache outgrows it
+DISK_EVICTION_FRACTION = 0.1
+
+
+class CachedEmbeddings(Embeddings):
+    """Caching wrapper around any LangChain `Embeddings`.
+
+    Vectors are keyed by model name, kind (query or document, since providers embed
+    them differently) and a hash of the text. Lookups go through an in-process LRU
+    first, then a size-bounded SQLite file that survives restarts; whatever is
+    still missing is embedded in a single batched call.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache_path: str = r"data\cache\embeddings.sqlite",
+        memory_size: int = 2048,
+        disk_max_entries: int = 100_000,
+        query_batch_kwargs: Optional[dict] = None,
+    ):
+        self.embeddings = embeddings
+        # Arguments that make embed_documents produce query embeddings (for Google,
+        # task_type="retrieval_query"); without them queries are embedded one by one
+        self.query_batch_kwargs = query_batch_kwargs
+        self.model_name = model_name
+        self.memory_size = memory_size
+        self.disk_max_entries = disk_max_entries
+        self._memory: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(cache_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings "
+            "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+        # Counted once here and then tracked in memory, so writes never COUNT(*)
+        (self._disk_rows,) = self._db.execute(
+            "SELECT COUNT(*) FROM embeddings"
+        ).fetchone()
+        # last_used of disk hits, written with the next commit
+        self._touched: dict[str, float] = {}
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts=texts, kind="document")
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(texts=[text], kind="query")[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self._aembed(texts=texts, kind="document")
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return (await self._aembed(texts=[text], kind="query"))[0]
+
+    async def aembed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Query embeddings for many texts, with the misses sent as one batch."""
+        return await self._aembed(texts=texts, kind="query")
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _key(self, text: str, kind: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode()).hexdigest()
+
+    def _embed(self, texts: list[str], kind: str) -> list[list[float]]:
+        keys, vectors, missing = self._lookup(texts=texts, kind=kind)
+        if missing:
+            if kind == "query" and len(missing) == 1:
+                embedded = [self.embeddings.embed_query(next(iter(missing.values())))]
+            else:
+                embedded = self._embed_missing(texts=list(missing.values()), kind=kind)
+            self._store(vectors=vectors, missing=missing, embedded=embedded)
+        return [vectors[key] for key in keys]
+
+    async def _aembed(self, texts: list[str], kind: str) -> list[list[float]]:
+        # SQLite reads and writes block, so they run off the event loop
+        keys, vectors, missing = await asyncio.to_thread(
+            self._lookup, texts=texts, kind=kind
+        )
+        if missing:
+            # The provider's async client keeps the event loop free during the call
+            pending = list(missing.values())
+            if kind == "document":
+                embedded = await self.embeddings.aembed_documents(pending)
+            elif len(pending) > 1 and self.query_batch_kwargs is not None:
+                embedded = await self.embeddings.aembed_documents(
+                    pending, **self.query_batch_kwargs
+                )
+            else:
+                embedded = await asyncio.gather(
+                    *(self.embeddings.aembed_query(text) for text in pending)
+                )
+            await asyncio.to_thread(
+                self._store, vectors=vectors, missing=missing, embedded=embedded
+            )
+        return [vectors[key] for key in keys]
+
+    def _lookup(
+        self, texts: list[str], kind: str
+    ) -> tuple[list[str], dict[str, list[float]], dict[str, str]]:
+        keys = [self._key(text=text, kind=kind) for text in texts]
+        vectors: dict[str, list[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    vectors[key] = self._memory[key]
+                    self.stats["memory_hits"] += 1
+            disk_keys = list({key for key in keys if key not in vectors})
+            for key, vector in self._read_disk(keys=disk_keys).items():
+                vectors[key] = vector
+                self._remember(key=key, vector=vector)
+                self.stats["disk_hits"] += 1
+            # Each distinct missing text is embedded once, in one batch
+            missing = {
+                key: text for key, text in zip(keys, texts) if key not in vectors
+            }
+            if not missing:
+                # Otherwise _store commits, so each call commits once
+                self._commit_disk()
+        return keys, vectors, missing
+
+    def _store(
+        self,
+        vectors: dict[str, list[float]],
+        missing: dict[str, str],
+        embedded: list[list[float]],
+    ) -> None:
+        with self._lock:
+            self.stats["misses"] += len(missing)
+            for key, vector in zip(missing, embedded):
+                vectors[key] = vector
+                self._remember(key=key, vector=vector)
+            self._write_disk(items=dict(zip(missing, embedded)))
+            self._commit_disk()
+
+    def _embed_missing(self, texts: list[str], kind: str) -> list[list[float]]:
+        if kind == "document":
+            return self.embeddings.embed_documents(texts)
+        if self.query_batch_kwargs is not None:
+            return self.embeddings.embed_documents(texts, **self.query_batch_kwargs)
+        return [self.embeddings.embed_query(text) for text in texts]
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            batch = keys[start : start + 500]
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        now = time.time()
+        self._touched.update((key, now) for key in found)
+        return found
+
+    def _write_disk(self, items: dict[str, list[float]]) -> None:
+        now = time.time()
+        cursor = self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [
+                (key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in items.items()
+            ],
+        )
+        # A replaced row counts as new, which only brings the next eviction forward
+        self._disk_rows += max(cursor.rowcount, 0)
+
+    def _commit_disk(self) -> None:
+        if self._touched:
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+        # Past the bound, evict the least recently used rows in one batch, down to
+        # a low-water mark so the next few writes do not evict again
+        if self._disk_rows > self.disk_max_entries:
+            target = int(self.disk_max_entries * (1 - DISK_EVICTION_FRACTION))
+            cursor = self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (self._disk_rows - target,),
+            )
+            self._disk_rows -= cursor.rowcount
+            logger.info(f"Evicted {cursor.rowcount} cached embeddings from disk")
+        if self._db.in_transaction:
+            self._db.commit()
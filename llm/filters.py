@@ -0,0 +1,231 @@
+import re
+import math
+import logging
+from bisect import bisect_left, bisect_right
+from typing import NamedTuple, Optional
+from mir.metadata_model import AudioMetadataCollection
+from mir.key import KEYS
+
+logger = logging.getLogger(__name__)
+
+# Categorical fields with an inverted index; `mode` is derived from `key`
+INVERTED_FIELDS = ("key", "mode", "mood", "function")
+# Numeric fields with a sorted index for range queries
+SORTED_FIELDS = ("tempo", "energy_mean", "complexity_score")
+
+# How a query refers to each sorted field
+RANGE_FIELD_WORDS = {
+    "tempo": "tempo",
+    "bpm": "tempo",
+    "energy": "energy_mean",
+    "complexity": "complexity_score",
+}
+NUMBER = r"(\d+(?:\.\d+)?)"
+LOWER_BOUNDS = {
+    "above": False,
+    "over": False,
+    "more than": False,
+    "greater than": False,
+    "faster than": False,
+    "higher than": False,
+    "at least": True,
+}
+UPPER_BOUNDS = {
+    "below": False,
+    "under": False,
+    "less than": False,
+    "slower than": False,
+    "lower than": False,
+    "at most": True,
+}
+COMPARISONS = "|".join(list(LOWER_BOUNDS) + list(UPPER_BOUNDS))
+FIELD_COMPARISON = re.compile(
+    rf"\b(tempo|energy|complexity)\b[^\d.]{{0,20}}?\b({COMPARISONS})\s+{NUMBER}"
+)
+BPM_COMPARISON = re.compile(rf"\b({COMPARISONS})\s+{NUMBER}\s*bpm\b")
+# Negated or excepted conditions ("not effects") select the complement, which a
+# positive filter can't express, so such queries skip the structured path
+NEGATION = re.compile(r"\b(not|except|without|other than|excluding)\b|n't\b")
+BETWEEN = re.compile(
+    rf"\b(tempo|energy|complexity|bpm)?\b[^\d.]{{0,20}}?\bbetween\s+{NUMBER}\s+and\s+{NUMBER}\s*(bpm)?"
+)
+
+
+class MetadataFilter(NamedTuple):
+    # Field -> accepted values; values of one field are OR-ed, fields are AND-ed
+    equals: dict[str, set[str]]
+    # Field -> inclusive (low, high) bounds, either of which may be None
+    ranges: dict[str, tuple[Optional[float], Optional[float]]]
+    # (field, "low" or "high") of bounds the query stated as strict ("above 120")
+    strict: frozenset = frozenset()
+
+
+class MetadataIndex:
+    """Exact structured lookups over the metadata collection.
+
+    key, mode, mood and function map each value to the set of tracks holding it
+    (function is comma-separated, so a track is listed under every label). tempo,
+    energy and complexity are kept sorted, so a range is two bisections. A filter
+    costs O(matches) and returns the complete set, unlike a top-k vector search.
+    """
+
+    def __init__(self, collection: AudioMetadataCollection):
+        self.names = list(collection.keys())
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        self.inverted: dict[str, dict[str, set[str]]] = {
+            field: {} for field in INVERTED_FIELDS
+        }
+        for name, track in collection.items():
+            values = {
+                "key": [track.key],
+                "mode": [track.key.split()[-1]] if track.key else [],
+                "mood": [track.mood],
+                "function": [label for label in track.function.split(",") if label],
+            }
+            for field, labels in values.items():
+                for label in labels:
+                    self.inverted[field].setdefault(label, set()).add(name)
+
+        self.sorted: dict[str, tuple[list[float], list[str]]] = {}
+        for field in SORTED_FIELDS:
+            pairs = sorted(
+                (getattr(track, field), name) for name, track in collection.items()
+            )
+            self.sorted[field] = ([value for value, _ in pairs], [n for _, n in pairs])
+        self._value_patterns = self._compile_value_patterns()
+        logger.info(f"Metadata index built over {len(self.names)} tracks")
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def position(self, name: str) -> int:
+        return self._positions[name]
+
+    def values(self, field: str) -> list[str]:
+        return sorted(self.inverted[field])
+
+    def matching(self, field: str, value: str) -> set[str]:
+        return self.inverted[field].get(value, set())
+
+    def in_range(
+        self, field: str, low: Optional[float] = None, high: Optional[float] = None
+    ) -> set[str]:
+        """Tracks with low <= field <= high; a missing bound is open."""
+        values, names = self.sorted[field]
+        start = 0 if low is None else bisect_left(values, low)
+        stop = len(values) if high is None else bisect_right(values, high)
+        return set(names[start:stop])
+
+    def filter(self, metadata_filter: MetadataFilter) -> list[str]:
+        """Track names passing every condition, in catalogue order."""
+        matches: Optional[set[str]] = None
+        for field, accepted in metadata_filter.equals.items():
+            survivors = set().union(
+                *(self.matching(field=field, value=value) for value in accepted)
+            )
+            matches = survivors if matches is None else matches & survivors
+        for field, (low, high) in metadata_filter.ranges.items():
+            survivors = self.in_range(field=field, low=low, high=high)
+            matches = survivors if matches is None else matches & survivors
+        if matches is None:
+            return list(self.names)
+        return sorted(matches, key=self._positions.__getitem__)
+
+    def parse(self, query: str) -> Optional[MetadataFilter]:
+        """Pulls key/mode/mood/function values and numeric ranges out of a question.
+
+        Returns None when the query names no structured condition. Keys are
+        recognised whether or not the catalogue holds them, so "A# Minor" is
+        never mistaken for the Minor mode.
+        """
+        text = query.lower()
+        equals: dict[str, set[str]] = {}
+        for field, patterns in self._value_patterns.items():
+            # Key patterns are case-sensitive where needed, so they see the query
+            target = query if field == "key" else text
+            found = {value for value, pattern in patterns if pattern.search(target)}
+            if found:
+                equals[field] = found
+        # A full key already pins the mode
+        if "key" in equals:
+            equals.pop("mode", None)
+
+        ranges: dict[str, tuple[Optional[float], Optional[float]]] = {}
+        strict: set[tuple[str, str]] = set()
+        for word, low, high, _ in BETWEEN.findall(text):
+            # A bare "between 100 and 150" is read as a tempo
+            field = RANGE_FIELD_WORDS.get(word, "tempo")
+            ranges[field] = (float(low), float(high))
+        for word, comparison, number in FIELD_COMPARISON.findall(text):
+            self._bound(
+                ranges, strict, RANGE_FIELD_WORDS[word], comparison, float(number)
+            )
+        for comparison, number in BPM_COMPARISON.findall(text):
+            self._bound(ranges, strict, "tempo", comparison, float(number))
+
+        if not equals and not ranges:
+            return None
+        return MetadataFilter(equals=equals, ranges=ranges, strict=frozenset(strict))
+
+    @staticmethod
+    def negated(query: str) -> bool:
+        return NEGATION.search(query.lower()) is not None
+
+    def unknown_values(self, metadata_filter: MetadataFilter) -> dict[str, set[str]]:
+        """Values the filter asks for that no track in the catalogue holds."""
+        unknown = {
+            field: {value for value in values if value not in self.inverted[field]}
+            for field, values in metadata_filter.equals.items()
+        }
+        return {field: values for field, values in unknown.items() if values}
+
+    @staticmethod
+    def _bound(
+        ranges: dict[str, tuple[Optional[float], Optional[float]]],
+        strict: set[tuple[str, str]],
+        field: str,
+        comparison: str,
+        number: float,
+    ) -> None:
+        low, high = ranges.get(field, (None, None))
+        # Strict comparisons move the bound one representable step inwards
+        if comparison in LOWER_BOUNDS:
+            inclusive = LOWER_BOUNDS[comparison]
+            low = number if inclusive else math.nextafter(number, math.inf)
+            side = "low"
+        else:
+            inclusive = UPPER_BOUNDS[comparison]
+            high = number if inclusive else math.nextafter(number, -math.inf)
+            side = "high"
+        ranges[field] = (low, high)
+        if inclusive:
+            strict.discard((field, side))
+        else:
+            strict.add((field, side))
+
+    def _compile_value_patterns(self) -> dict[str, list[tuple[str, re.Pattern]]]:
+        patterns = {"key": [(key, self._key_pattern(key)) for key in KEYS]}
+        # Every key and mode is recognised, not only those in the catalogue
+        vocabulary = {"mode": {"Major", "Minor"}}
+        for field in INVERTED_FIELDS:
+            if field == "key":
+                continue
+            patterns[field] = []
+            for value in vocabulary.get(field, set()) | set(self.inverted[field]):
+                # game_over -> "game over", and allow plurals such as "effects"
+                words = r"[\s_]+".join(
+                    re.escape(word) for word in re.split(r"[\s_]+", value.lower())
+                )
+                pattern = re.compile(rf"(?<![\w#]){words}s?(?![\w#])")
+                patterns[field].append((value, pattern))
+        return patterns
+
+    @staticmethod
+    def _key_pattern(key: str) -> re.Pattern:
+        pitch, mode = key.split()
+        # A lowercase "a major" is usually the article ("in a major key"), so
+        # the A keys need a capital letter; every other key ignores case
+        note = "A" if pitch[0] == "A" else f"(?i:{pitch[0]})"
+        return re.compile(
+            rf"(?<![\w#]){note}{re.escape(pitch[1:])}[\s_]+(?i:{mode})s?(?![\w#])"
+        )
@@ -1,23 +1,48 @@
+import os
+import shutil
+import hashlib
 import logging
+from os.path import join
+from typing import AsyncIterator, Callable, Optional
 from google import genai
 from langchain_core.prompts import PromptTemplate
+from langchain_core.prompt_values import PromptValue
 from langchain_core.documents import Document
-from langchain.chat_models import init_chat_model
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.document_loaders import JSONLoader
 from langchain_community.vectorstores import FAISS
-from langgraph.graph import START, StateGraph
+from langgraph.graph import END, START, StateGraph
 from langgraph.graph.state import CompiledStateGraph
 from typing_extensions import TypedDict
 import faiss
-from mir.metadata_model import get_schema_descriptions
+import soundfile as sf
+from mir.metadata_model import AudioMetadataCollection, get_schema_descriptions
+from mir.metrics import timed
+from mir.cache import file_digest
+from mir.segments import SegmentStore
+from mir.store import FeatureStore
+from mir.fingerprint import FingerprintIndex, load_audio
+from llm.embeddings import CachedEmbeddings
+from llm.acoustic import AcousticIndex
+from llm.segments import SegmentIndex
+from llm.filters import MetadataIndex
+from llm.intent import OPEN, IntentRouter, QueryIntent
+from llm.concurrency import ConcurrencyLimiter
+from llm.batching import QueryBatcher
+from llm.context import CONTEXT_FIELDS, ContextProjector
+from llm.providers import GOOGLE, create_chat_model, create_embeddings
 
 logger = logging.getLogger(__name__)
 
+# Bump when the way documents are built or indexed changes, to invalidate saved indexes
+INDEX_FORMAT_VERSION = "1"
+
 
 class ClientState(TypedDict):
     query: str
+    intent: QueryIntent
     context: list[Document]
     response: str
 
@@ -29,53 +54,315 @@ class GeminiClient:
         audio_metadata_path: str,
         audio_files: list[str] = None,
         model: str = "gemini-2.0-flash",
+        embedding_model: str = "models/text-embedding-004",
+        index_dir: str = r"data\index",
+        embedding_cache_path: str = r"data\cache\embeddings.sqlite",
+        rank_filtered: bool = False,
+        context_fields: Optional[tuple[str, ...]] = CONTEXT_FIELDS,
+        context_precision: int = 4,
+        segment_store_path: Optional[str] = None,
+        feature_store_path: Optional[str] = None,
+        fingerprint_index_path: Optional[str] = None,
+        max_concurrency: int = 8,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        query_timeout: float = 60.0,
+        batch_window: float = 0.005,
+        on_progress: Optional[Callable[[str], None]] = None,
+        provider: str = GOOGLE,
+        chat_options: Optional[dict] = None,
+        embedding_options: Optional[dict] = None,
+        chat_model: Optional[BaseChatModel] = None,
+        embeddings: Optional[Embeddings] = None,
     ):
-        self._client = genai.Client(api_key=api_key)
-        self.model = init_chat_model(model=model, model_provider="google_genai")
+        # Reports each loading stage, e.g. to a readiness probe
+        report = on_progress or (lambda stage: None)
+        report("connecting")
+        if provider == GOOGLE:
+            self._client = genai.Client(api_key=api_key)
+        # Any LangChain chat model or embeddings can stand in for the provider's
+        self.model = chat_model or create_chat_model(
+            provider=provider, model=model, **(chat_options or {})
+        )
         self.audio_files = audio_files
-        self.embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004"
+        # Keeps cached vectors and saved indexes apart across providers
+        self.embedding_model = (
+            embedding_model if provider == GOOGLE else f"{provider}/{embedding_model}"
+        )
+        # Whether tracks that pass a metadata filter are re-ordered by vector similarity
+        self.rank_filtered = rank_filtered
+        # Fields rendered into the prompt for each retrieved track; None sends raw JSON
+        self.context_fields = context_fields
+        self.context_precision = context_precision
+        # Bounds how many queries hold upstream connections at once
+        self.limiter = ConcurrencyLimiter(
+            max_concurrency=max_concurrency,
+            max_queue=max_queue,
+            queue_timeout=queue_timeout,
+            timeout=query_timeout,
+        )
+        self.embeddings = CachedEmbeddings(
+            embeddings=embeddings
+            or create_embeddings(
+                provider=provider, model=embedding_model, **(embedding_options or {})
+            ),
+            model_name=self.embedding_model,
+            cache_path=embedding_cache_path,
+            query_batch_kwargs=(
+                {"task_type": "retrieval_query"}
+                if provider == GOOGLE and embeddings is None
+                else None
+            ),
+        )
+        # Identifies the metadata, embedding model and index format in use
+        self.index_key = self._index_key(document_path=audio_metadata_path)
+        # Cached answers stay valid while the metadata file is unchanged on disk
+        self.audio_metadata_path = audio_metadata_path
+        self._metadata_signature: Optional[tuple[int, int]] = None
+        self._metadata_version = ""
+        self.index_path = join(index_dir, self.index_key)
+        if os.path.exists(join(self.index_path, "index.faiss")):
+            report("loading vector store")
+            self.documents = self._load_vector_store()
+        else:
+            report("building vector store")
+            self.vector_store = FAISS(
+                embedding_function=self.embeddings,
+                index=faiss.IndexFlatL2(
+                    len(self.embeddings.embed_query("hello world"))
+                ),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+            )
+            self.documents = self._store_documents(document_path=audio_metadata_path)
+            if self.documents:
+                self._save_vector_store(index_dir=index_dir)
+        # Concurrent queries share one embedding batch and one FAISS search
+        self.query_batcher = QueryBatcher(
+            embeddings=self.embeddings,
+            vector_store=self.vector_store,
+            window=batch_window,
+        )
+        report("building metadata indexes")
+        # Validated in one pass, as AudioPipeline.create_metadata_json wrote it
+        self.collection = AudioMetadataCollection.load(audio_metadata_path)
+        # Memory-mapped feature columns, once AudioPipeline.create_feature_store ran
+        self.feature_store: Optional[FeatureStore] = None
+        if feature_store_path and FeatureStore.exists(feature_store_path):
+            store = FeatureStore.load(feature_store_path)
+            if [str(name) for name in store.names] == list(self.collection.keys()):
+                self.feature_store = store
+            else:
+                logger.warning(
+                    f"Ignoring outdated feature store at {feature_store_path}"
+                )
+        # "Sounds like" lookups run over the extracted features, with no embedding calls
+        self.acoustic_index = AcousticIndex(
+            collection=self.collection, store=self.feature_store
+        )
+        # Time-resolved search, available once AudioPipeline.create_segment_store ran
+        self.segment_index: Optional[SegmentIndex] = None
+        if segment_store_path and SegmentStore.exists(segment_store_path):
+            self.segment_index = SegmentIndex(
+                store=SegmentStore.load(segment_store_path)
+            )
+        # Clip identification, once AudioPipeline.create_fingerprint_index ran
+        self.fingerprint_index: Optional[FingerprintIndex] = None
+        if fingerprint_index_path and FingerprintIndex.exists(fingerprint_index_path):
+            self.fingerprint_index = FingerprintIndex.load(fingerprint_index_path)
+        self.metadata_index = MetadataIndex(collection=self.collection)
+        self.router = IntentRouter(
+            collection=self.collection, metadata_index=self.metadata_index
         )
-        self.vector_store = FAISS(
-            embedding_function=self.embeddings,
-            index=faiss.IndexFlatL2(len(self.embeddings.embed_query("hello world"))),
-            docstore=InMemoryDocstore(),
-            index_to_docstore_id={},
+        self.projector = ContextProjector(
+            names=list(self.collection.keys()),
+            fields=context_fields,
+            precision=context_precision,
         )
-        self.documents = self._store_documents(document_path=audio_metadata_path)
         if self.documents:
+            report("compiling graph")
             self.prompt = self._create_prompt()
             self.graph = self._compile()
         else:
             logger.error("Documents not stored correctly")
 
-    async def invoke(self, query) -> dict:
-        result = await self.graph.ainvoke({"query": query})
+    async def invoke(self, query, intent: Optional[QueryIntent] = None) -> dict:
+        """Answers `query`; pass the `intent` if the caller already classified it."""
+        result = await self.limiter.run(
+            self.graph.ainvoke, self._graph_input(query=query, intent=intent)
+        )
         return result
 
+    async def warm_up(self) -> None:
+        """Opens the embedding connection and primes the local indexes."""
+        await self.embeddings.aembed_query("hello world")
+        self.router.classify("list all tracks")
+
+    def stream(
+        self, query: str, intent: Optional[QueryIntent] = None
+    ) -> AsyncIterator[tuple[str, object]]:
+        """Yields ("context", documents) once, then ("token", text) chunks."""
+        return self.limiter.stream(self._stream(query, intent=intent))
+
+    @property
+    def metadata_version(self) -> str:
+        """Content hash of the metadata file, re-hashed only when its stat changes."""
+        try:
+            stat = os.stat(self.audio_metadata_path)
+        except OSError:
+            return self._metadata_version
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature != self._metadata_signature:
+            self._metadata_signature = signature
+            self._metadata_version = file_digest(self.audio_metadata_path)
+        return self._metadata_version
+
+    @staticmethod
+    def _graph_input(query: str, intent: Optional[QueryIntent]) -> dict:
+        # A known intent skips the classify node rather than routing the query twice
+        return (
+            {"query": query} if intent is None else {"query": query, "intent": intent}
+        )
+
+    async def _stream(
+        self, query: str, intent: Optional[QueryIntent] = None
+    ) -> AsyncIterator[tuple[str, object]]:
+        async for mode, chunk in self.graph.astream(
+            self._graph_input(query=query, intent=intent),
+            stream_mode=["updates", "messages"],
+        ):
+            if mode == "updates":
+                for node, update in chunk.items():
+                    if update and "context" in update:
+                        yield "context", update["context"]
+                    # Directly answered queries arrive whole rather than token by token
+                    if node == "_answer":
+                        yield "token", update["response"]
+            else:
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "_generate" and isinstance(
+                    message.content, str
+                ):
+                    yield "token", message.content
+
+    def format_prompt(self, query: str, documents: list[Document]) -> PromptValue:
+        return self.prompt.invoke(
+            {"query": query, "context": self.projector.render(documents)}
+        )
+
+    def similar_tracks(self, name: str, k: int = 5) -> list[dict]:
+        return [
+            {"name": match, "similarity": score}
+            for match, score in self.acoustic_index.similar(name=name, k=k)
+        ]
+
+    def similar_segments(
+        self, name: str, seconds: float, k: int = 5, other_tracks: bool = False
+    ) -> list[dict]:
+        return [
+            match._asdict()
+            for match in self.segment_index.similar(
+                name=name, seconds=seconds, k=k, other_tracks=other_tracks
+            )
+        ]
+
+    @timed("identify.clip")
+    def identify_clip(self, audio: bytes) -> Optional[dict]:
+        """The track and offset an encoded recording was cut from, or None.
+
+        Raises ValueError when the bytes can't be decoded as audio. Blocks while
+        decoding, so call it from a worker thread.
+        """
+        try:
+            waveform = load_audio(audio)
+        except sf.SoundFileError as e:
+            raise ValueError(f"Could not decode audio: {e}") from e
+        match = self.fingerprint_index.identify(waveform)
+        return match._asdict() if match else None
+
+    @timed("graph.classify")
+    def _classify(self, state: ClientState) -> dict:
+        if state.get("intent") is not None:
+            return {}
+        return {"intent": self.router.classify(state["query"])}
+
+    def _route(self, state: ClientState) -> str:
+        # Listing, counting and field lookups never reach the LLM
+        if state["intent"].intent == OPEN:
+            return "_retrieve"
+        logger.info(f"Answering {state['intent'].intent} query from metadata")
+        return "_answer"
+
+    @timed("graph.answer")
+    def _answer(self, state: ClientState) -> dict:
+        return {
+            "context": self._track_documents(state["intent"].names),
+            "response": self.router.answer(state["intent"]),
+        }
+
     # @tool(response_format="content_and_artifact")
-    def _retrieve(self, state: ClientState) -> dict:
-        # Here if you want to change the number of retrieved docs
-        retrieved_docs = self.vector_store.similarity_search(state["query"])
-        return {"context": retrieved_docs}
+    async def _retrieve(self, state: ClientState) -> dict:
+        # Decorating would only time creating the coroutine, not awaiting it
+        with timed("graph.retrieve"):
+            # Structured conditions ("C Major", "background themes") select the exact set
+            metadata_filter = self.metadata_index.parse(state["query"])
+            # ...unless the query negates them or names a value no track holds,
+            # where an exact set would be confidently wrong
+            if (
+                metadata_filter is not None
+                and not self.metadata_index.negated(state["query"])
+                and not self.metadata_index.unknown_values(metadata_filter)
+            ):
+                names = self.metadata_index.filter(metadata_filter)
+                if names:
+                    logger.info(f"Metadata filter matched {len(names)} tracks")
+                    return {
+                        "context": await self._filtered_documents(state["query"], names)
+                    }
+            # Here if you want to change the number of retrieved docs
+            retrieved_docs = await self.query_batcher.search(state["query"])
+            return {"context": retrieved_docs}
+
+    def _track_documents(self, names: list[str]) -> list[Document]:
+        # Documents are loaded in the same order as the metadata json
+        return [self.documents[self.metadata_index.position(name)] for name in names]
 
-    def _generate(self, state: ClientState) -> dict:
-        docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-        messages = self.prompt.invoke(
-            {"query": state["query"], "context": docs_content}
+    async def _filtered_documents(self, query: str, names: list[str]) -> list[Document]:
+        if not self.rank_filtered:
+            return self._track_documents(names)
+        positions = [self.metadata_index.position(name) for name in names]
+        # JSONLoader numbers documents from 1
+        return await self.vector_store.asimilarity_search(
+            query,
+            k=len(positions),
+            filter={"seq_num": [position + 1 for position in positions]},
+            fetch_k=len(self.documents),
         )
-        response = self.model.invoke(messages)
-        return {"response": response.content}
+
+    async def _generate(self, state: ClientState) -> dict:
+        with timed("graph.generate"):
+            with timed("generate.prompt_format"):
+                messages = self.format_prompt(state["query"], state["context"])
+            with timed("generate.model"):
+                response = await self.model.ainvoke(messages)
+            return {"response": response.content}
 
     def _compile(self) -> CompiledStateGraph:
         logger.info("Building GeminiClient graph")
         graph_builder = StateGraph(ClientState).add_sequence(
             [self._retrieve, self._generate]
         )
-        graph_builder.add_edge(START, "_retrieve")
+        graph_builder.add_node(self._classify)
+        graph_builder.add_node(self._answer)
+        graph_builder.add_edge(START, "_classify")
+        graph_builder.add_conditional_edges(
+            "_classify", self._route, ["_retrieve", "_answer"]
+        )
+        graph_builder.add_edge("_answer", END)
         graph = graph_builder.compile()
         return graph
 
+    @timed("index.store_documents")
     def _store_documents(
         self, document_path: str | list[str]
     ) -> list[Document] | list[list[Document]]:
@@ -97,18 +384,55 @@ class GeminiClient:
             self.vector_store.add_documents(documents=docs_list)
             return docs_list
 
+    def _index_key(self, document_path: str) -> str:
+        # The saved index is only valid for this exact metadata and embedding model
+        digest = hashlib.sha256()
+        with open(document_path, "rb") as f:
+            digest.update(f.read())
+        digest.update(self.embedding_model.encode())
+        digest.update(INDEX_FORMAT_VERSION.encode())
+        return digest.hexdigest()[:16]
+
+    def _load_vector_store(self) -> list[Document]:
+        logger.info(f"Loading saved vector store from {self.index_path}")
+        # The pickled docstore was written by _save_vector_store, so it is trusted
+        self.vector_store = FAISS.load_local(
+            folder_path=self.index_path,
+            embeddings=self.embeddings,
+            allow_dangerous_deserialization=True,
+        )
+        id_map = self.vector_store.index_to_docstore_id
+        return [
+            self.vector_store.docstore.search(id_map[i]) for i in range(len(id_map))
+        ]
+
+    def _save_vector_store(self, index_dir: str) -> None:
+        self.vector_store.save_local(folder_path=self.index_path)
+        # Indexes for older metadata or embedding models will never be loaded again
+        for entry in os.listdir(index_dir):
+            stale_path = join(index_dir, entry)
+            if stale_path != self.index_path and os.path.exists(
+                join(stale_path, "index.faiss")
+            ):
+                shutil.rmtree(stale_path)
+        logger.info(f"Vector store saved to {self.index_path}")
+
     def _create_prompt(self) -> PromptTemplate:
         schema_descriptions = get_schema_descriptions()
+        # Only the fields that actually reach the context need explaining
+        fields = self.context_fields or list(schema_descriptions)
 
         text_descriptions = "\n".join(
             [
                 f"- {field}: {schema_descriptions.get(field, ' ')}"
-                for field in schema_descriptions
+                for field in fields
+                if field in schema_descriptions
             ]
         )
         prompt = f"""
             You are Mairio, an AI assistant built to answer questions about video game soundtracks.
             You will both intelligently answer questions about the soundtrack, or retrieve the soundtrack file if the user asks.
+            Soundtrack files are served at /tracks/<track name>, so link that path when the user asks for a file.
             You are currently loaded with the original Super Mario Bros (1985) soundtrack.
             Always answer in human-readable text and language. Never return in another format.
             Use the following pieces of context to answer the question at the end.
@@ -0,0 +1,195 @@
+import re
+import math
+import logging
+from typing import NamedTuple, Optional
+from mir.metadata_model import AudioMetadataCollection
+from llm.filters import MetadataFilter, MetadataIndex
+
+logger = logging.getLogger(__name__)
+
+# Intents answered directly from the metadata; anything else goes to the LLM
+LOOKUP = "lookup"
+COUNT = "count"
+LIST = "list"
+OPEN = "open"
+
+# How a question names each field, longest phrases first
+FIELD_WORDS = {
+    "sampling rate": "sampling_rate",
+    "sample rate": "sampling_rate",
+    "spectral centroid": "spectral_centroid_mean",
+    "zero crossing": "zero_crossing_rate_mean",
+    "tonal stability": "tonal_stability",
+    "complexity": "complexity_score",
+    "brightness": "spectral_centroid_mean",
+    "loudness": "energy_mean",
+    "function": "function",
+    "energy": "energy_mean",
+    "rhythm": "rhythm_regularity",
+    "treble": "treble_contrast",
+    "tempo": "tempo",
+    "bass": "bass_contrast",
+    "mood": "mood",
+    "bpm": "tempo",
+    "key": "key",
+}
+FIELD_UNITS = {"tempo": " BPM", "sampling_rate": " Hz"}
+FIELD_PATTERN = re.compile(rf"\b({'|'.join(FIELD_WORDS)})\b")
+
+# Words that ask for judgement or explanation, which only the LLM can give;
+# "at least"/"at most" are bounds, not superlatives
+OPEN_PATTERN = re.compile(
+    r"\b(why|how does|how do|explain|describe|compare|(?<!at )most|(?<!at )least"
+    r"|best|worst|sounds? like|feel|similar)\b"
+)
+COUNT_PATTERN = re.compile(r"\b(how many|count|number of)\b")
+LIST_PATTERN = re.compile(r"\b(list|show|return|give|which|what are|name|all)\b")
+TRACK_PATTERN = re.compile(r"\b(tracks?|songs?|files?|music|soundtrack)\b")
+
+GREETING = "It's-a-me, Mairio!"
+
+
+class QueryIntent(NamedTuple):
+    intent: str
+    # Tracks the answer is about
+    names: list[str]
+    # Field asked for by a lookup
+    fields: list[str]
+    metadata_filter: Optional[MetadataFilter]
+
+
+def _normalize(text: str) -> str:
+    # "Theme_Castle(Hurry).wav" and "theme castle hurry" read the same
+    text = re.sub(r"\.wav\b", " ", text.lower())
+    return " ".join(re.sub(r"[_()\-.,?!]", " ", text).split())
+
+
+class IntentRouter:
+    """Answers deterministic questions straight from the metadata collection.
+
+    Listing, counting, filtering and "what is the <field> of <track>" questions are
+    recognised with a few patterns and answered from the collection and the
+    MetadataIndex, in milliseconds and with no outbound calls. Questions asking for
+    judgement ("most menacing", "why") are classified OPEN and left to the LLM.
+    """
+
+    def __init__(
+        self, collection: AudioMetadataCollection, metadata_index: MetadataIndex
+    ):
+        self.collection = collection
+        self.metadata_index = metadata_index
+        # Longest names first so "Theme_Castle(Hurry)" wins over "Theme_Castle"
+        self._track_patterns = [
+            (name, re.compile(rf"\b{re.escape(_normalize(name))}\b"))
+            for name in sorted(collection.keys(), key=len, reverse=True)
+        ]
+
+    def classify(self, query: str) -> QueryIntent:
+        text = query.lower()
+        if OPEN_PATTERN.search(text):
+            return QueryIntent(OPEN, [], [], None)
+        # "not effects" asks for a complement the patterns below would invert
+        if self.metadata_index.negated(query):
+            return QueryIntent(OPEN, [], [], None)
+
+        names = self._mentioned_tracks(query)
+        fields = list(
+            dict.fromkeys(FIELD_WORDS[word] for word in FIELD_PATTERN.findall(text))
+        )
+        if names and fields:
+            return QueryIntent(LOOKUP, names, fields, None)
+
+        metadata_filter = self.metadata_index.parse(query)
+        if metadata_filter is None and not TRACK_PATTERN.search(text):
+            return QueryIntent(OPEN, [], [], None)
+        matches = (
+            list(self.collection.keys())
+            if metadata_filter is None
+            else self.metadata_index.filter(metadata_filter)
+        )
+        if COUNT_PATTERN.search(text):
+            return QueryIntent(COUNT, matches, [], metadata_filter)
+        # Without a filter, only an explicit "all tracks" is a listing
+        if LIST_PATTERN.search(text) and (
+            metadata_filter is not None or re.search(r"\ball\b", text)
+        ):
+            return QueryIntent(LIST, matches, [], metadata_filter)
+        return QueryIntent(OPEN, [], [], None)
+
+    def answer(self, query_intent: QueryIntent) -> str:
+        intent, names, fields, metadata_filter = query_intent
+        if intent == LOOKUP:
+            lines = [
+                f"The {field.replace('_', ' ')} of {name} is "
+                f"{self._format(field, getattr(self.collection[name], field))}."
+                for name in names
+                for field in fields
+            ]
+            return "\n".join([GREETING] + lines)
+
+        condition = self._describe(metadata_filter)
+        if intent in (COUNT, LIST) and not names:
+            return f"{GREETING} I don't have any tracks{condition}."
+        noun = "track" if len(names) == 1 else "tracks"
+        if intent == COUNT:
+            return f"{GREETING} I have {len(names)} {noun}{condition}."
+        if intent == LIST:
+            verb = "is" if len(names) == 1 else "are"
+            listing = "\n".join(f"- {name}" for name in names)
+            return (
+                f"{GREETING} Here {verb} the {len(names)} {noun}{condition}:\n{listing}"
+            )
+        raise ValueError(f"{intent} queries are answered by the LLM")
+
+    def _mentioned_tracks(self, query: str) -> list[str]:
+        text = _normalize(query)
+        names = []
+        for name, pattern in self._track_patterns:
+            if pattern.search(text):
+                names.append(name)
+                text = pattern.sub(" ", text)
+        return sorted(names, key=self.metadata_index.position)
+
+    @staticmethod
+    def _format(field: str, value) -> str:
+        if isinstance(value, float):
+            value = f"{value:.4g}"
+        return f"{value}{FIELD_UNITS.get(field, '')}"
+
+    @staticmethod
+    def _describe(metadata_filter: Optional[MetadataFilter]) -> str:
+        if metadata_filter is None:
+            return ""
+        conditions = [
+            f"{field} {' or '.join(sorted(values))}"
+            for field, values in metadata_filter.equals.items()
+        ]
+        for field, (low, high) in metadata_filter.ranges.items():
+            label = field.replace("_", " ")
+            # Strict bounds were stepped inwards by one float; step back to print them
+            low_strict = (field, "low") in metadata_filter.strict
+            high_strict = (field, "high") in metadata_filter.strict
+            if low_strict:
+                low = math.nextafter(low, -math.inf)
+            if high_strict:
+                high = math.nextafter(high, math.inf)
+            if low is not None and high is not None and not (low_strict or high_strict):
+                conditions.append(f"{label} between {low:g} and {high:g}")
+            elif low is not None and high is not None:
+                conditions.append(
+                    f"{label} {'above' if low_strict else 'of at least'} {low:g} "
+                    f"and {'below' if high_strict else 'at most'} {high:g}"
+                )
+            elif low is not None:
+                conditions.append(
+                    f"{label} above {low:g}"
+                    if low_strict
+                    else f"{label} of {low:g} or more"
+                )
+            else:
+                conditions.append(
+                    f"{label} below {high:g}"
+                    if high_strict
+                    else f"{label} of {high:g} or less"
+                )
+        return " with " + " and ".join(conditions)
@@ -0,0 +1,149 @@
+import re
+import time
+import asyncio
+import hashlib
+import logging
+from typing import Any, AsyncIterator, Iterator, Optional
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+logger = logging.getLogger(__name__)
+
+GOOGLE = "google"
+# Runs entirely in-process, for load tests and offline development
+STUB = "stub"
+PROVIDERS = (GOOGLE, STUB)
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic local embeddings: a signed bag of hashed words, L2-normalized.
+
+    Texts sharing words land close together, so retrieval and the semantic
+    response cache behave plausibly without any network calls.
+    """
+
+    def __init__(self, size: int = 768):
+        self.size = size
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        # Texts with no words still need a valid unit vector for the FAISS index
+        if norm == 0:
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm).tolist()
+
+
+class StubChatModel(BaseChatModel):
+    """Local chat model that answers with a canned reply or echoes its prompt.
+
+    `latency` is slept before answering (asynchronously on the async paths) to
+    stand in for a remote model, and streamed replies arrive word by word.
+    """
+
+    mode: str = "canned"
+    response: str = "It's-a-me, Mairio! This answer comes from the local stub model."
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "mairio-stub"
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency)
+        for token in self._tokens(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency)
+        for token in self._tokens(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    def _reply(self, messages: list[BaseMessage]) -> str:
+        # Echoed replies grow with the retrieved context, like real answers do
+        if self.mode == "echo":
+            return str(messages[-1].content)
+        return self.response
+
+    def _result(self, messages: list[BaseMessage]) -> ChatResult:
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _tokens(self, messages: list[BaseMessage]) -> list[str]:
+        # Keeps the whitespace, so joined tokens equal the full reply
+        return re.findall(r"\s*\S+\s*", self._reply(messages))
+
+
+def create_chat_model(provider: str, model: str, **options) -> BaseChatModel:
+    if provider == GOOGLE:
+        from langchain.chat_models import init_chat_model
+
+        return init_chat_model(model=model, model_provider="google_genai", **options)
+    if provider == STUB:
+        return StubChatModel(**options)
+    raise ValueError(f"Unknown provider {provider!r}, expected one of {PROVIDERS}")
+
+
+def create_embeddings(provider: str, model: str, **options) -> Embeddings:
+    if provider == GOOGLE:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=model, **options)
+    if provider == STUB:
+        return HashEmbeddings(**options)
+    raise ValueError(f"Unknown provider {provider!r}, expected one of {PROVIDERS}")
@@ -0,0 +1,168 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import numpy as np
+from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse(NamedTuple):
+    result: dict
+    # Query embedding, L2-normalised; None when only the exact tier holds it
+    vector: Optional[NDArray]
+    created: float
+    # How long the original answer took, credited back on every hit
+    latency: float
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class ResponseCache:
+    """Exact-match and semantic cache of /chat answers.
+
+    A repeated question is found by its normalised text. A reworded one is found
+    by the cosine similarity of its query embedding to the cached questions,
+    answered from the cache when it reaches `threshold`. Entries expire after
+    `ttl` seconds, the least recently used is evicted past `max_entries`, and
+    everything is dropped when the `version` (a hash of the metadata file) changes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        ttl: float = 3600.0,
+        max_entries: int = 512,
+        version: str = "",
+    ):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version = version
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        # Stacked query vectors for the semantic tier, rebuilt after any change
+        self._matrix: Optional[tuple[list[str], NDArray]] = None
+        self.stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def summary(self) -> dict:
+        return {
+            **self.stats,
+            "hit_ratio": self.hit_ratio,
+            "entries": len(self),
+            "version": self.version,
+        }
+
+    def validate(self, version: str) -> None:
+        """Drops every entry if the metadata or index behind them has changed."""
+        if version != self.version:
+            if self._entries:
+                logger.info(f"Index changed, dropping {len(self)} cached responses")
+            self.clear()
+            self.version = version
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+
+    def get_exact(self, query: str) -> Optional[dict]:
+        key = normalize_query(query)
+        entry = self._live(key)
+        if entry is None:
+            return None
+        self.stats["exact_hits"] += 1
+        return self._hit(key, entry)
+
+    def get_similar(self, vector: list[float]) -> Optional[dict]:
+        """The cached answer whose question is closest to `vector`, if close enough."""
+        self._expire()
+        if not self._entries:
+            self.stats["misses"] += 1
+            return None
+        keys, matrix = self._semantic_matrix()
+        if not keys:
+            self.stats["misses"] += 1
+            return None
+        scores = matrix @ self._unit(vector)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.stats["misses"] += 1
+            return None
+        self.stats["semantic_hits"] += 1
+        logger.info(f"Semantic cache hit (similarity {scores[best]:.3f})")
+        return self._hit(keys[best], self._entries[keys[best]])
+
+    def put(
+        self,
+        query: str,
+        result: dict,
+        latency: float,
+        vector: Optional[list[float]] = None,
+    ) -> None:
+        key = normalize_query(query)
+        self._entries[key] = CachedResponse(
+            result=result,
+            vector=None if vector is None else self._unit(vector),
+            created=time.monotonic(),
+            latency=latency,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def _hit(self, key: str, entry: CachedResponse) -> dict:
+        self._entries.move_to_end(key)
+        self.stats["saved_seconds"] += entry.latency
+        return entry.result
+
+    def _live(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created > self.ttl:
+            del self._entries[key]
+            self._matrix = None
+            return None
+        return entry
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if now - entry.created > self.ttl
+        ]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def _semantic_matrix(self) -> tuple[list[str], NDArray]:
+        if self._matrix is None:
+            keys = [
+                key for key, entry in self._entries.items() if entry.vector is not None
+            ]
+            vectors = [self._entries[key].vector for key in keys]
+            self._matrix = (keys, np.vstack(vectors) if vectors else np.empty((0, 0)))
+        return self._matrix
+
+    @staticmethod
+    def _unit(vector: list[float]) -> NDArray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,91 @@
+import logging
+from typing import NamedTuple
+import numpy as np
+from numpy.typing import NDArray
+import faiss
+from mir.segments import SegmentStore
+
+logger = logging.getLogger(__name__)
+
+# Segment features that make up a segment's vector, each weighted equally
+SEGMENT_FIELDS = ("energy", "chroma", "mfcc")
+
+
+class SegmentMatch(NamedTuple):
+    name: str
+    start: float
+    end: float
+    similarity: float
+
+
+class SegmentIndex:
+    """Time-resolved "sounds like" search over the segments of every track.
+
+    Built like AcousticIndex: each field is z-scored across all segments and
+    scaled by 1/sqrt(width), and the L2-normalised rows go into an inner-product
+    FAISS index, so matches come back as a track and timestamp with a cosine
+    similarity.
+    """
+
+    def __init__(self, store: SegmentStore):
+        self.store = store
+        self.vectors = self._build_vectors(store=store)
+        self.index = faiss.IndexFlatIP(self.vectors.shape[1])
+        self.index.add(self.vectors)
+        logger.info(
+            f"Segment index built over {len(store)} segments of "
+            f"{len(store.names)} tracks"
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.store
+
+    def similar(
+        self, name: str, seconds: float, k: int = 5, other_tracks: bool = False
+    ) -> list[SegmentMatch]:
+        """Segments that sound like the one playing in `name` at `seconds`."""
+        row = self.store.row_at(name=name, seconds=seconds)
+        rows = self.store.rows(name)
+        # Over-fetch by as many rows as the filter below may drop
+        skipped = rows.stop - rows.start if other_tracks else 1
+        matches = self._search(vector=self.vectors[row], k=k + skipped)
+        return [
+            match
+            for match_row, match in matches
+            if match_row != row and not (other_tracks and match.name == name)
+        ][:k]
+
+    def search(self, vector: NDArray, k: int = 5) -> list[SegmentMatch]:
+        return [match for _, match in self._search(vector=vector, k=k)]
+
+    def _search(self, vector: NDArray, k: int) -> list[tuple[int, SegmentMatch]]:
+        query = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        scores, rows = self.index.search(query, min(k, len(self.store)))
+        start, end = self.store.columns["start"], self.store.columns["end"]
+        return [
+            (
+                int(row),
+                SegmentMatch(
+                    name=self.store.track_of(row),
+                    start=round(float(start[row]), 3),
+                    end=round(float(end[row]), 3),
+                    similarity=float(score),
+                ),
+            )
+            for score, row in zip(scores[0], rows[0])
+            if row >= 0
+        ]
+
+    @staticmethod
+    def _build_vectors(store: SegmentStore) -> NDArray:
+        blocks = []
+        for field in SEGMENT_FIELDS:
+            block = np.asarray(store.columns[field], dtype=np.float64)
+            block = block.reshape(len(block), -1)
+            std = block.std(axis=0)
+            block = (block - block.mean(axis=0)) / np.where(std > 0, std, 1.0)
+            blocks.append(block / np.sqrt(block.shape[1]))
+        vectors = np.hstack(blocks)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
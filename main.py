@@ -6,7 +6,9 @@ from mir.pipeline import AudioPipeline
 
 load_dotenv()
 
-api_key = os.environ["GOOGLE_API_KEY"]
+# "stub" swaps Gemini for deterministic local models, e.g. for load tests
+provider = os.environ.get("MAIRIO_PROVIDER", "google")
+api_key = os.environ["GOOGLE_API_KEY"] if provider == "google" else ""
 
 
 def setup_logging(level=logging.INFO):
@@ -26,12 +28,35 @@ if __name__ == "__main__":
     # pprint(get_schema_descriptions())
 
     # AudioPipeline extracts metadata from our audio files and creates a json for our client to parse
-    audio_pipeline = AudioPipeline(audio_files=audio_files)
+    # Extraction is spread across every available core when the cache needs rebuilding
+    audio_pipeline = AudioPipeline(audio_files=audio_files, workers=os.cpu_count())
     audio_metadata_path = audio_pipeline.create_metadata_json()
+    # Columnar copy of the same metadata for fast, vectorized corpus-wide lookups
+    feature_store_path = audio_pipeline.create_feature_store()
+    # Landmark hashes of every track, so POST /identify can name recorded clips
+    fingerprint_index_path = audio_pipeline.create_fingerprint_index(
+        workers=os.cpu_count()
+    )
+    # Segment mode (MAIRIO_SEGMENTS=1) adds time-resolved search within tracks
+    segment_store_path = None
+    if os.environ.get("MAIRIO_SEGMENTS") == "1":
+        segment_store_path = audio_pipeline.create_segment_store(workers=os.cpu_count())
 
     # GeminiApp initializes both our FastAPI endpoint and our GeminiClient (our llm class)
     # GeminiClient (accessed through GeminiApp.client) takes the json and sets up a vector store so we can search throughout it
-    app = GeminiApp(api_key=api_key, audio_metadata_path=audio_metadata_path)
+    # The server accepts connections immediately; the client loads in the background, tracked by /readyz
+    # MAIRIO_TRACE=1 logs a per-stage timing breakdown for every request
+    app = GeminiApp(
+        api_key=api_key,
+        audio_metadata_path=audio_metadata_path,
+        trace_requests=os.environ.get("MAIRIO_TRACE") == "1",
+        client_options={
+            "provider": provider,
+            "segment_store_path": segment_store_path,
+            "feature_store_path": feature_store_path,
+            "fingerprint_index_path": fingerprint_index_path,
+        },
+    )
     app.run()
 
     # question1 = "Return all the songs that are C Major."
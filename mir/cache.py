@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import logging
+from os.path import join
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extract_features changes its outputs so cached tracks are re-extracted.
+# Lives here rather than in mir.process so checking the cache never imports librosa.
+EXTRACTOR_VERSION = "4"
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    """Content hash of a file, read in chunks so large WAVs never sit in memory."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MetadataCache:
+    """Per-file manifest that decides which tracks need (re-)extraction.
+
+    Each entry records the content hash of the audio file and the extractor version
+    that produced its features. A track is reused from the metadata cache only when
+    both still match; size and mtime are kept so unchanged files skip re-hashing.
+    """
+
+    def __init__(self, manifest_path: str, music_dir: str, extractor_version: str):
+        self.manifest_path = manifest_path
+        self.music_dir = music_dir
+        self.extractor_version = extractor_version
+        self.entries: dict[str, dict] = self._load_manifest()
+        # Set when partition() seeded a missing manifest from existing metadata
+        self.bootstrapped = False
+        # Entries hashed by the latest partition(), persisted on commit()
+        self._pending: dict[str, dict] = {}
+
+    def partition(
+        self, audio_files: list[str], cached_metadata: dict
+    ) -> tuple[list[str], list[str], list[str]]:
+        """Splits the catalogue into (fresh, stale, removed) track names.
+
+        fresh:   unchanged and present in the cached metadata, safe to reuse
+        stale:   new or modified since the last extraction, must be processed
+        removed: cached but no longer part of the catalogue, to be pruned
+
+        Without a manifest (e.g. a fresh checkout) the cached metadata is taken as
+        current for every file it covers, and only tracks a previous manifest
+        recorded are ever pruned, so shipped metadata without audio is kept.
+        """
+        fresh, stale = [], []
+        self._pending = {}
+        if not self.entries and cached_metadata:
+            self._bootstrap(audio_files=audio_files, cached_metadata=cached_metadata)
+        for file in audio_files:
+            entry = self._current_entry(file=file)
+            self._pending[file] = entry
+            cached_entry = self.entries.get(file, {})
+            if (
+                file in cached_metadata
+                and cached_entry.get("hash") == entry["hash"]
+                and cached_entry.get("extractor_version") == self.extractor_version
+            ):
+                fresh.append(file)
+            else:
+                stale.append(file)
+        catalogue = set(audio_files)
+        removed = [
+            name
+            for name in cached_metadata
+            if name not in catalogue and name in self.entries
+        ]
+        logger.info(
+            f"Metadata cache: {len(fresh)} unchanged, {len(stale)} new/modified, "
+            f"{len(removed)} removed"
+        )
+        return fresh, stale, removed
+
+    def catalogue_digest(self) -> str:
+        """Hash of the catalogue as last partitioned, file contents and extractor.
+
+        Stores derived from the catalogue save it with their settings, so a later
+        run can tell whether they are current without any in-memory state.
+        """
+        digest = hashlib.blake2b(self.extractor_version.encode(), digest_size=16)
+        for file in sorted(self._pending):
+            digest.update(f"\0{file}\0{self._pending[file]['hash']}".encode())
+        return digest.hexdigest()
+
+    def _bootstrap(self, audio_files: list[str], cached_metadata: dict) -> None:
+        self.entries = {
+            file: {
+                **self._current_entry(file=file),
+                "extractor_version": self.extractor_version,
+            }
+            for file in audio_files
+            if file in cached_metadata
+        }
+        self.bootstrapped = True
+        logger.info(
+            f"No cache manifest, trusting existing metadata for {len(self.entries)} tracks"
+        )
+
+    def commit(self, names: list[str]) -> None:
+        """Replaces the manifest with entries for `names`, as hashed by `partition`."""
+        self.entries = {
+            name: {**self._pending[name], "extractor_version": self.extractor_version}
+            for name in names
+            if name in self._pending
+        }
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        with open(self.manifest_path, "w") as f:
+            json.dump(self.entries, f, indent=4)
+        logger.info(f"Metadata cache manifest written to {self.manifest_path}")
+
+    def _current_entry(self, file: str) -> dict:
+        stat = os.stat(join(self.music_dir, file))
+        cached_entry = self.entries.get(file, {})
+        # Skip re-hashing when size and mtime are unchanged since the last run
+        if (
+            cached_entry.get("size") == stat.st_size
+            and cached_entry.get("mtime_ns") == stat.st_mtime_ns
+            and "hash" in cached_entry
+        ):
+            digest = cached_entry["hash"]
+        else:
+            digest = file_digest(join(self.music_dir, file))
+        return {"hash": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _load_manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable cache manifest: {e}")
+            return {}
@@ -1,76 +1,381 @@
 import logging
-from tqdm import tqdm
+from typing import Optional
+import numpy as np
+from numpy.typing import NDArray
+from mir.metrics import timed
+from mir.store import FeatureStore
+from mir.streaming import RunningStats
 
 logger = logging.getLogger(__name__)
 
+# Features the mood rules compare against the catalogue averages, in column order
+MOOD_FEATURES = ("energy_mean", "tempo", "complexity_score", "tonal_stability")
+ENERGY, TEMPO, COMPLEXITY, TONALITY = range(len(MOOD_FEATURES))
+MOODS = ("energetic", "triumphant", "mysterious", "balanced")
+BALANCED = MOODS.index("balanced")
+# Name fragments mapped to in-game functions, checked in this order
+FUNCTION_KEYWORDS = (
+    ("complete", "victory"),
+    ("game_over", "game_over"),
+    ("lost_life", "game_over"),
+    ("theme", "background"),
+    ("effect", "effect"),
+    ("hurry", "hurry"),
+)
+
+# Mood models: rules compare each track to the running averages, knn votes among
+# the nearest already-labelled tracks, so adding tracks never relabels others
+RULES = "rules"
+KNN = "knn"
+MOOD_MODELS = (RULES, KNN)
+
+
+def rule_moods(features: NDArray, means: NDArray) -> NDArray:
+    """Mood codes (indexes into MOODS) of each row of a MOOD_FEATURES matrix."""
+    above = features > means
+    below = features < means
+    return np.select(
+        [
+            above[:, ENERGY] & above[:, TEMPO] & above[:, COMPLEXITY],
+            above[:, TONALITY] & above[:, ENERGY],
+            below[:, ENERGY] & below[:, COMPLEXITY],
+        ],
+        [0, 1, 2],
+        default=BALANCED,
+    )
+
+
+def track_function(name: str) -> str:
+    functions = []
+    for keyword, function in FUNCTION_KEYWORDS:
+        if keyword in name.lower() and function not in functions:
+            functions.append(function)
+    return ",".join(functions)
+
+
+def merge_changes(earlier: dict, later: dict) -> dict:
+    """Combines two {name: (old, new)} reports, keeping the first old label."""
+    merged = dict(earlier)
+    for name, (old, new) in later.items():
+        merged[name] = (merged[name][0] if name in merged else old, new)
+    return merged
+
 
-# TODO: Replace with a more robust ML approach
 class AudioClassifier:
-    def __init__(self, audio_metadata: dict, metadata_averages: dict):
-        logger.info("Classifying audio tracks with mood and function")
-        self.moods = self._classify_mood(
-            audio_metadata=audio_metadata,
-            averages=metadata_averages,
+    """Labels tracks with a mood and an in-game function.
+
+    Mood features sit in one matrix, one row per track, next to running
+    averages of its columns, and each rule is evaluated on whole columns at
+    once. A sorted copy of each column means that, when `add` or `remove` moves
+    the averages, only the tracks whose value lies between the old and new
+    average are re-evaluated, rather than the whole catalogue. Both methods
+    return exactly the existing tracks whose mood changed.
+
+    Row arrays grow geometrically, but the sorted columns are still shifted
+    once per batch, so a batch over N tracks costs one O(N) memmove per column;
+    what scales with the batch is the number of tracks whose rules are run.
+
+    With `model=KNN` new tracks take the majority mood of their `k` nearest
+    labelled tracks (z-scored features) instead, and existing moods never
+    change. The first batch, with nothing labelled yet, is seeded by the rules.
+    """
+
+    def __init__(
+        self, audio_metadata: Optional[dict] = None, model: str = RULES, k: int = 5
+    ):
+        if model not in MOOD_MODELS:
+            raise ValueError(
+                f"Unknown mood model {model}, expected one of {MOOD_MODELS}"
+            )
+        self.model = model
+        self.k = k
+        self.stats = RunningStats(width=len(MOOD_FEATURES))
+        self._rows: dict[str, int] = {}
+        self._names: list[str] = []
+        # Rows of removed tracks stay in place, masked out by _active, as do the
+        # spare rows past the last track
+        self._features = np.zeros((0, len(MOOD_FEATURES)))
+        self._moods = np.zeros(0, dtype=np.int8)
+        self._active = np.zeros(0, dtype=bool)
+        self._functions: list[str] = []
+        # Per feature: active values in ascending order, and the row of each
+        self._sorted_values = [np.zeros(0) for _ in MOOD_FEATURES]
+        self._sorted_rows = [np.zeros(0, dtype=np.int64) for _ in MOOD_FEATURES]
+        if audio_metadata:
+            logger.info("Classifying audio tracks with mood and function")
+            self.add(audio_metadata=audio_metadata)
+
+    @classmethod
+    def from_labelled(
+        cls, audio_metadata: dict, model: str = RULES, k: int = 5
+    ) -> "AudioClassifier":
+        """Restores a classifier from metadata that already carries its labels.
+
+        Tracks without a stored mood or function are classified as if added.
+        """
+        classifier = cls(model=model, k=k)
+        labelled = {
+            name: data
+            for name, data in audio_metadata.items()
+            if data.get("mood") in MOODS and "function" in data
+        }
+        classifier._restore(
+            names=list(labelled),
+            features=classifier._feature_matrix(labelled),
+            moods=[data["mood"] for data in labelled.values()],
+            functions=[data["function"] for data in labelled.values()],
+        )
+        unlabelled = {
+            name: data for name, data in audio_metadata.items() if name not in labelled
+        }
+        if unlabelled:
+            classifier.add(audio_metadata=unlabelled)
+        return classifier
+
+    @classmethod
+    def from_store(
+        cls, store: FeatureStore, model: str = RULES, k: int = 5
+    ) -> "AudioClassifier":
+        """Restores a classifier from the columns of a saved FeatureStore.
+
+        Reads the mood features straight from the memory-mapped columns instead
+        of building a dict per track. Unlabelled tracks are classified as if added.
+        """
+        classifier = cls(model=model, k=k)
+        features = store.matrix(list(MOOD_FEATURES))
+        moods = store.column("mood")
+        functions = store.column("function")
+        labelled = np.array(
+            [
+                mood in MOODS and function is not None
+                for mood, function in zip(moods, functions)
+            ],
+            dtype=bool,
+        ).reshape(len(store))
+        names = [str(name) for name in store.names]
+        classifier._restore(
+            names=[name for name, keep in zip(names, labelled) if keep],
+            features=features[labelled],
+            moods=moods[labelled].tolist(),
+            functions=functions[labelled].tolist(),
         )
-        self.in_game_functions = self._classify_function(audio_metadata=audio_metadata)
-        self.classified_features = {
-            name: [self.moods[name], self.in_game_functions[name]]
-            for name in audio_metadata.keys()
+        unlabelled = np.flatnonzero(~labelled)
+        if len(unlabelled):
+            classifier.add(
+                audio_metadata={
+                    names[row]: dict(zip(MOOD_FEATURES, features[row].tolist()))
+                    for row in unlabelled
+                }
+            )
+        return classifier
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    @property
+    def moods(self) -> dict[str, str]:
+        return {name: MOODS[self._moods[row]] for name, row in self._rows.items()}
+
+    @property
+    def in_game_functions(self) -> dict[str, str]:
+        return {name: self._functions[row] for name, row in self._rows.items()}
+
+    @property
+    def classified_features(self) -> dict[str, list[str]]:
+        return {
+            name: [MOODS[self._moods[row]], self._functions[row]]
+            for name, row in self._rows.items()
         }
 
+    @property
+    def averages(self) -> dict[str, float]:
+        return dict(zip(MOOD_FEATURES, self.stats.mean.tolist()))
+
     def print_features(self) -> None:
-        for name in self.classified_features.keys():
-            print(
-                f"{name}: (mood: {self.moods[name]}, function: {self.in_game_functions[name]})\n"
+        for name, (mood, function) in self.classified_features.items():
+            print(f"{name}: (mood: {mood}, function: {function})\n")
+
+    @timed("classify.add")
+    def add(self, audio_metadata: dict) -> dict[str, tuple[str, str]]:
+        """Classifies new tracks, writing "mood" and "function" into their metadata.
+
+        Returns {name: (old mood, new mood)} for the existing tracks whose mood
+        changed as the averages moved. Tracks already present are replaced.
+        """
+        replaced = [name for name in audio_metadata if name in self._rows]
+        changes = self.remove(names=replaced) if replaced else {}
+        features = self._feature_matrix(audio_metadata)
+        previous_mean = self.stats.mean.copy()
+        labelled = self.stats.count > 0
+        self.stats.update(features.T)
+        if self.model == KNN and labelled:
+            moods = self._knn_moods(features)
+        else:
+            moods = self._classify_mood(features)
+        functions = self._classify_function(names=list(audio_metadata))
+        if self.model == RULES and labelled:
+            changes = merge_changes(
+                changes, self._reevaluate(previous_mean=previous_mean)
             )
+        self._append(
+            names=list(audio_metadata),
+            features=features,
+            moods=moods,
+            functions=functions,
+        )
+        for name, data, mood, function in zip(
+            audio_metadata, audio_metadata.values(), moods, functions
+        ):
+            data["mood"] = MOODS[mood]
+            data["function"] = function
+        # A replaced track reports against its own previous mood
+        changes = merge_changes(
+            changes, {name: (None, audio_metadata[name]["mood"]) for name in replaced}
+        )
+        changes = {
+            name: change for name, change in changes.items() if change[0] != change[1]
+        }
+        if changes:
+            logger.info(
+                f"Adding {len(audio_metadata)} tracks relabelled {len(changes)}"
+            )
+        return changes
+
+    @timed("classify.remove")
+    def remove(self, names: list[str]) -> dict[str, tuple[str, str]]:
+        """Drops tracks, returning {name: (old mood, new mood)} for relabelled ones."""
+        names = [name for name in names if name in self._rows]
+        if not names:
+            return {}
+        rows = np.array([self._rows.pop(name) for name in names])
+        removed_moods = {
+            name: MOODS[mood] for name, mood in zip(names, self._moods[rows])
+        }
+        previous_mean = self.stats.mean.copy()
+        self.stats.remove(self._features[rows].T)
+        self._active[rows] = False
+        for column in range(len(MOOD_FEATURES)):
+            keep = self._active[self._sorted_rows[column]]
+            self._sorted_values[column] = self._sorted_values[column][keep]
+            self._sorted_rows[column] = self._sorted_rows[column][keep]
+        changes = (
+            self._reevaluate(previous_mean=previous_mean) if self.model == RULES else {}
+        )
+        # Removed tracks report their last mood, for add to pair with the new one
+        return {
+            **changes,
+            **{name: (mood, None) for name, mood in removed_moods.items()},
+        }
+
+    @timed("classify.mood")
+    def _classify_mood(self, features: NDArray) -> NDArray:
+        return rule_moods(features=features, means=self.stats.mean).astype(np.int8)
+
+    @timed("classify.function")
+    def _classify_function(self, names: list[str]) -> list[str]:
+        return [track_function(name) for name in names]
+
+    def _knn_moods(self, features: NDArray) -> NDArray:
+        rows = np.nonzero(self._active)[0]
+        std = np.where(self.stats.std > 0, self.stats.std, 1.0)
+        known = (self._features[rows] - self.stats.mean) / std
+        queries = (features - self.stats.mean) / std
+        distances = ((queries[:, None, :] - known[None, :, :]) ** 2).sum(axis=2)
+        k = min(self.k, len(rows))
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        votes = np.zeros((len(features), len(MOODS)), dtype=np.int64)
+        np.add.at(
+            votes,
+            (
+                np.repeat(np.arange(len(features)), k),
+                self._moods[rows][nearest].ravel(),
+            ),
+            1,
+        )
+        return votes.argmax(axis=1).astype(np.int8)
+
+    def _reevaluate(self, previous_mean: NDArray) -> dict[str, tuple[str, str]]:
+        # A rule only flips for values between the old and new average of a column
+        candidates = []
+        for column, (old, new) in enumerate(zip(previous_mean, self.stats.mean)):
+            values = self._sorted_values[column]
+            start = np.searchsorted(values, min(old, new), side="left")
+            stop = np.searchsorted(values, max(old, new), side="right")
+            candidates.append(self._sorted_rows[column][start:stop])
+        rows = np.unique(np.concatenate(candidates))
+        if not len(rows):
+            return {}
+        moods = self._classify_mood(self._features[rows])
+        flipped = moods != self._moods[rows]
+        changes = {
+            self._names[row]: (MOODS[old], MOODS[new])
+            for row, old, new in zip(
+                rows[flipped], self._moods[rows][flipped], moods[flipped]
+            )
+        }
+        self._moods[rows] = moods
+        return changes
+
+    def _restore(
+        self,
+        names: list[str],
+        features: NDArray,
+        moods: list[str],
+        functions: list[str],
+    ) -> None:
+        # Stored labels are kept as they are, only the running averages are rebuilt
+        self._append(
+            names=names,
+            features=features,
+            moods=np.array([MOODS.index(mood) for mood in moods], dtype=np.int8),
+            functions=functions,
+        )
+        self.stats.update(features.T)
+
+    def _append(
+        self, names: list[str], features: NDArray, moods: NDArray, functions: list[str]
+    ) -> None:
+        first = len(self._names)
+        stop = first + len(names)
+        if stop > len(self._active):
+            # Doubling the capacity keeps the copies amortized O(1) per track
+            capacity = max(stop, 2 * len(self._active))
+            self._features = self._grown(self._features, capacity)
+            self._moods = self._grown(self._moods, capacity)
+            self._active = self._grown(self._active, capacity)
+        rows = np.arange(first, stop)
+        self._names.extend(names)
+        self._rows.update(zip(names, rows.tolist()))
+        self._features[first:stop] = features
+        self._moods[first:stop] = moods
+        self._active[first:stop] = True
+        self._functions.extend(functions)
+        for column in range(len(MOOD_FEATURES)):
+            values = features[:, column]
+            order = np.argsort(values, kind="stable")
+            positions = np.searchsorted(self._sorted_values[column], values[order])
+            self._sorted_values[column] = np.insert(
+                self._sorted_values[column], positions, values[order]
+            )
+            self._sorted_rows[column] = np.insert(
+                self._sorted_rows[column], positions, rows[order]
+            )
+
+    @staticmethod
+    def _grown(array: NDArray, capacity: int) -> NDArray:
+        grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+        grown[: len(array)] = array
+        return grown
 
-    def _classify_mood(self, audio_metadata: dict, averages: dict) -> dict:
-        mood_dict = {}
-        for name in tqdm(audio_metadata.keys()):
-            energy = audio_metadata[name]["energy_mean"]
-            tempo = audio_metadata[name]["tempo"]
-            complexity = audio_metadata[name]["complexity_score"]
-            tonal = audio_metadata[name]["tonal_stability"]
-
-            if (
-                energy > averages["energy_mean"]
-                and tempo > averages["tempo"]
-                and complexity > averages["complexity_score"]
-            ):
-                mood = "energetic"
-            elif (
-                tonal > averages["tonal_stability"] and energy > averages["energy_mean"]
-            ):
-                mood = "triumphant"
-            elif (
-                energy < averages["energy_mean"]
-                and complexity < averages["complexity_score"]
-            ):
-                mood = "mysterious"
-            else:
-                mood = "balanced"
-            # Adding the mood value to our original audio metadata
-            audio_metadata[name]["mood"] = mood
-            # Adding the mood value to AudioClassifier's mood dictionary
-            mood_dict[name] = mood
-        return mood_dict
-
-    def _classify_function(self, audio_metadata: dict) -> dict:
-        logger.info("Enriching audio metadata with functions")
-        in_game_functions = {}
-        for name in tqdm(audio_metadata.keys()):
-            audio_functions = []  # Default
-            if "complete" in name.lower():
-                audio_functions.append("victory")
-            if "game_over" in name.lower() or "lost_life" in name.lower():
-                audio_functions.append("game_over")
-            if "theme" in name.lower():
-                audio_functions.append("background")
-            if "effect" in name.lower():
-                audio_functions.append("effect")
-            if "hurry" in name.lower():
-                audio_functions.append("hurry")
-
-            audio_metadata[name]["function"] = ",".join(audio_functions)
-            in_game_functions[name] = ",".join(audio_functions)
-        return in_game_functions
+    @staticmethod
+    def _feature_matrix(audio_metadata: dict) -> NDArray:
+        return np.array(
+            [
+                [data[feature] for feature in MOOD_FEATURES]
+                for data in audio_metadata.values()
+            ],
+            dtype=np.float64,
+        ).reshape(len(audio_metadata), len(MOOD_FEATURES))
@@ -0,0 +1,121 @@
+import logging
+from functools import cached_property
+import numpy as np
+from numpy.typing import NDArray
+import librosa
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureEngine:
+    """Computes the shared spectral intermediates of a track exactly once.
+
+    Every librosa feature used by `extract_features` used to run its own STFT (and
+    mel/onset passes) from the raw waveform. Here each intermediate is a cached
+    property, so downstream features are fed precomputed spectrograms instead.
+    Parameters mirror librosa's defaults, which keeps the outputs identical to
+    calling each feature function on the waveform directly.
+    """
+
+    def __init__(
+        self,
+        waveform: NDArray,
+        sampling_rate: int,
+        n_fft: int = 2048,
+        hop_length: int = 512,
+    ):
+        self.waveform = waveform
+        self.sampling_rate = sampling_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self._chroma: dict[int, NDArray] = {}
+        self._tuning: dict[int, float] = {}
+
+    @cached_property
+    def stft_magnitude(self) -> NDArray:
+        return np.abs(
+            librosa.stft(y=self.waveform, n_fft=self.n_fft, hop_length=self.hop_length)
+        )
+
+    @cached_property
+    def mel_spectrogram(self) -> NDArray:
+        return librosa.feature.melspectrogram(
+            S=self.stft_magnitude**2, sr=self.sampling_rate
+        )
+
+    @cached_property
+    def log_mel_spectrogram(self) -> NDArray:
+        return librosa.power_to_db(self.mel_spectrogram)
+
+    @cached_property
+    def onset_envelope(self) -> NDArray:
+        return librosa.onset.onset_strength(
+            S=self.log_mel_spectrogram, sr=self.sampling_rate
+        )
+
+    @cached_property
+    def beat_onset_envelope(self) -> NDArray:
+        # beat_track aggregates frequency bands with a median rather than a mean
+        return librosa.onset.onset_strength(
+            S=self.log_mel_spectrogram, sr=self.sampling_rate, aggregate=np.median
+        )
+
+    @cached_property
+    def pitch_candidates(self) -> tuple[NDArray, NDArray]:
+        return librosa.piptrack(S=self.stft_magnitude, sr=self.sampling_rate)
+
+    def tuning(self, bins_per_octave: int) -> float:
+        """Same estimate as `librosa.estimate_tuning`, reusing one piptrack pass."""
+        if bins_per_octave not in self._tuning:
+            pitch, magnitude = self.pitch_candidates
+            pitch_mask = pitch > 0
+            threshold = np.median(magnitude[pitch_mask]) if pitch_mask.any() else 0.0
+            self._tuning[bins_per_octave] = librosa.pitch_tuning(
+                pitch[(magnitude >= threshold) & pitch_mask],
+                bins_per_octave=bins_per_octave,
+            )
+        return self._tuning[bins_per_octave]
+
+    def chroma(self, bins_per_octave: int = 36) -> NDArray:
+        """CQT chromagram, computed once per CQT resolution."""
+        if bins_per_octave not in self._chroma:
+            self._chroma[bins_per_octave] = librosa.feature.chroma_cqt(
+                y=self.waveform,
+                sr=self.sampling_rate,
+                bins_per_octave=bins_per_octave,
+                tuning=self.tuning(bins_per_octave=bins_per_octave),
+            )
+        return self._chroma[bins_per_octave]
+
+    def beat_track(self) -> tuple[float, NDArray]:
+        tempo, beat_frames = librosa.beat.beat_track(
+            onset_envelope=self.beat_onset_envelope, sr=self.sampling_rate
+        )
+        # Newer librosa returns tempo as a 1-element array rather than a scalar
+        return float(np.atleast_1d(tempo)[0]), beat_frames
+
+    def spectral_centroid(self) -> NDArray:
+        return librosa.feature.spectral_centroid(
+            S=self.stft_magnitude, sr=self.sampling_rate
+        )
+
+    def spectral_contrast(self) -> NDArray:
+        return librosa.feature.spectral_contrast(
+            S=self.stft_magnitude, sr=self.sampling_rate
+        )
+
+    def rms(self) -> NDArray:
+        # Time-domain framing; deriving it from the windowed STFT would change the values
+        return librosa.feature.rms(y=self.waveform)
+
+    def zero_crossing_rate(self) -> NDArray:
+        return librosa.feature.zero_crossing_rate(y=self.waveform)
+
+    def mfcc(self, n_mfcc: int = 13) -> NDArray:
+        return librosa.feature.mfcc(
+            S=self.log_mel_spectrogram, sr=self.sampling_rate, n_mfcc=n_mfcc
+        )
+
+    def tonnetz(self) -> NDArray:
+        # librosa.feature.tonnetz builds its chroma with chroma_cqt's default resolution
+        return librosa.feature.tonnetz(chroma=self.chroma(), sr=self.sampling_rate)
@@ -0,0 +1,238 @@
+import os
+import io
+import json
+import logging
+from os.path import join
+from typing import NamedTuple, Optional
+import numpy as np
+from numpy.typing import NDArray
+from scipy.ndimage import maximum_filter
+import soundfile as sf
+import soxr
+from mir.store import staged_directory
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FORMAT_VERSION = 1
+# Fingerprints only need the range where melodies and effects carry energy
+SAMPLING_RATE = 11025
+N_FFT = 1024
+HOP_LENGTH = 256
+# Peaks must be the loudest point within this many (frames, frequency bins)
+PEAK_NEIGHBOURHOOD = (11, 21)
+# Peaks quieter than this, relative to the loudest bin of the recording, are noise
+PEAK_FLOOR_DB = -50.0
+# Each anchor peak pairs with up to FAN_OUT later peaks at most MAX_DELTA frames ahead
+FAN_OUT = 10
+MAX_DELTA = 63
+# Tracks are fingerprinted at this many sub-hop shifts, so a clip cut anywhere
+# lines up with one of them to within HOP_LENGTH / INDEX_PHASES samples
+INDEX_PHASES = 4
+# Parameters baked into the hashes; an index built with others is rebuilt
+FINGERPRINT_SETTINGS = {
+    "sampling_rate": SAMPLING_RATE,
+    "n_fft": N_FFT,
+    "hop_length": HOP_LENGTH,
+    "peak_neighbourhood": list(PEAK_NEIGHBOURHOOD),
+    "peak_floor_db": PEAK_FLOOR_DB,
+    "fan_out": FAN_OUT,
+    "max_delta": MAX_DELTA,
+    "index_phases": INDEX_PHASES,
+}
+
+
+class Match(NamedTuple):
+    name: str
+    # Where in the track the clip starts
+    offset_seconds: float
+    # Hash pairs that agree on that offset
+    score: int
+    # Share of the clip's hashes that agree, so longer clips aren't favoured
+    confidence: float
+
+
+def load_audio(source) -> NDArray:
+    """Decodes a file path or bytes into mono float32 at SAMPLING_RATE."""
+    data, sampling_rate = sf.read(
+        io.BytesIO(source) if isinstance(source, bytes) else source,
+        dtype="float32",
+        always_2d=True,
+    )
+    return soxr.resample(data.mean(axis=1), sampling_rate, SAMPLING_RATE)
+
+
+def spectral_peaks(waveform: NDArray) -> tuple[NDArray, NDArray]:
+    """(frame, bin) coordinates of the constellation of spectrogram peaks."""
+    if len(waveform) < N_FFT:
+        waveform = np.pad(waveform, (0, N_FFT - len(waveform)))
+    frames = np.lib.stride_tricks.sliding_window_view(waveform, N_FFT)[::HOP_LENGTH]
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(N_FFT), axis=1))
+    decibels = 20 * np.log10(magnitude + 1e-10)
+    is_peak = (decibels == maximum_filter(decibels, size=PEAK_NEIGHBOURHOOD)) & (
+        decibels > decibels.max() + PEAK_FLOOR_DB
+    )
+    times, bins = np.nonzero(is_peak)
+    return times, bins
+
+
+def fingerprint(waveform: NDArray) -> tuple[NDArray, NDArray]:
+    """Landmark hashes of a waveform and the frame each one is anchored at.
+
+    Every peak is paired with the next FAN_OUT peaks in time, and each pair is
+    packed into a uint32 as (anchor bin, target bin, frame delta). Pairs encode
+    relative timing only, so the same hashes appear wherever a clip was cut.
+    """
+    times, bins = spectral_peaks(waveform)
+    order = np.lexsort((bins, times))
+    times, bins = times[order], bins[order]
+    hashes, anchors = [], []
+    for step in range(1, FAN_OUT + 1):
+        delta = times[step:] - times[:-step]
+        valid = (delta > 0) & (delta <= MAX_DELTA)
+        hashes.append(
+            (bins[:-step][valid].astype(np.uint32) << 16)
+            | (bins[step:][valid].astype(np.uint32) << 6)
+            | delta[valid].astype(np.uint32)
+        )
+        anchors.append(times[:-step][valid])
+    return (
+        np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint32),
+        np.concatenate(anchors).astype(np.int32)
+        if anchors
+        else np.zeros(0, dtype=np.int32),
+    )
+
+
+def reference_fingerprint(waveform: NDArray) -> tuple[NDArray, NDArray]:
+    """Landmark hashes of a full track, merged across INDEX_PHASES frame grids.
+
+    Peaks move when a clip's frames straddle the track's, which costs most of
+    the matching hashes at half a hop; indexing every phase avoids that.
+    Anchors are rounded back to the unshifted grid and duplicates are dropped.
+    """
+    pairs = []
+    for phase in range(INDEX_PHASES):
+        shift = phase * HOP_LENGTH // INDEX_PHASES
+        hashes, anchors = fingerprint(waveform[shift:])
+        anchors = anchors + (2 * shift) // HOP_LENGTH
+        pairs.append((hashes.astype(np.uint64) << 32) | anchors.astype(np.uint64))
+    pairs = np.unique(np.concatenate(pairs))
+    return (pairs >> 32).astype(np.uint32), (pairs & 0xFFFFFFFF).astype(np.int32)
+
+
+def fingerprint_file(file: str, music_dir: str = r"data\music") -> tuple:
+    """Kept at module level so it can be pickled and shipped to worker processes."""
+    return reference_fingerprint(load_audio(join(music_dir, file)))
+
+
+class FingerprintIndex:
+    """Inverted index from landmark hash to (track, anchor frame).
+
+    Hashes are kept sorted in one flat array with parallel track and offset
+    arrays, so each clip hash is found by binary search rather than a scan, and
+    `save`/`load` memory-map the arrays like the other stores. A clip matches
+    the track where the most hashes agree on a single time offset.
+    """
+
+    def __init__(
+        self, names: NDArray, hashes: NDArray, tracks: NDArray, offsets: NDArray
+    ):
+        self.names = names
+        self.hashes = hashes
+        self.tracks = tracks
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def from_fingerprints(
+        cls, fingerprints: dict[str, tuple[NDArray, NDArray]]
+    ) -> "FingerprintIndex":
+        hashes = [track_hashes for track_hashes, _ in fingerprints.values()]
+        offsets = [track_offsets for _, track_offsets in fingerprints.values()]
+        tracks = [
+            np.full(len(track_hashes), position, dtype=np.int32)
+            for position, track_hashes in enumerate(hashes)
+        ]
+        hashes = np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint32)
+        order = np.argsort(hashes, kind="stable")
+        logger.info(
+            f"Fingerprint index built with {len(hashes)} hashes over "
+            f"{len(fingerprints)} tracks"
+        )
+        return cls(
+            names=np.array(list(fingerprints), dtype=str),
+            hashes=hashes[order],
+            tracks=np.concatenate(tracks)[order] if tracks else np.zeros(0, np.int32),
+            offsets=np.concatenate(offsets)[order]
+            if offsets
+            else np.zeros(0, np.int32),
+        )
+
+    def save(self, path: str, settings: Optional[dict] = None) -> str:
+        # Staged and swapped in whole, see `staged_directory`
+        with staged_directory(path) as staging:
+            for column in ("names", "hashes", "tracks", "offsets"):
+                np.save(join(staging, f"{column}.npy"), getattr(self, column))
+            manifest = {
+                "version": FINGERPRINT_FORMAT_VERSION,
+                "settings": settings or {},
+            }
+            with open(join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+        logger.info(f"Fingerprint index written to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FingerprintIndex":
+        manifest = cls.manifest(path)
+        if manifest.get("version") != FINGERPRINT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported fingerprint index version {manifest.get('version')} "
+                f"at {path}"
+            )
+        mmap_mode = "r" if mmap else None
+        return cls(
+            **{
+                column: np.load(join(path, f"{column}.npy"), mmap_mode=mmap_mode)
+                for column in ("names", "hashes", "tracks", "offsets")
+            }
+        )
+
+    @staticmethod
+    def manifest(path: str) -> dict:
+        with open(join(path, "manifest.json"), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(join(path, "manifest.json"))
+
+    def identify(self, waveform: NDArray, min_score: int = 5) -> Optional[Match]:
+        """The track a mono SAMPLING_RATE clip was cut from, or None."""
+        clip_hashes, clip_offsets = fingerprint(waveform)
+        if not len(clip_hashes):
+            return None
+        starts = np.searchsorted(self.hashes, clip_hashes, side="left")
+        counts = np.searchsorted(self.hashes, clip_hashes, side="right") - starts
+        total = int(counts.sum())
+        if not total:
+            return None
+        # Row of every (clip hash, index entry) pair sharing a hash
+        rows = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        deltas = self.offsets[rows].astype(np.int64) - np.repeat(clip_offsets, counts)
+        # A true match lines up many pairs at one (track, offset)
+        votes = (self.tracks[rows].astype(np.int64) << 32) | (deltas + (1 << 31))
+        candidates, score = np.unique(votes, return_counts=True)
+        best = int(np.argmax(score))
+        if score[best] < min_score:
+            return None
+        track = int(candidates[best] >> 32)
+        delta = int(candidates[best] & 0xFFFFFFFF) - (1 << 31)
+        return Match(
+            name=str(self.names[track]),
+            offset_seconds=round(delta * HOP_LENGTH / SAMPLING_RATE, 3),
+            score=int(score[best]),
+            confidence=round(float(score[best]) / len(clip_hashes), 3),
+        )
@@ -0,0 +1,86 @@
+import logging
+from typing import NamedTuple
+import numpy as np
+from numpy.typing import NDArray
+
+logger = logging.getLogger(__name__)
+
+PITCHES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+KEYS = [pitch + " Major" for pitch in PITCHES] + [pitch + " Minor" for pitch in PITCHES]
+
+# Krumhansl-Schmuckler key profiles
+MAJOR_PROFILE = np.array(
+    [6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88]
+)
+MINOR_PROFILE = np.array(
+    [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]
+)
+
+
+class KeyEstimate(NamedTuple):
+    keys: list[str]
+    # Pearson correlation with every key, in KEYS order: shape (..., 24)
+    correlations: NDArray
+    # Margin between the best and second-best correlation: shape (...)
+    confidence: NDArray
+
+
+def _standardize(values: NDArray) -> NDArray:
+    centered = values - values.mean(axis=-1, keepdims=True)
+    std = centered.std(axis=-1, keepdims=True)
+    # Flat chroma (e.g. silence) correlates with nothing rather than producing NaN
+    return np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+
+
+class KeyEstimator:
+    """Vectorized Krumhansl-Schmuckler key estimation.
+
+    All 24 rotated major and minor profiles are stacked into one (24, 12) matrix, so
+    scoring any number of chroma vectors is a single matrix product.
+    """
+
+    def __init__(self, precision: int = 3):
+        # Correlations are rounded before picking the key, as the original estimator did
+        self.precision = precision
+        profiles = np.stack(
+            [np.roll(MAJOR_PROFILE, shift) for shift in range(12)]
+            + [np.roll(MINOR_PROFILE, shift) for shift in range(12)]
+        )
+        self._profiles = _standardize(profiles)
+
+    def correlations(self, chroma: NDArray) -> NDArray:
+        """Correlates chroma vectors of shape (..., 12) with every key: (..., 24)."""
+        chroma = np.asarray(chroma, dtype=np.float64)
+        scores = _standardize(chroma) @ self._profiles.T / chroma.shape[-1]
+        return np.round(scores, self.precision)
+
+    def estimate(self, chroma: NDArray) -> KeyEstimate:
+        """Estimates the key of one (12,) or many (n, 12) chroma vectors at once."""
+        correlations = self.correlations(chroma)
+        best = np.argmax(correlations, axis=-1)
+        top_two = np.sort(correlations, axis=-1)[..., -2:]
+        confidence = np.round(top_two[..., 1] - top_two[..., 0], self.precision)
+        keys = [KEYS[i] for i in np.atleast_1d(best)]
+        return KeyEstimate(keys=keys, correlations=correlations, confidence=confidence)
+
+    def estimate_windows(
+        self, chromagram: NDArray, window: int, hop: int | None = None
+    ) -> KeyEstimate:
+        """Tracks modulations by estimating a key per sliding window of chroma frames.
+
+        `chromagram` has shape (12, frames); windows of `window` frames are summed
+        and scored together in one batch.
+        """
+        hop = hop or window
+        n_frames = chromagram.shape[-1]
+        if n_frames <= window:
+            starts = np.array([0])
+        else:
+            starts = np.arange(0, n_frames - window + 1, hop)
+        # Window sums via a cumulative sum, so overlapping windows cost nothing extra
+        cumulative = np.concatenate(
+            [np.zeros((12, 1)), np.cumsum(chromagram, axis=-1)], axis=-1
+        )
+        stops = np.minimum(starts + window, n_frames)
+        window_chroma = (cumulative[:, stops] - cumulative[:, starts]).T
+        return self.estimate(window_chroma)
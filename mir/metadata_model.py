@@ -1,5 +1,10 @@
-from typing_extensions import Annotated, List, Optional
-from pydantic import BaseModel, RootModel, Field
+import os
+import logging
+from typing_extensions import Annotated, Dict, Iterator, List, Optional
+from pydantic import BaseModel, RootModel, Field, TypeAdapter, ValidationError
+from pydantic_core import from_json
+
+logger = logging.getLogger(__name__)
 
 
 def get_schema_descriptions() -> dict:
@@ -185,6 +190,21 @@ class AudioMetadata(BaseModel):
             description="Mean chromagram values for each pitch class, useful for key detection",
         ),
     ]
+    key_correlations: Annotated[
+        Optional[Dict[str, float]],
+        Field(
+            None,
+            description="Correlation of the track's chroma with each of the 24 major and minor Krumhansl-Schmuckler key profiles",
+        ),
+    ]
+    key_confidence: Annotated[
+        Optional[float],
+        Field(
+            None,
+            description="Margin between the best and second-best key correlations. Higher values indicate a more certain key estimate",
+            ge=0.0,
+        ),
+    ]
 
 
 class AudioMetadataCollection(RootModel):
@@ -199,10 +219,112 @@ class AudioMetadataCollection(RootModel):
     def items(self):
         return self.root.items()
 
+    def in_key(self, key: str, min_confidence: float = 0.0) -> list[str]:
+        """Track names estimated to be in `key` with at least `min_confidence`"""
+        return [
+            name
+            for name, track in self.root.items()
+            if track.key == key and (track.key_confidence or 0.0) >= min_confidence
+        ]
+
     def keys(self):
         """Get all track names"""
         return self.root.keys()
 
     def values(self):
         """Get all track metadata"""
-        return self.__root__.values()
+        return self.root.values()
+
+    @classmethod
+    def validate_records(cls, records: dict[str, dict]) -> "AudioMetadataCollection":
+        """Validates every track in one pass, dropping (and logging) invalid ones."""
+        try:
+            return cls.model_construct(root=TRACKS_ADAPTER.validate_python(records))
+        except ValidationError as e:
+            errors = [error for error in e.errors() if error["loc"]]
+            if not errors:
+                raise
+            invalid = {error["loc"][0] for error in errors}
+            for error in errors:
+                logger.error(
+                    f"Validation error for track {error['loc'][0]}: "
+                    f"{'.'.join(map(str, error['loc'][1:]))}: {error['msg']}"
+                )
+        valid = {name: data for name, data in records.items() if name not in invalid}
+        return cls.model_construct(root=TRACKS_ADAPTER.validate_python(valid))
+
+    def save(self, path: str) -> str:
+        """Writes compact JSON through a partial file, so readers never see half of it."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = f"{path}.partial"
+        with open(partial, "wb") as f:
+            f.write(TRACKS_ADAPTER.dump_json(self.root))
+        os.replace(partial, path)
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "AudioMetadataCollection":
+        """Reads and validates a collection in one pass over the whole file.
+
+        Files this pipeline wrote are validated too: model_construct measured
+        slower per track than pydantic-core validation, so trusting them saves
+        nothing. Use `open` when only some tracks are needed.
+        """
+        with open(path, "rb") as f:
+            return cls.model_construct(root=TRACKS_ADAPTER.validate_json(f.read()))
+
+    @classmethod
+    def open(cls, path: str) -> "LazyMetadataCollection":
+        """Parses a collection without validating it; tracks are validated on access."""
+        with open(path, "rb") as f:
+            return LazyMetadataCollection(records=from_json(f.read()))
+
+
+class LazyMetadataCollection:
+    """Read-only view of a saved collection that validates each track on first access.
+
+    Parsing alone is a fraction of a full `AudioMetadataCollection.load`, so
+    callers that look up a few tracks skip validating the rest. An invalid track
+    raises ValidationError when it is accessed, not when the file is opened.
+    """
+
+    def __init__(self, records: dict[str, dict]):
+        self._records = records
+        self._tracks: dict[str, AudioMetadata] = {}
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._records
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._records)
+
+    def __getitem__(self, name: str) -> AudioMetadata:
+        track = self._tracks.get(name)
+        if track is None:
+            track = AudioMetadata.model_validate(self._records[name])
+            self._tracks[name] = track
+        return track
+
+    def get(self, name: str, default=None) -> Optional[AudioMetadata]:
+        return self[name] if name in self._records else default
+
+    def keys(self):
+        return self._records.keys()
+
+    def items(self) -> Iterator[tuple[str, AudioMetadata]]:
+        for name in self._records:
+            yield name, self[name]
+
+    def values(self) -> Iterator[AudioMetadata]:
+        for name in self._records:
+            yield self[name]
+
+    def materialize(self) -> AudioMetadataCollection:
+        """Validates the remaining tracks into a full collection."""
+        return AudioMetadataCollection.model_construct(root=dict(self.items()))
+
+
+TRACKS_ADAPTER = TypeAdapter(dict[str, AudioMetadata])
@@ -1,99 +1,332 @@
 import os
-import json
 import logging
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import Optional
-from pydantic import ValidationError
-from mir.process import AudioProcessor
-from mir.classify import AudioClassifier
-from mir.metadata_model import AudioMetadata, AudioMetadataCollection
+from pydantic_core import from_json
+from mir.cache import EXTRACTOR_VERSION, MetadataCache
+from mir.store import FeatureStore
+from mir.segments import SegmentStore
+from mir.fingerprint import FINGERPRINT_SETTINGS, FingerprintIndex, fingerprint_file
+from mir.classify import RULES, AudioClassifier, merge_changes
+from mir.metrics import timed
+from mir.metadata_model import AudioMetadataCollection
 
 logger = logging.getLogger(__name__)
 
+# Intermediate features kept out of the validated collection and metadata json
+UNSAVED_FEATURES = {
+    "waveform",
+    "tempo_scores",
+    "tempo_structure",
+    "beat_times",
+}
+
 
 class AudioPipeline:
-    def __init__(self, audio_files: list):
+    def __init__(
+        self,
+        audio_files: list,
+        workers: Optional[int] = 1,
+        music_dir: str = r"data\music",
+        streaming: bool = False,
+        mood_model: str = RULES,
+    ):
         logger.info("Initializing AudioPipeline")
         self.default_metadata_path = r"data\metadata\audio_metadata.json"
-        self.metadata_collection: Optional[AudioMetadataCollection] = None
+        self._metadata_collection: Optional[AudioMetadataCollection] = None
+        self._processor = None
+        self._classifier: Optional[AudioClassifier] = None
+        self._feature_store: Optional[FeatureStore] = None
+        self.feature_store_path = r"data\metadata\features"
+        self._cached_metadata: dict = {}
         self.audio_files = audio_files
+        self.music_dir = music_dir
+        self.mood_model = mood_model
+        self.cache = MetadataCache(
+            manifest_path=r"data\metadata\audio_cache.json",
+            music_dir=music_dir,
+            # Streamed features differ slightly, so they are cached separately
+            extractor_version=f"{EXTRACTOR_VERSION}-stream"
+            if streaming
+            else EXTRACTOR_VERSION,
+        )
 
+        cached_metadata = {}
         if os.path.exists(self.default_metadata_path):
             logger.info(
                 f"Cached metadata found at {self.default_metadata_path}, loading from file"
             )
-            audio_metadata = self._load_metadata_from_file()
-            logger.info(
-                "Initializing AudioPipeline and AudioClassifier with cached metadata"
+            cached_metadata = self._load_metadata_from_file()
+        fresh, stale, removed = self.cache.partition(
+            audio_files=audio_files, cached_metadata=cached_metadata
+        )
+        # Whether the metadata on disk no longer matches the catalogue
+        self.metadata_changed = bool(stale or removed)
+        # Saved with every derived store, which counts as current only while it matches
+        self.catalogue_digest = self.cache.catalogue_digest()
+
+        if not self.metadata_changed:
+            # The processor, classifier and validated collection are built on first
+            # use, so serving from a valid cache only needs the json path
+            logger.info("Cached metadata is current, deferring AudioProcessor")
+            self._cached_metadata = cached_metadata
+        else:
+            # Imported here so serving from a valid cache never loads librosa
+            from mir.process import AudioProcessor
+
+            logger.info(f"Extracting metadata for {len(stale)} new or modified tracks")
+            self._processor = AudioProcessor(
+                audio_files=stale,
+                workers=workers,
+                music_dir=music_dir,
+                streaming=streaming,
             )
-            self.processor = self._create_processor_from_cache(
+            # Unchanged tracks come from the cache, removed tracks are dropped; cached
+            # tracks without audio that no manifest recorded are kept as shipped
+            audio_metadata = {}
+            for name in dict.fromkeys([*cached_metadata, *audio_files]):
+                if name in stale:
+                    if name in self.processor.audio_metadata:
+                        audio_metadata[name] = self.processor.audio_metadata[name]
+                elif name in cached_metadata and name not in removed:
+                    audio_metadata[name] = cached_metadata[name]
+            self.processor.audio_metadata = audio_metadata
+            self.processor.metadata_averages = self.processor._create_metadata_averages(
                 audio_metadata=audio_metadata
             )
-            self.classifier = self._create_classifier_from_cache(
-                audio_metadata=audio_metadata
+            # Cached tracks keep their labels; only the tracks the shifted averages
+            # push across a rule boundary are relabelled
+            self._classifier = AudioClassifier.from_labelled(
+                audio_metadata=cached_metadata, model=mood_model
             )
-            self.metadata_collection = self._generate_validated_metadata(
-                audio_metadata=audio_metadata
+            changes = self._classifier.remove(
+                names=[name for name in cached_metadata if name not in audio_metadata]
             )
-        else:
-            logger.info("Cached metadata not found, generating new metadata")
-            self.processor = AudioProcessor(audio_files=audio_files)
-            self.classifier = AudioClassifier(
-                audio_metadata=self.processor.audio_metadata,
-                metadata_averages=self.processor.metadata_averages,
+            changes = merge_changes(
+                changes,
+                self._classifier.add(
+                    audio_metadata={
+                        name: audio_metadata[name]
+                        for name in stale
+                        if name in audio_metadata
+                    }
+                ),
             )
-            self.metadata_collection = self._generate_validated_metadata(
+            for name, (old, new) in changes.items():
+                if name in audio_metadata and name not in stale and old != new:
+                    logger.info(f"Relabelled {name}: {old} -> {new}")
+                    audio_metadata[name]["mood"] = new
+            self._metadata_collection = self._generate_validated_metadata(
                 audio_metadata=self.processor.audio_metadata
             )
+            self.cache.commit(names=list(self.metadata_collection.keys()))
             logger.info(
                 "Initialized AudioPipeline and AudioClassifier with new metadata"
             )
 
+    @property
+    def processor(self):
+        if self._processor is None:
+            self._processor = self._create_processor_from_cache(
+                audio_metadata=self._cached_metadata
+            )
+        return self._processor
+
+    @property
+    def classifier(self) -> AudioClassifier:
+        if self._classifier is None:
+            if self.feature_store is not None:
+                self._classifier = AudioClassifier.from_store(
+                    store=self.feature_store, model=self.mood_model
+                )
+            else:
+                self._classifier = AudioClassifier.from_labelled(
+                    audio_metadata=self._cached_metadata, model=self.mood_model
+                )
+        return self._classifier
+
+    @property
+    def feature_store(self) -> Optional[FeatureStore]:
+        """The saved FeatureStore, memory-mapped, while it matches the metadata."""
+        if self._feature_store is None and self._is_current(
+            FeatureStore, self.feature_store_path, self._feature_store_settings
+        ):
+            self._feature_store = FeatureStore.load(self.feature_store_path)
+        return self._feature_store
+
+    @property
+    def _feature_store_settings(self) -> dict:
+        # Moods depend on the model as well as on the extracted features
+        return {"catalogue": self.catalogue_digest, "mood_model": self.mood_model}
+
+    @staticmethod
+    def _is_current(store_type, path: str, settings: dict) -> bool:
+        """Whether the store saved at `path` was built with exactly `settings`."""
+        return (
+            store_type.exists(path)
+            and store_type.manifest(path).get("settings") == settings
+        )
+
+    @property
+    def metadata_collection(self) -> Optional[AudioMetadataCollection]:
+        if self._metadata_collection is None and self._cached_metadata:
+            # The cached json already holds this collection, descriptions included
+            self._metadata_collection = AudioMetadataCollection.load(
+                self.default_metadata_path
+            )
+        return self._metadata_collection
+
     def create_metadata_json(self, path: str = r"data\metadata\audio_metadata.json"):
-        if os.path.exists(path):
+        if os.path.exists(path) and not self.metadata_changed:
             logger.info(f"Using cached metadata file at {path}")
+            if self.cache.bootstrapped:
+                # The metadata is already on disk, so the seeded manifest can be kept
+                self.cache.save()
+                self.cache.bootstrapped = False
             return path
         else:
-            os.makedirs(os.path.dirname(path), exist_ok=True)
             if self.metadata_collection:
-                metadata_dict = {
-                    name: model.model_dump()
-                    for name, model in self.metadata_collection.root.items()
-                }
-                with open(path, "w") as f:
-                    json.dump(metadata_dict, f, indent=4)
+                self.metadata_collection.save(path)
+                # Only record the manifest once the metadata it describes is on disk
+                self.cache.save()
+                self.metadata_changed = False
                 logger.info(f"Metadata generated at {path}")
                 return path
             else:
                 logger.error("No validated metadata collection available")
                 return ""
 
+    def create_feature_store(self, path: Optional[str] = None) -> str:
+        """Writes the columnar, memory-mappable copy of the metadata collection."""
+        path = path or self.feature_store_path
+        if path != self.feature_store_path:
+            self.feature_store_path = path
+            self._feature_store = None
+        settings = self._feature_store_settings
+        if self._is_current(FeatureStore, path, settings):
+            logger.info(f"Using cached feature store at {path}")
+            return path
+        if not self.metadata_collection:
+            logger.error("No validated metadata collection available")
+            return ""
+        store = FeatureStore.from_collection(
+            collection=self.metadata_collection, settings=settings
+        )
+        store.save(path)
+        self._feature_store = store
+        return path
+
+    def create_segment_store(
+        self,
+        path: str = r"data\metadata\segments",
+        mode: str = "beats",
+        workers: Optional[int] = 1,
+    ) -> str:
+        """Writes the time-resolved segment store used for sub-track search.
+
+        Optional, since it decodes every track a second time; skipped when the
+        store on disk matches the catalogue and `mode`.
+        """
+        settings = {
+            "mode": mode,
+            "extractor_version": EXTRACTOR_VERSION,
+            "catalogue": self.catalogue_digest,
+        }
+        if self._is_current(SegmentStore, path, settings):
+            logger.info(f"Using cached segment store at {path}")
+            return path
+        segments = self._extract_segments(mode=mode, workers=workers)
+        SegmentStore.from_segments(segments=segments, settings=settings).save(path)
+        return path
+
+    @timed("pipeline.extract_segments")
+    def _extract_segments(self, mode: str, workers: Optional[int] = 1) -> dict:
+        # Imported here so serving from a valid cache never loads librosa
+        from mir.process import extract_segments
+
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        logger.info(
+            f"Extracting {mode} segments for {len(self.audio_files)} audio tracks "
+            f"with {workers} worker(s)."
+        )
+        extractor = partial(extract_segments, music_dir=self.music_dir, mode=mode)
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(extractor, file): file for file in self.audio_files
+            }
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    results[file] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to extract segments for {file}: {e}")
+        # Results arrive in completion order, so rebuild them in catalogue order
+        return {file: results[file] for file in self.audio_files if file in results}
+
+    def create_fingerprint_index(
+        self,
+        path: str = r"data\metadata\fingerprints",
+        workers: Optional[int] = 1,
+    ) -> str:
+        """Writes the landmark hash index used to identify recorded clips.
+
+        Skipped when the index on disk matches the catalogue and the current
+        fingerprint parameters.
+        """
+        settings = {**FINGERPRINT_SETTINGS, "catalogue": self.catalogue_digest}
+        if self._is_current(FingerprintIndex, path, settings):
+            logger.info(f"Using cached fingerprint index at {path}")
+            return path
+        fingerprints = self._fingerprint_tracks(workers=workers)
+        FingerprintIndex.from_fingerprints(fingerprints=fingerprints).save(
+            path, settings=settings
+        )
+        return path
+
+    @timed("pipeline.fingerprint")
+    def _fingerprint_tracks(self, workers: Optional[int] = 1) -> dict:
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        logger.info(
+            f"Fingerprinting {len(self.audio_files)} audio tracks "
+            f"with {workers} worker(s)."
+        )
+        fingerprinter = partial(fingerprint_file, music_dir=self.music_dir)
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(fingerprinter, file): file for file in self.audio_files
+            }
+            for future in as_completed(futures):
+                file = futures[future]
+                try:
+                    results[file] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to fingerprint {file}: {e}")
+        # Results arrive in completion order, so rebuild them in catalogue order
+        return {file: results[file] for file in self.audio_files if file in results}
+
+    @timed("pipeline.validate_metadata")
     def _generate_validated_metadata(
         self, audio_metadata: dict
     ) -> AudioMetadataCollection:
         logger.info("Generating annotated, validated metadata")
-        pydantic_data = {}
-        for name, data in audio_metadata.items():
-            model_data = {}
-            for key, value in data.items():
-                if key in [
-                    "waveform",
-                    "tempo_scores",
-                    "tempo_structure",
-                    "chroma_mean",
-                    "beat_times",
-                ]:
-                    continue
-                model_data[key] = value
-            model_data["description"] = self._create_text_description(
-                name=name, metadata=data
-            )
-
-            try:
-                track_model = AudioMetadata(**model_data)
-                pydantic_data[name] = track_model
-            except ValidationError as e:
-                logger.error(f"Validation error for track {name}: {e}")
-        return AudioMetadataCollection(root=pydantic_data)
+        records = {
+            name: {
+                **{
+                    key: value
+                    for key, value in data.items()
+                    if key not in UNSAVED_FEATURES
+                },
+                "description": self._create_text_description(name=name, metadata=data),
+            }
+            for name, data in audio_metadata.items()
+        }
+        # One validation pass over the whole catalogue rather than a model per track
+        return AudioMetadataCollection.validate_records(records)
 
     def _create_text_description(self, name, metadata) -> str:
         description = (
@@ -110,8 +343,8 @@ class AudioPipeline:
     def _load_metadata_from_file(self) -> dict:
         # Load metadata from the file
         metadata = {}
-        with open(self.default_metadata_path, "r") as f:
-            metadata = json.load(f)
+        with open(self.default_metadata_path, "rb") as f:
+            metadata = from_json(f.read())
 
         # Convert the metadata in a structure synonmous with AudioProcessor.audio_metadata
         converted_metadata = {}
@@ -125,34 +358,19 @@ class AudioPipeline:
         return converted_metadata
 
     def _create_processor_from_cache(self, audio_metadata: dict):
+        from mir.process import AudioProcessor
+
         # Empty intialization of AudioProcessor
         processor = AudioProcessor.__new__(AudioProcessor)
 
         # Filling in AudioProcessor's members from our cached metadata
         processor.audio_metadata = audio_metadata
-        processor.metadata_averages = processor._create_metadata_averages(
-            audio_metadata=audio_metadata
-        )
+        if self.feature_store is not None:
+            # Column means of the saved store, without a pass over every record
+            processor.metadata_averages = self.feature_store.averages()
+        else:
+            processor.metadata_averages = processor._create_metadata_averages(
+                audio_metadata=audio_metadata
+            )
 
         return processor
-
-    def _create_classifier_from_cache(self, audio_metadata: dict):
-        # Empty intialization of AudioClassifier
-        classifier = AudioClassifier.__new__(AudioClassifier)
-
-        # Filling in AudioClassifier's members from our cached metadata
-        moods = {}
-        functions = {}
-        for name, data in audio_metadata.items():
-            if "mood" in data:
-                moods[name] = data["mood"]
-            if "function" in data:
-                functions[name] = data["function"]
-
-        classifier.moods = moods
-        classifier.in_game_functions = functions
-        classifier.classified_features = {
-            name: [moods[name], functions[name]] for name in audio_metadata.keys()
-        }
-
-        return classifier
@@ -1,17 +1,370 @@
 from os.path import join
+import os
 import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional
 import numpy as np
 from numpy.typing import NDArray
 import librosa
 from tqdm import tqdm
+from mir.features import FeatureEngine
+from mir.key import KEYS, KeyEstimator
+from mir.streaming import RunningStats, chunked_tempogram, stream_blocks
+from mir.metrics import Stopwatch, observe_stage, timed
 
 logger = logging.getLogger(__name__)
 
+SEGMENT_MODES = ("beats", "window")
+
+
+def extract_features(file: str, music_dir: str = r"data\music") -> dict:
+    """Extracts the full feature dictionary for a single audio file.
+
+    Kept at module level so it can be pickled and shipped to worker processes.
+    """
+    # Lap times per feature block, returned with the features as "stage_seconds"
+    clock = Stopwatch()
+    # Extracting features from audio file
+    waveform, sampling_rate = librosa.load(path=join(music_dir, file))
+    clock.lap("decode")
+    # Shared STFT/mel/onset/chroma intermediates, each computed once per track
+    engine = FeatureEngine(waveform=waveform, sampling_rate=sampling_rate)
+
+    # Tempo and Beat Information
+    tempo, beat_frames = engine.beat_track()
+    beat_times = librosa.frames_to_time(frames=beat_frames, sr=sampling_rate).tolist()
+    beat_strength = len(beat_times) / (tempo / 60)  # BPM relative to track length
+    clock.lap("beat")
+
+    # Rhythm Patterns and Structure
+    onset_env = engine.onset_envelope
+    tempo_scores = librosa.feature.rhythm.tempo(
+        onset_envelope=onset_env, sr=sampling_rate, aggregate=None
+    ).tolist()
+    tempogram = librosa.feature.tempogram(onset_envelope=onset_env, sr=sampling_rate)
+    tempo_structure = np.mean(tempogram, axis=1).tolist()
+    rhythm_regularity = np.std(tempo_structure) / np.mean(tempo_structure)
+    clock.lap("rhythm")
+
+    # Spectral Features and Contrast
+    spectral_centroids = engine.spectral_centroid()
+    spectral_centroid_mean = float(np.mean(spectral_centroids))
+    spectral_contrast = engine.spectral_contrast()
+    spectral_contrast_mean = np.mean(spectral_contrast, axis=1).tolist()
+    bass_contrast = np.mean(spectral_contrast_mean[:3])
+    treble_contrast = np.mean(spectral_contrast_mean[3:])
+    clock.lap("spectral")
+
+    # Energy/RMS
+    energy = engine.rms()[0]
+    energy_mean = float(np.mean(energy))
+    energy_std = float(np.std(energy))
+    clock.lap("energy")
+
+    # Zero Crossing Rate (Noisiness)
+    zero_crossing_rate = engine.zero_crossing_rate()
+    zero_crossing_rate_mean = float(np.mean(zero_crossing_rate))
+    clock.lap("zero_crossing_rate")
+
+    # Mel-frequency cepstral coefficients (MFCCs)
+    mfccs = engine.mfcc(n_mfcc=13)
+    mfcc_profile = np.mean(mfccs, axis=1).tolist()
+    low_mfcc = np.mean(mfcc_profile[:4])
+    mid_mfcc = np.mean(mfcc_profile[4:9])
+    high_mfcc = np.mean(mfcc_profile[9:])
+    mfcc_spread = np.std(mfcc_profile)
+    clock.lap("mfcc")
+
+    # Tonal Features
+    tonnetz = engine.tonnetz()
+    tonnetz_mean = np.mean(tonnetz, axis=1).tolist()
+    clock.lap("tonnetz")
+
+    # Chromagram (Harmony and Key)
+    chromagram = engine.chroma(bins_per_octave=24)
+    # Keys are estimated from chroma_mean for all tracks at once in AudioProcessor
+    chroma_mean = np.mean(chromagram, axis=1).tolist()
+    clock.lap("chroma")
+
+    complexity_score = float(np.mean(spectral_contrast_mean))
+    tonal_stability = float(np.std(tonnetz_mean))
+
+    return {
+        # The decoded waveform is dropped once features are computed
+        "waveform": None,
+        "sampling_rate": sampling_rate,
+        "tempo": int(tempo),
+        "beat_times": beat_times,
+        "beat_strength": beat_strength,
+        "rhythm_regularity": rhythm_regularity,
+        "tempo_scores": tempo_scores,
+        "tempo_structure": tempo_structure,
+        "spectral_centroid_mean": spectral_centroid_mean,
+        "spectral_contrast_mean": spectral_contrast_mean,
+        "bass_contrast": bass_contrast,
+        "treble_contrast": treble_contrast,
+        "chroma_mean": chroma_mean,
+        "energy_mean": energy_mean,
+        "energy_std": energy_std,
+        "zero_crossing_rate_mean": zero_crossing_rate_mean,
+        "mfcc_profile": mfcc_profile,
+        "low_mfcc": low_mfcc,
+        "mid_mfcc": mid_mfcc,
+        "high_mfcc": high_mfcc,
+        "mfcc_spread": mfcc_spread,
+        "tonal_features": tonnetz_mean,
+        "complexity_score": complexity_score,
+        "tonal_stability": tonal_stability,
+        "stage_seconds": clock.laps,
+    }
+
+
+def extract_features_streaming(
+    file: str, music_dir: str = r"data\music", block_length: int = 512
+) -> dict:
+    """Bounded-memory variant of `extract_features`.
+
+    The track is decoded and analysed block by block (see `stream_blocks`), and
+    frame-level features are folded into running accumulators as they are produced.
+    Peak memory is set by `block_length` and the tempogram chunk size, not by the
+    track length; only the onset envelopes and per-frame tempo estimates (one float
+    per hop each) are kept whole, since beat tracking needs the full envelope.
+
+    STFT-based features line up frame for frame with `extract_features`. The CQT
+    chroma, the tuning estimate (taken from the first block) and the dB floor of the
+    log-mel spectrogram are computed per block, so those features are close to, but
+    not bit-identical with, the in-memory extractor.
+    """
+    sampling_rate, n_fft, hop_length = 22050, 2048, 512
+    # CQT frames are centred on block samples, STFT frames start at them
+    cqt_offset = n_fft // (2 * hop_length)
+
+    centroid_stats, contrast_stats, mfcc_stats = (
+        RunningStats(),
+        RunningStats(),
+        RunningStats(),
+    )
+    energy_stats, zcr_stats = RunningStats(), RunningStats()
+    chroma_stats, tonnetz_stats, tempo_structure_stats = (
+        RunningStats(),
+        RunningStats(),
+        RunningStats(),
+    )
+    flux_mean, flux_median = [], []
+    previous_log_mel = None
+    tuning = None
+
+    for block in stream_blocks(
+        path=join(music_dir, file),
+        sampling_rate=sampling_rate,
+        frame_length=n_fft,
+        hop_length=hop_length,
+        block_length=block_length,
+    ):
+        magnitude = np.abs(
+            librosa.stft(y=block, n_fft=n_fft, hop_length=hop_length, center=False)
+        )
+        n_frames = magnitude.shape[-1]
+        if tuning is None:
+            pitch, pitch_magnitude = librosa.piptrack(S=magnitude, sr=sampling_rate)
+            pitch_mask = pitch > 0
+            threshold = (
+                np.median(pitch_magnitude[pitch_mask]) if pitch_mask.any() else 0.0
+            )
+            candidates = pitch[(pitch_magnitude >= threshold) & pitch_mask]
+            tuning = {
+                bins: librosa.pitch_tuning(candidates, bins_per_octave=bins)
+                for bins in (24, 36)
+            }
+
+        # Spectral Features and Contrast
+        centroid_stats.update(
+            librosa.feature.spectral_centroid(S=magnitude, sr=sampling_rate)[0]
+        )
+        contrast_stats.update(
+            librosa.feature.spectral_contrast(S=magnitude, sr=sampling_rate)
+        )
+
+        # MFCCs and onset strength share the log-mel spectrogram
+        log_mel = librosa.power_to_db(
+            librosa.feature.melspectrogram(S=magnitude**2, sr=sampling_rate)
+        )
+        mfcc_stats.update(librosa.feature.mfcc(S=log_mel, sr=sampling_rate, n_mfcc=13))
+        # Spectral flux continues across block boundaries via the previous frame
+        frames = (
+            log_mel
+            if previous_log_mel is None
+            else np.concatenate([previous_log_mel, log_mel], axis=1)
+        )
+        flux = np.maximum(0.0, frames[:, 1:] - frames[:, :-1])
+        flux_mean.append(flux.mean(axis=0))
+        flux_median.append(np.median(flux, axis=0))
+        previous_log_mel = log_mel[:, -1:]
+
+        # Energy/RMS and Zero Crossing Rate
+        energy_stats.update(librosa.feature.rms(y=block, center=False)[0])
+        zcr_stats.update(librosa.feature.zero_crossing_rate(y=block, center=False)[0])
+
+        # Chromagram (Harmony and Key) and Tonal Features
+        chromagram = librosa.feature.chroma_cqt(
+            y=block, sr=sampling_rate, bins_per_octave=24, tuning=tuning[24]
+        )[:, cqt_offset : cqt_offset + n_frames]
+        chroma_stats.update(chromagram)
+        tonnetz_chroma = librosa.feature.chroma_cqt(
+            y=block, sr=sampling_rate, bins_per_octave=36, tuning=tuning[36]
+        )[:, cqt_offset : cqt_offset + n_frames]
+        tonnetz_stats.update(
+            librosa.feature.tonnetz(chroma=tonnetz_chroma, sr=sampling_rate)
+        )
+
+    # Onset envelopes, laid out as librosa.onset.onset_strength(center=True) does
+    n_total = energy_stats.count
+    onset_pad = np.zeros(1 + cqt_offset, dtype=np.float32)
+    onset_env = np.concatenate([onset_pad, *flux_mean])[:n_total]
+    beat_onset_env = np.concatenate([onset_pad, *flux_median])[:n_total]
+
+    # Rhythm Patterns and Structure, one tempogram chunk at a time
+    tempo_win_length = librosa.time_to_frames(8.0, sr=sampling_rate).item()
+    tempo_scores = []
+    for tg in chunked_tempogram(
+        onset_envelope=onset_env,
+        sampling_rate=sampling_rate,
+        win_length=tempo_win_length,
+    ):
+        tempo_scores.append(
+            librosa.feature.rhythm.tempo(tg=tg, sr=sampling_rate, aggregate=None)
+        )
+        # Otherwise the finished chunk stays alive while the next one is computed
+        del tg
+    for tg in chunked_tempogram(onset_envelope=onset_env, sampling_rate=sampling_rate):
+        tempo_structure_stats.update(tg)
+        del tg
+    tempo_structure = tempo_structure_stats.mean.tolist()
+
+    # Tempo and Beat Information. beat_track would build a full-length tempogram to
+    # estimate the tempo; the mean of the chunked one gives the same estimate.
+    beat_tempogram_stats = RunningStats()
+    for tg in chunked_tempogram(
+        onset_envelope=beat_onset_env,
+        sampling_rate=sampling_rate,
+        win_length=tempo_win_length,
+    ):
+        beat_tempogram_stats.update(tg)
+        del tg
+    bpm = librosa.feature.rhythm.tempo(
+        tg=beat_tempogram_stats.mean[:, None], sr=sampling_rate
+    )
+    tempo, beat_frames = librosa.beat.beat_track(
+        onset_envelope=beat_onset_env, sr=sampling_rate, bpm=bpm
+    )
+    tempo = float(np.atleast_1d(tempo)[0])
+    beat_times = librosa.frames_to_time(frames=beat_frames, sr=sampling_rate).tolist()
+    beat_strength = len(beat_times) / (tempo / 60)  # BPM relative to track length
+    rhythm_regularity = np.std(tempo_structure) / np.mean(tempo_structure)
+
+    spectral_contrast_mean = contrast_stats.mean.tolist()
+    mfcc_profile = mfcc_stats.mean.tolist()
+    tonnetz_mean = tonnetz_stats.mean.tolist()
+    chroma_mean = chroma_stats.mean.tolist()
+
+    return {
+        "waveform": None,
+        "sampling_rate": sampling_rate,
+        "tempo": int(tempo),
+        "beat_times": beat_times,
+        "beat_strength": beat_strength,
+        "rhythm_regularity": rhythm_regularity,
+        "tempo_scores": np.concatenate(tempo_scores).tolist(),
+        "tempo_structure": tempo_structure,
+        "spectral_centroid_mean": float(centroid_stats.mean),
+        "spectral_contrast_mean": spectral_contrast_mean,
+        "bass_contrast": np.mean(spectral_contrast_mean[:3]),
+        "treble_contrast": np.mean(spectral_contrast_mean[3:]),
+        "chroma_mean": chroma_mean,
+        "energy_mean": float(energy_stats.mean),
+        "energy_std": float(energy_stats.std),
+        "zero_crossing_rate_mean": float(zcr_stats.mean),
+        "mfcc_profile": mfcc_profile,
+        "low_mfcc": np.mean(mfcc_profile[:4]),
+        "mid_mfcc": np.mean(mfcc_profile[4:9]),
+        "high_mfcc": np.mean(mfcc_profile[9:]),
+        "mfcc_spread": np.std(mfcc_profile),
+        "tonal_features": tonnetz_mean,
+        "complexity_score": float(np.mean(spectral_contrast_mean)),
+        "tonal_stability": float(np.std(tonnetz_mean)),
+    }
+
+
+def extract_segments(
+    file: str,
+    music_dir: str = r"data\music",
+    mode: str = "beats",
+    beats_per_segment: int = 4,
+    window_seconds: float = 2.0,
+) -> dict:
+    """Per-segment energy, chroma, MFCCs and local key for a single audio file.
+
+    Segments span `beats_per_segment` beats in "beats" mode, or `window_seconds`
+    in "window" mode; either way they cover the whole track, lead-in included.
+    Kept at module level so it can be pickled and shipped to worker processes.
+    """
+    if mode not in SEGMENT_MODES:
+        raise ValueError(
+            f"Unknown segment mode {mode!r}, expected one of {SEGMENT_MODES}"
+        )
+    waveform, sampling_rate = librosa.load(path=join(music_dir, file))
+    engine = FeatureEngine(waveform=waveform, sampling_rate=sampling_rate)
+    energy = engine.rms()
+    chromagram = engine.chroma(bins_per_octave=24)
+    mfccs = engine.mfcc(n_mfcc=13)
+    n_frames = min(energy.shape[-1], chromagram.shape[-1], mfccs.shape[-1])
+
+    if mode == "beats":
+        _, beat_frames = engine.beat_track()
+        boundaries = np.asarray(beat_frames)[::beats_per_segment]
+    else:
+        step = max(int(round(window_seconds * sampling_rate / engine.hop_length)), 1)
+        boundaries = np.arange(0, n_frames, step)
+    boundaries = librosa.util.fix_frames(boundaries, x_min=0, x_max=n_frames)
+
+    frames = np.vstack(
+        [energy[:, :n_frames], chromagram[:, :n_frames], mfccs[:, :n_frames]]
+    )
+    # One column per segment: the mean of its frames
+    means = librosa.util.sync(frames, boundaries, aggregate=np.mean, pad=False).T
+    chroma = means[:, 1:13]
+    keys = KeyEstimator().estimate(chroma)
+    times = librosa.frames_to_time(
+        boundaries, sr=sampling_rate, hop_length=engine.hop_length
+    )
+    return {
+        "start": times[:-1],
+        "end": times[1:],
+        "energy": means[:, 0],
+        "chroma": chroma,
+        "mfcc": means[:, 13:],
+        "key": keys.keys,
+        "key_confidence": np.atleast_1d(keys.confidence),
+    }
+
 
 class AudioProcessor:
-    def __init__(self, audio_files: list[str]):
+    def __init__(
+        self,
+        audio_files: list[str],
+        workers: Optional[int] = 1,
+        music_dir: str = r"data\music",
+        streaming: bool = False,
+    ):
         logger.info("Extracting metadata from audio tracks")
-        self.audio_metadata = self._create_metadata(audio_files=audio_files)
+        self.music_dir = music_dir
+        # Streaming mode keeps peak memory flat for long tracks at a small accuracy cost
+        self.extractor = extract_features_streaming if streaming else extract_features
+        # Files that raised during extraction, mapped to their error message
+        self.failed_files: dict[str, str] = {}
+        self.audio_metadata = self._create_metadata(
+            audio_files=audio_files, workers=workers
+        )
         self.metadata_averages = self._create_metadata_averages(
             audio_metadata=self.audio_metadata
         )
@@ -27,107 +380,71 @@ class AudioProcessor:
                 else:
                     print(f"{feature_name}: {value}")
 
-    def _create_metadata(self, audio_files: list[str]) -> dict:
-        audio_metadata = {}
-        logger.info("Processing audio tracks and extracting features.")
-        for file in tqdm(audio_files):
-            # Extracting features from audio file
-            waveform, sampling_rate = librosa.load(path=join(r"data\music", file))
-
-            # Tempo and Beat Information
-            tempo, beat_frames = librosa.beat.beat_track(y=waveform, sr=sampling_rate)
-            beat_times = librosa.frames_to_time(
-                frames=beat_frames, sr=sampling_rate
-            ).tolist()
-            beat_strength = len(beat_times) / (
-                tempo / 60
-            )  # BPM relative to track length
-
-            # Rhythm Patterns and Structure
-            onset_env = librosa.onset.onset_strength(y=waveform, sr=sampling_rate)
-            tempo_scores = librosa.feature.rhythm.tempo(
-                onset_envelope=onset_env, sr=sampling_rate, aggregate=None
-            ).tolist()
-            tempogram = librosa.feature.tempogram(
-                onset_envelope=onset_env, sr=sampling_rate
-            )
-            tempo_structure = np.mean(tempogram, axis=1).tolist()
-            rhythm_regularity = np.std(tempo_structure) / np.mean(tempo_structure)
+    def _create_metadata(
+        self, audio_files: list[str], workers: Optional[int] = 1
+    ) -> dict:
+        # None or a non-positive worker count means "use every core"
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        workers = min(workers, max(len(audio_files), 1))
 
-            # Spectral Features and Contrast
-            spectral_centroids = librosa.feature.spectral_centroid(
-                y=waveform, sr=sampling_rate
-            )
-            spectral_centroid_mean = float(np.mean(spectral_centroids))
-            spectral_contrast = librosa.feature.spectral_contrast(
-                y=waveform, sr=sampling_rate
-            )
-            spectral_contrast_mean = np.mean(spectral_contrast, axis=1).tolist()
-            bass_contrast = np.mean(spectral_contrast_mean[:3])
-            treble_contrast = np.mean(spectral_contrast_mean[3:])
-
-            # Energy/RMS
-            energy = librosa.feature.rms(y=waveform)[0]
-            energy_mean = float(np.mean(energy))
-            energy_std = float(np.std(energy))
-
-            # Zero Crossing Rate (Noisiness)
-            zero_crossing_rate = librosa.feature.zero_crossing_rate(y=waveform)
-            zero_crossing_rate_mean = float(np.mean(zero_crossing_rate))
-
-            # Mel-frequency cepstral coefficients (MFCCs)
-            mfccs = librosa.feature.mfcc(y=waveform, sr=sampling_rate, n_mfcc=13)
-            mfcc_profile = np.mean(mfccs, axis=1).tolist()
-            low_mfcc = np.mean(mfcc_profile[:4])
-            mid_mfcc = np.mean(mfcc_profile[4:9])
-            high_mfcc = np.mean(mfcc_profile[9:])
-            mfcc_spread = np.std(mfcc_profile)
-
-            # Tonal Features
-            tonnetz = librosa.feature.tonnetz(y=waveform, sr=sampling_rate)
-            tonnetz_mean = np.mean(tonnetz, axis=1).tolist()
-
-            # Chromagram (Harmony and Key)
-            chromagram = librosa.feature.chroma_cqt(
-                y=waveform, sr=sampling_rate, bins_per_octave=24
+        logger.info(
+            f"Processing {len(audio_files)} audio tracks and extracting features "
+            f"with {workers} worker(s)."
+        )
+        if workers == 1:
+            results = self._extract_sequential(audio_files=audio_files)
+        else:
+            results = self._extract_parallel(audio_files=audio_files, workers=workers)
+
+        # Results arrive in completion order, so rebuild them in input order
+        audio_metadata = {
+            file: results[file] for file in audio_files if file in results
+        }
+        for features in audio_metadata.values():
+            # Worker processes can't reach this process's registry, so their lap
+            # times come back with the features and are recorded here
+            for stage, seconds in features.pop("stage_seconds", {}).items():
+                observe_stage(stage=f"feature.{stage}", seconds=seconds)
+        with timed("feature.key"):
+            self._estimate_keys(audio_metadata=audio_metadata)
+        if self.failed_files:
+            logger.warning(
+                f"Feature extraction failed for {len(self.failed_files)} track(s): "
+                f"{', '.join(self.failed_files)}"
             )
-            chroma_mean = np.mean(chromagram, axis=1).tolist()
-            key = self._detect_key(chromagram=chromagram)
-
-            complexity_score = float(np.mean(spectral_contrast_mean))
-            tonal_stability = float(np.std(tonnetz_mean))
-
-            # Adding features to a dictionary with the file name as key
-            audio_metadata[file] = {
-                "waveform": waveform,
-                "sampling_rate": sampling_rate,
-                "tempo": int(tempo),
-                "beat_times": beat_times,
-                "beat_strength": beat_strength,
-                "rhythm_regularity": rhythm_regularity,
-                "tempo_scores": tempo_scores,
-                "tempo_structure": tempo_structure,
-                "spectral_centroid_mean": spectral_centroid_mean,
-                "spectral_contrast_mean": spectral_contrast_mean,
-                "bass_contrast": bass_contrast,
-                "treble_contrast": treble_contrast,
-                "chroma_mean": chroma_mean,
-                "energy_mean": energy_mean,
-                "energy_std": energy_std,
-                "zero_crossing_rate_mean": zero_crossing_rate_mean,
-                "mfcc_profile": mfcc_profile,
-                "low_mfcc": low_mfcc,
-                "mid_mfcc": mid_mfcc,
-                "high_mfcc": high_mfcc,
-                "mfcc_spread": mfcc_spread,
-                "tonal_features": tonnetz_mean,
-                "key": key,
-                "complexity_score": complexity_score,
-                "tonal_stability": tonal_stability,
-            }
         logger.info("Audio feature extraction complete.")
         return audio_metadata
 
+    def _extract_sequential(self, audio_files: list[str]) -> dict:
+        results = {}
+        for file in tqdm(audio_files):
+            try:
+                results[file] = self.extractor(file=file, music_dir=self.music_dir)
+            except Exception as e:
+                self._record_failure(file=file, error=e)
+        return results
+
+    def _extract_parallel(self, audio_files: list[str], workers: int) -> dict:
+        results = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(self.extractor, file, self.music_dir): file
+                for file in audio_files
+            }
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                file = futures[future]
+                try:
+                    results[file] = future.result()
+                except Exception as e:
+                    # Also covers BrokenProcessPool if a worker dies outright
+                    self._record_failure(file=file, error=e)
+        return results
+
+    def _record_failure(self, file: str, error: Exception) -> None:
+        logger.error(f"Failed to extract features for {file}: {error}")
+        self.failed_files[file] = f"{type(error).__name__}: {error}"
+
     def _create_metadata_averages(self, audio_metadata: dict) -> dict:
         feature_lists = {}
         for data in audio_metadata.values():
@@ -148,60 +465,21 @@ class AudioProcessor:
 
         return metadata_averages
 
-    def _detect_key(self, chromagram: NDArray) -> str:
-        chroma_vals = [np.sum(chromagram[i]) for i in range(12)]
-        pitches = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
-        key_freq = {pitches[i]: chroma_vals[i] for i in range(12)}
-        keys = [pitches[i] + " Major" for i in range(12)] + [
-            pitches[i] + " Minor" for i in range(12)
-        ]
-
-        # Krumhansl-Schmuckler key profiles
-        major_profile = [
-            6.35,
-            2.23,
-            3.48,
-            2.33,
-            4.38,
-            4.09,
-            2.52,
-            5.19,
-            2.39,
-            3.66,
-            2.29,
-            2.88,
-        ]
-        minor_profile = [
-            6.33,
-            2.68,
-            3.52,
-            5.38,
-            2.60,
-            3.53,
-            2.54,
-            4.75,
-            3.98,
-            2.69,
-            3.34,
-            3.17,
-        ]
-
-        correlations_maj = []
-        correlations_min = []
-
-        for i in range(12):
-            estimated_key = [key_freq.get(pitches[(i + m) % 12]) for m in range(12)]
-            correlations_maj.append(
-                round(np.corrcoef(major_profile, estimated_key)[1, 0], 3)
-            )
-            correlations_min.append(
-                round(np.corrcoef(minor_profile, estimated_key)[1, 0], 3)
+    def _estimate_keys(self, audio_metadata: dict) -> None:
+        if not audio_metadata:
+            return
+        # One batched pass over every track's chroma. Correlation is scale-invariant,
+        # so the mean chroma gives the same result as the summed chromagram.
+        estimate = KeyEstimator().estimate(
+            np.array([data["chroma_mean"] for data in audio_metadata.values()])
+        )
+        for i, data in enumerate(audio_metadata.values()):
+            data["key"] = estimate.keys[i]
+            data["key_correlations"] = dict(
+                zip(KEYS, estimate.correlations[i].tolist())
             )
+            data["key_confidence"] = float(estimate.confidence[i])
 
-        key_dict = {
-            **{keys[i]: correlations_maj[i] for i in range(12)},
-            **{keys[i + 12]: correlations_min[i] for i in range(12)},
-        }
-
-        key = max(key_dict, key=key_dict.get)
-        return key
+    @staticmethod
+    def _detect_key(chromagram: NDArray) -> str:
+        return KeyEstimator().estimate(np.sum(chromagram, axis=1)).keys[0]
@@ -0,0 +1,152 @@
+import os
+import json
+import logging
+from os.path import join
+from typing import Optional
+import numpy as np
+from numpy.typing import NDArray
+from mir.key import KEYS
+from mir.store import staged_directory
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_STORE_VERSION = 1
+# Per-segment columns written by extract_segments, besides the key names
+SEGMENT_COLUMNS = ("start", "end", "energy", "chroma", "mfcc", "key_confidence")
+
+
+class SegmentStore:
+    """Time-resolved features of every track, as flat memory-mappable arrays.
+
+    Segments of all tracks are concatenated in catalogue order, and rows
+    `offsets[i]` to `offsets[i + 1]` belong to `names[i]`, so a track's timeline
+    is one slice and a row maps back to its track with a binary search. Local
+    keys are stored as indexes into KEYS. Like FeatureStore, `save` writes one
+    .npy file per column and `load` memory-maps them.
+    """
+
+    def __init__(
+        self,
+        names: NDArray,
+        offsets: NDArray,
+        columns: dict[str, NDArray],
+        keys: NDArray,
+        settings: dict,
+    ):
+        self.names = names
+        self.offsets = offsets
+        self.columns = columns
+        self.keys = keys
+        # Extraction mode and parameters, so a store built differently is rebuilt
+        self.settings = settings
+        self._index: Optional[dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.name_index
+
+    @property
+    def name_index(self) -> dict[str, int]:
+        if self._index is None:
+            self._index = {str(name): i for i, name in enumerate(self.names)}
+        return self._index
+
+    @classmethod
+    def from_segments(cls, segments: dict[str, dict], settings: dict) -> "SegmentStore":
+        logger.info(f"Building segment store over {len(segments)} tracks")
+        tracks = list(segments.values())
+        counts = [len(track["start"]) for track in tracks]
+        columns = {
+            column: np.concatenate(
+                [np.asarray(track[column], dtype=np.float32) for track in tracks]
+            )
+            if tracks
+            else np.zeros(0, dtype=np.float32)
+            for column in SEGMENT_COLUMNS
+        }
+        lookup = {key: code for code, key in enumerate(KEYS)}
+        return cls(
+            names=np.array(list(segments), dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            columns=columns,
+            keys=np.array(
+                [lookup[key] for track in tracks for key in track["key"]],
+                dtype=np.int32,
+            ),
+            settings=settings,
+        )
+
+    def save(self, path: str) -> str:
+        # Staged and swapped in whole, see `staged_directory`
+        with staged_directory(path) as staging:
+            np.save(join(staging, "names.npy"), self.names)
+            np.save(join(staging, "offsets.npy"), self.offsets)
+            np.save(join(staging, "key.npy"), self.keys)
+            for column, values in self.columns.items():
+                np.save(join(staging, f"{column}.npy"), values)
+            manifest = {"version": SEGMENT_STORE_VERSION, "settings": self.settings}
+            with open(join(staging, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+        logger.info(f"Segment store with {len(self)} segments written to {path}")
+        return path
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "SegmentStore":
+        manifest = cls.manifest(path)
+        if manifest.get("version") != SEGMENT_STORE_VERSION:
+            raise ValueError(
+                f"Unsupported segment store version {manifest.get('version')} at {path}"
+            )
+        mmap_mode = "r" if mmap else None
+
+        def column(filename: str) -> NDArray:
+            return np.load(join(path, filename), mmap_mode=mmap_mode)
+
+        return cls(
+            names=column("names.npy"),
+            offsets=column("offsets.npy"),
+            columns={name: column(f"{name}.npy") for name in SEGMENT_COLUMNS},
+            keys=column("key.npy"),
+            settings=manifest["settings"],
+        )
+
+    @staticmethod
+    def manifest(path: str) -> dict:
+        with open(join(path, "manifest.json"), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(join(path, "manifest.json"))
+
+    def rows(self, name: str) -> slice:
+        position = self.name_index[name]
+        return slice(int(self.offsets[position]), int(self.offsets[position + 1]))
+
+    def track_of(self, row: int) -> str:
+        return str(self.names[np.searchsorted(self.offsets, row, side="right") - 1])
+
+    def row_at(self, name: str, seconds: float) -> int:
+        """Row of the segment of `name` playing at `seconds` (clamped to the track)."""
+        rows = self.rows(name)
+        starts = self.columns["start"][rows]
+        return rows.start + max(
+            int(np.searchsorted(starts, seconds, side="right")) - 1, 0
+        )
+
+    def segment(self, row: int) -> dict:
+        return {
+            "start": round(float(self.columns["start"][row]), 3),
+            "end": round(float(self.columns["end"][row]), 3),
+            "energy": round(float(self.columns["energy"][row]), 6),
+            "key": KEYS[self.keys[row]],
+            # Stored as float32, so rounded back to KeyEstimator's precision
+            "key_confidence": round(float(self.columns["key_confidence"][row]), 3),
+        }
+
+    def timeline(self, name: str) -> list[dict]:
+        """Every segment of `name` in time order, e.g. to find where it gets intense."""
+        rows = self.rows(name)
+        return [self.segment(row) for row in range(rows.start, rows.stop)]
@@ -0,0 +1,351 @@
+import os
+import json
+import shutil
+import logging
+import tempfile
+from contextlib import contextmanager
+from os.path import join
+from typing import Iterator, Optional, Union, get_args, get_origin
+import numpy as np
+from numpy.typing import NDArray
+from mir.metadata_model import AudioMetadata, AudioMetadataCollection
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMAT_VERSION = 1
+# String fields with few distinct values, stored as integer codes plus a vocabulary
+CATEGORICAL_FIELDS = ("key", "mood", "function")
+
+
+@contextmanager
+def staged_directory(path: str) -> Iterator[str]:
+    """Yields a sibling directory to write into, swapped in for `path` afterwards.
+
+    The old directory is renamed out of the way rather than overwritten, so readers
+    holding memory-mapped columns keep the old files and new readers only ever see
+    a complete store. Nothing is swapped in if the block raises.
+    """
+    path = os.path.abspath(path)
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", dir=parent)
+    # mkdtemp makes it private; stores are read by other processes too
+    os.chmod(staging, 0o755)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    retired = f"{staging}.old"
+    if os.path.exists(path):
+        os.replace(path, retired)
+    os.replace(staging, path)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def _field_kind(annotation) -> str:
+    # Unwrap Optional[...] to the underlying type
+    if get_origin(annotation) is Union:
+        annotation = next(arg for arg in get_args(annotation) if arg is not type(None))
+    origin = get_origin(annotation)
+    if annotation in (int, float):
+        return "scalar"
+    if origin is list:
+        return "vector"
+    if origin is dict:
+        return "mapping"
+    return "text"
+
+
+FIELD_KINDS = {
+    name: _field_kind(field.annotation)
+    for name, field in AudioMetadata.model_fields.items()
+}
+
+
+class FeatureStore:
+    """Columnar view of an AudioMetadataCollection.
+
+    Scalar features are 1-D NumPy columns, fixed-width vector features are 2-D
+    arrays, and key/mood/function are integer codes into a small string table.
+    `save` writes one .npy file per column so `load` can memory-map the catalogue
+    instead of parsing JSON; corpus statistics, filters and similarity are then
+    plain column operations.
+    """
+
+    def __init__(
+        self,
+        names: NDArray,
+        scalars: dict[str, NDArray],
+        vectors: dict[str, NDArray],
+        categories: dict[str, tuple[NDArray, list[str]]],
+        vector_labels: Optional[dict[str, list[str]]] = None,
+        text: Optional[dict[str, list[str]]] = None,
+        path: Optional[str] = None,
+        settings: Optional[dict] = None,
+    ):
+        self.names = names
+        self.scalars = scalars
+        self.vectors = vectors
+        self.categories = categories
+        # Column labels of vectors built from mappings, e.g. key_correlations -> KEYS
+        self.vector_labels = vector_labels or {}
+        self._text = text
+        self._path = path
+        # Whatever the writer needs to tell whether the store is still current
+        self.settings = settings or {}
+        self._index: Optional[dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.name_index
+
+    @property
+    def name_index(self) -> dict[str, int]:
+        # Built on first lookup so loading stays independent of catalogue size
+        if self._index is None:
+            self._index = {str(name): i for i, name in enumerate(self.names)}
+        return self._index
+
+    def index_of(self, name: str) -> int:
+        return self.name_index[name]
+
+    @classmethod
+    def from_collection(
+        cls, collection: AudioMetadataCollection, settings: Optional[dict] = None
+    ) -> "FeatureStore":
+        logger.info("Building columnar feature store")
+        records = [track.model_dump() for track in collection.root.values()]
+        names = np.array(list(collection.keys()), dtype=str)
+        scalars, vectors, categories, vector_labels, text = {}, {}, {}, {}, {}
+
+        for field, kind in FIELD_KINDS.items():
+            values = [record.get(field) for record in records]
+            present = [value for value in values if value is not None]
+            if not present and records:
+                continue
+            if field in CATEGORICAL_FIELDS:
+                vocabulary = sorted(set(present))
+                lookup = {value: code for code, value in enumerate(vocabulary)}
+                codes = np.array([lookup.get(value, -1) for value in values])
+                categories[field] = (codes.astype(np.int32), vocabulary)
+            elif kind == "scalar":
+                if AudioMetadata.model_fields[field].annotation is int:
+                    scalars[field] = np.array(values, dtype=np.int64)
+                else:
+                    scalars[field] = np.array(
+                        [np.nan if value is None else value for value in values],
+                        dtype=np.float64,
+                    )
+            elif kind == "mapping":
+                labels = list(present[0].keys()) if present else []
+                vector_labels[field] = labels
+                vectors[field] = np.array(
+                    [
+                        [np.nan] * len(labels)
+                        if value is None
+                        else [value.get(label, np.nan) for label in labels]
+                        for value in values
+                    ],
+                    dtype=np.float64,
+                ).reshape(len(values), len(labels))
+            elif kind == "vector":
+                widths = {len(value) for value in present}
+                if len(widths) > 1:
+                    # Frame-level lists (e.g. beat_times) have no fixed width
+                    logger.info(f"Skipping variable-length field {field}")
+                    continue
+                width = widths.pop() if widths else 0
+                vectors[field] = np.array(
+                    [[np.nan] * width if value is None else value for value in values],
+                    dtype=np.float64,
+                ).reshape(len(values), width)
+            else:
+                text[field] = values
+        return cls(
+            names=names,
+            scalars=scalars,
+            vectors=vectors,
+            categories=categories,
+            vector_labels=vector_labels,
+            text=text,
+            settings=settings,
+        )
+
+    def save(self, path: str) -> str:
+        with staged_directory(path) as staging:
+            self._write(staging)
+        logger.info(f"Feature store with {len(self)} tracks written to {path}")
+        return path
+
+    def _write(self, path: str) -> None:
+        np.save(join(path, "names.npy"), self.names)
+        for field, column in self.scalars.items():
+            np.save(join(path, f"scalar.{field}.npy"), column)
+        for field, column in self.vectors.items():
+            np.save(join(path, f"vector.{field}.npy"), column)
+        for field, (codes, _) in self.categories.items():
+            np.save(join(path, f"category.{field}.npy"), codes)
+        with open(join(path, "text.json"), "w") as f:
+            json.dump(self.text, f)
+        manifest = {
+            "version": STORE_FORMAT_VERSION,
+            "settings": self.settings,
+            "scalars": list(self.scalars),
+            "vectors": list(self.vectors),
+            "vector_labels": self.vector_labels,
+            "categories": {
+                field: vocabulary for field, (_, vocabulary) in self.categories.items()
+            },
+        }
+        with open(join(path, "manifest.json"), "w") as f:
+            json.dump(manifest, f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FeatureStore":
+        with open(join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != STORE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported feature store version {manifest.get('version')} at {path}"
+            )
+        mmap_mode = "r" if mmap else None
+
+        def column(filename: str) -> NDArray:
+            return np.load(join(path, filename), mmap_mode=mmap_mode)
+
+        return cls(
+            names=column("names.npy"),
+            scalars={
+                field: column(f"scalar.{field}.npy") for field in manifest["scalars"]
+            },
+            vectors={
+                field: column(f"vector.{field}.npy") for field in manifest["vectors"]
+            },
+            categories={
+                field: (column(f"category.{field}.npy"), vocabulary)
+                for field, vocabulary in manifest["categories"].items()
+            },
+            vector_labels=manifest["vector_labels"],
+            path=path,
+            settings=manifest.get("settings"),
+        )
+
+    @staticmethod
+    def manifest(path: str) -> dict:
+        with open(join(path, "manifest.json"), "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(join(path, "manifest.json"))
+
+    @property
+    def text(self) -> dict[str, list[str]]:
+        # Free-text columns are only needed for export, so they load on first use
+        if self._text is None:
+            with open(join(self._path, "text.json"), "r") as f:
+                self._text = json.load(f)
+        return self._text
+
+    def column(self, field: str) -> NDArray:
+        """Any column by name; categorical columns are decoded to strings."""
+        if field in self.scalars:
+            return self.scalars[field]
+        if field in self.vectors:
+            return self.vectors[field]
+        if field in self.categories:
+            codes, vocabulary = self.categories[field]
+            # Code -1 marks a missing value and picks the trailing None
+            return np.array([*vocabulary, None], dtype=object)[codes]
+        raise KeyError(field)
+
+    def mask(self, field: str, value: str) -> NDArray:
+        """Boolean mask of tracks whose categorical `field` equals `value`.
+
+        `function` holds comma-separated labels, so it matches on any of them.
+        """
+        codes, vocabulary = self.categories[field]
+        if field == "function":
+            matching = [
+                code
+                for code, labels in enumerate(vocabulary)
+                if value in labels.split(",")
+            ]
+        else:
+            matching = [code for code, label in enumerate(vocabulary) if label == value]
+        return np.isin(codes, matching)
+
+    def averages(self) -> dict[str, float]:
+        """Corpus-wide mean of every scalar feature, ignoring missing values."""
+        return {
+            field: float(np.nanmean(column))
+            for field, column in self.scalars.items()
+            if len(column) and not np.isnan(column).all()
+        }
+
+    def matrix(self, fields: list[str]) -> NDArray:
+        """Stacks scalar and vector columns side by side into an (n, d) matrix."""
+        columns = []
+        for field in fields:
+            column = np.asarray(self.column(field), dtype=np.float64)
+            columns.append(column[:, None] if column.ndim == 1 else column)
+        return np.hstack(columns)
+
+    def nearest(
+        self, name: str, fields: list[str], k: int = 5
+    ) -> list[tuple[str, float]]:
+        """The k tracks closest to `name` over the z-scored `fields`."""
+        features = self.matrix(fields)
+        std = np.nanstd(features, axis=0)
+        features = np.nan_to_num(
+            (features - np.nanmean(features, axis=0)) / np.where(std > 0, std, 1.0)
+        )
+        distances = np.linalg.norm(features - features[self.index_of(name)], axis=1)
+        order = [i for i in np.argsort(distances) if self.names[i] != name][:k]
+        return [(str(self.names[i]), float(distances[i])) for i in order]
+
+    def to_records(self) -> dict[str, dict]:
+        """Dict-of-dicts in the same shape as audio_metadata.json."""
+        records = {}
+        for i, name in enumerate(self.names):
+            record = {}
+            for field in FIELD_KINDS:
+                if field in self.scalars:
+                    value = self.scalars[field][i].item()
+                    record[field] = None if value != value else value  # NaN -> None
+                elif field in self.vectors:
+                    row = self.vectors[field][i]
+                    if np.isnan(row).all() and len(row):
+                        record[field] = None
+                    elif field in self.vector_labels:
+                        record[field] = dict(
+                            zip(self.vector_labels[field], row.tolist())
+                        )
+                    else:
+                        record[field] = row.tolist()
+                elif field in self.categories:
+                    codes, vocabulary = self.categories[field]
+                    record[field] = vocabulary[codes[i]] if codes[i] >= 0 else None
+                elif field in self.text:
+                    record[field] = self.text[field][i]
+                else:
+                    record[field] = None
+            records[str(name)] = record
+        return records
+
+    def to_collection(self) -> AudioMetadataCollection:
+        return AudioMetadataCollection(
+            root={
+                name: AudioMetadata(**record)
+                for name, record in self.to_records().items()
+            }
+        )
+
+    def to_json(self, path: str) -> str:
+        """JSON export compatible with AudioPipeline.create_metadata_json."""
+        with open(path, "w") as f:
+            json.dump(self.to_records(), f, indent=4)
+        return path
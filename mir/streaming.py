@@ -0,0 +1,145 @@
+import logging
+from typing import Iterator, Optional
+import numpy as np
+from numpy.typing import NDArray
+import soundfile as sf
+import soxr
+
+logger = logging.getLogger(__name__)
+
+
+class RunningStats:
+    """Streaming per-dimension mean and (population) standard deviation.
+
+    Blocks of frames are merged with Chan et al.'s parallel update, so the result
+    matches np.mean/np.std over the concatenated frames without keeping them.
+    The same update run backwards takes a block out again. `width` fixes the
+    shape up front, so `mean` and `std` are arrays even before the first block.
+    """
+
+    def __init__(self, width: Optional[int] = None):
+        self.count = 0
+        self._mean: NDArray | float = 0.0 if width is None else np.zeros(width)
+        self._m2: NDArray | float = 0.0 if width is None else np.zeros(width)
+
+    def update(self, frames: NDArray) -> None:
+        """Adds a block of frames; the last axis is time."""
+        frames = np.asarray(frames, dtype=np.float64)
+        n = frames.shape[-1]
+        if n == 0:
+            return
+        block_mean = frames.mean(axis=-1)
+        block_m2 = ((frames - block_mean[..., None]) ** 2).sum(axis=-1)
+        total = self.count + n
+        delta = block_mean - self._mean
+        self._mean = self._mean + delta * (n / total)
+        self._m2 = self._m2 + block_m2 + delta**2 * (self.count * n / total)
+        self.count = total
+
+    def remove(self, frames: NDArray) -> None:
+        """Takes back a block of frames added earlier; the last axis is time."""
+        frames = np.asarray(frames, dtype=np.float64)
+        n = frames.shape[-1]
+        if n == 0:
+            return
+        remaining = self.count - n
+        if remaining <= 0:
+            self.count = 0
+            self._mean, self._m2 = self._mean * 0.0, self._m2 * 0.0
+            return
+        block_mean = frames.mean(axis=-1)
+        block_m2 = ((frames - block_mean[..., None]) ** 2).sum(axis=-1)
+        rest_mean = (self.count * self._mean - n * block_mean) / remaining
+        delta = block_mean - rest_mean
+        m2 = self._m2 - block_m2 - delta**2 * (remaining * n / self.count)
+        # Rounding can leave a tiny negative sum of squares
+        self._m2 = np.maximum(m2, 0.0)
+        self._mean = rest_mean
+        self.count = remaining
+
+    @property
+    def mean(self) -> NDArray | float:
+        return self._mean
+
+    @property
+    def std(self) -> NDArray | float:
+        # Zeros shaped like the statistics until something was added
+        return np.sqrt(self._m2 / self.count) if self.count else self._m2 * 0.0
+
+
+def stream_blocks(
+    path: str,
+    sampling_rate: int = 22050,
+    frame_length: int = 2048,
+    hop_length: int = 512,
+    block_length: int = 512,
+    read_size: int = 65536,
+) -> Iterator[NDArray]:
+    """Decodes an audio file into overlapping, analysis-ready mono blocks.
+
+    Like `librosa.stream`, each block holds `block_length` frames and consecutive
+    blocks overlap by `frame_length - hop_length` samples. Unlike it, the audio is
+    down-mixed and resampled on the fly (matching `librosa.load`), and the signal is
+    zero-padded by `frame_length // 2` on both ends so frame centres line up with a
+    centred STFT over the whole track. Only one block is ever held in memory.
+    """
+    block_samples = frame_length + (block_length - 1) * hop_length
+    advance = block_length * hop_length
+    pad = np.zeros(frame_length // 2, dtype=np.float32)
+
+    with sf.SoundFile(path) as audio:
+        resampler = None
+        if audio.samplerate != sampling_rate:
+            resampler = soxr.ResampleStream(
+                audio.samplerate, sampling_rate, 1, dtype="float32", quality="HQ"
+            )
+
+        def decoded() -> Iterator[NDArray]:
+            yield pad
+            while True:
+                chunk = audio.read(read_size, dtype="float32", always_2d=True)
+                last = len(chunk) < read_size
+                samples = chunk.mean(axis=1)
+                if resampler is not None:
+                    samples = resampler.resample_chunk(samples, last=last)
+                yield samples
+                if last:
+                    break
+            yield pad
+
+        buffer = np.zeros(0, dtype=np.float32)
+        for samples in decoded():
+            buffer = np.concatenate([buffer, samples])
+            while len(buffer) >= block_samples:
+                yield buffer[:block_samples]
+                buffer = buffer[advance:]
+        if len(buffer) >= frame_length:
+            yield buffer
+
+
+def chunked_tempogram(
+    onset_envelope: NDArray,
+    sampling_rate: int,
+    win_length: int = 384,
+    chunk_frames: int = 4096,
+) -> Iterator[NDArray]:
+    """Yields a centred `librosa.feature.tempogram` in column chunks.
+
+    The full tempogram is `win_length` times larger than the onset envelope, so it is
+    computed from the padded envelope a chunk of frames at a time.
+    """
+    # Imported here so the classifier can share RunningStats without loading librosa
+    import librosa
+
+    n = onset_envelope.shape[-1]
+    padded = np.pad(
+        onset_envelope, int(win_length // 2), mode="linear_ramp", end_values=[0, 0]
+    )
+    for start in range(0, n, chunk_frames):
+        stop = min(start + chunk_frames, n)
+        yield librosa.feature.tempogram(
+            onset_envelope=padded[start : stop + win_length - 1],
+            sr=sampling_rate,
+            win_length=win_length,
+            center=False,
+        )
@@ -0,0 +1,104 @@
+import os
+import logging
+import threading
+from os.path import join
+import soundfile as sf
+from mir.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+# Formats libsndfile can encode, mapped to (extension, soundfile format, subtype)
+FORMATS = {
+    "flac": ("flac", "FLAC", "PCM_16"),
+    "ogg": ("ogg", "OGG", "VORBIS"),
+}
+
+
+class TranscodeCache:
+    """Compressed copies of the music files, encoded on first request.
+
+    Copies are named after the source's size and mtime, so an edited track gets
+    a fresh encode and its old copy simply ages out. Once the directory grows
+    past `max_bytes`, the least recently served copies are deleted.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def path(self, source: str, format: str) -> str:
+        """Path of the encoded copy of `source`, transcoding it if needed.
+
+        Blocks while encoding, so call it from a worker thread.
+        """
+        extension, file_format, subtype = FORMATS[format]
+        stat = os.stat(source)
+        name = os.path.splitext(os.path.basename(source))[0]
+        target = join(
+            self.directory,
+            f"{name}.{stat.st_size:x}-{stat.st_mtime_ns:x}.{extension}",
+        )
+        # One encode per copy, even when several clients ask for it at once
+        with self._lock(target):
+            if os.path.exists(target):
+                self.stats["hits"] += 1
+                # Marks the copy as recently served, for eviction
+                os.utime(target)
+                return target
+            self.stats["misses"] += 1
+            os.makedirs(self.directory, exist_ok=True)
+            self._encode(
+                source=source, target=target, file_format=file_format, subtype=subtype
+            )
+        self._evict(keep=target)
+        return target
+
+    @timed("transcode.encode")
+    def _encode(self, source: str, target: str, file_format: str, subtype: str) -> None:
+        logger.info(f"Transcoding {source} to {file_format}")
+        partial = f"{target}.partial"
+        info = sf.info(source)
+        try:
+            with sf.SoundFile(
+                partial,
+                mode="w",
+                samplerate=info.samplerate,
+                channels=info.channels,
+                format=file_format,
+                subtype=subtype,
+            ) as out:
+                # Block-wise so long tracks never sit in memory whole
+                for block in sf.blocks(source, blocksize=1 << 16, always_2d=True):
+                    out.write(block)
+            # Readers only ever see a complete file
+            os.replace(partial, target)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _evict(self, keep: str) -> None:
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".partial"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Already evicted by another request, or (on Windows) still open
+                continue
+            total -= size
+            self.stats["evictions"] += 1
+
+    def _lock(self, target: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(target, threading.Lock())
@@ -0,0 +1,41 @@
+import os
+import json
+import pytest
+from mir.metadata_model import AudioMetadataCollection
+
+METADATA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "metadata", "audio_metadata.json"
+)
+# Labels and tempos the catalogue tests assert on, over real extracted records
+TRACKS = {
+    "Theme_Castle.wav": {
+        "key": "C Minor",
+        "mood": "tense",
+        "function": "theme,castle",
+        "tempo": 100,
+    },
+    "Theme_Overworld.wav": {
+        "key": "C Major",
+        "mood": "playful",
+        "function": "theme",
+        "tempo": 150,
+    },
+    "Effect_Coin.wav": {
+        "key": "A Minor",
+        "mood": "playful",
+        "function": "effect",
+        "tempo": 120,
+    },
+}
+
+
+@pytest.fixture(scope="session")
+def catalogue() -> AudioMetadataCollection:
+    with open(METADATA_PATH, "r") as f:
+        bundled = list(json.load(f).values())
+    return AudioMetadataCollection.validate_records(
+        {
+            name: {**record, **labels}
+            for (name, labels), record in zip(TRACKS.items(), bundled)
+        }
+    )
@@ -0,0 +1,82 @@
+import os
+import pytest
+from mir.cache import MetadataCache
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    directory = tmp_path / "music"
+    directory.mkdir()
+    for name in ("a.wav", "b.wav"):
+        (directory / name).write_bytes(name.encode() * 100)
+    return directory
+
+
+def make_cache(tmp_path, music_dir, version="1") -> MetadataCache:
+    return MetadataCache(
+        manifest_path=str(tmp_path / "manifest.json"),
+        music_dir=str(music_dir),
+        extractor_version=version,
+    )
+
+
+def commit_and_save(cache: MetadataCache, names: list[str]) -> None:
+    cache.commit(names=names)
+    cache.save()
+
+
+def test_new_files_are_stale(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir)
+    fresh, stale, removed = cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    assert (fresh, stale, removed) == ([], ["a.wav", "b.wav"], [])
+
+
+def test_unchanged_files_are_fresh_and_modified_ones_stale(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir)
+    cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    commit_and_save(cache, ["a.wav", "b.wav"])
+
+    (music_dir / "b.wav").write_bytes(b"changed")
+    cache = make_cache(tmp_path, music_dir)
+    cached = {"a.wav": {}, "b.wav": {}}
+    assert cache.partition(["a.wav", "b.wav"], cached) == (["a.wav"], ["b.wav"], [])
+
+
+def test_version_bump_makes_every_file_stale(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir, version="1")
+    cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    commit_and_save(cache, ["a.wav", "b.wav"])
+
+    cache = make_cache(tmp_path, music_dir, version="2")
+    cached = {"a.wav": {}, "b.wav": {}}
+    assert cache.partition(["a.wav", "b.wav"], cached) == ([], ["a.wav", "b.wav"], [])
+
+
+def test_only_tracks_a_manifest_recorded_are_pruned(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir)
+    cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    commit_and_save(cache, ["a.wav", "b.wav"])
+
+    os.remove(music_dir / "b.wav")
+    cache = make_cache(tmp_path, music_dir)
+    # shipped.wav has metadata but never had audio or a manifest entry
+    cached = {"a.wav": {}, "b.wav": {}, "shipped.wav": {}}
+    assert cache.partition(["a.wav"], cached) == (["a.wav"], [], ["b.wav"])
+
+
+def test_missing_manifest_is_bootstrapped_from_metadata(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir)
+    cached = {"a.wav": {}, "shipped.wav": {}}
+    fresh, stale, removed = cache.partition(["a.wav", "b.wav"], cached)
+    assert (fresh, stale, removed) == (["a.wav"], ["b.wav"], [])
+    assert cache.bootstrapped
+    assert set(cache.entries) == {"a.wav"}
+
+
+def test_catalogue_digest_follows_file_contents(tmp_path, music_dir):
+    cache = make_cache(tmp_path, music_dir)
+    cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    before = cache.catalogue_digest()
+    (music_dir / "a.wav").write_bytes(b"changed")
+    cache.partition(["a.wav", "b.wav"], cached_metadata={})
+    assert cache.catalogue_digest() != before
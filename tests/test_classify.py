@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from mir.classify import (
+    KNN,
+    MOOD_FEATURES,
+    AudioClassifier,
+    track_function,
+)
+
+
+def tracks(start: int, stop: int, seed: int = 0) -> dict[str, dict]:
+    rng = np.random.default_rng(seed)
+    features = rng.normal(size=(stop, len(MOOD_FEATURES)))
+    return {
+        f"Effect_{i}.wav": dict(zip(MOOD_FEATURES, features[i].tolist()))
+        for i in range(start, stop)
+    }
+
+
+def rebuilt_moods(audio_metadata: dict) -> dict[str, str]:
+    copies = {name: dict(data) for name, data in audio_metadata.items()}
+    return AudioClassifier(audio_metadata=copies).moods
+
+
+def expected_changes(before: dict, after: dict) -> dict:
+    return {
+        name: (mood, after[name])
+        for name, mood in before.items()
+        if name in after and after[name] != mood
+    }
+
+
+def test_add_reports_exactly_the_relabelled_tracks():
+    classifier = AudioClassifier(audio_metadata=tracks(0, 150))
+    before = classifier.moods
+    changes = classifier.add(audio_metadata=tracks(150, 200))
+    after = classifier.moods
+    assert after == rebuilt_moods(tracks(0, 200))
+    assert changes == expected_changes(before, after)
+    # 50 tracks moving the averages should relabel some of the first 150
+    assert changes
+
+
+def test_remove_reports_relabelled_and_removed_tracks():
+    classifier = AudioClassifier(audio_metadata=tracks(0, 200))
+    before = classifier.moods
+    removed = [f"Effect_{i}.wav" for i in range(0, 200, 4)]
+    changes = classifier.remove(names=removed + ["Unknown.wav"])
+    after = classifier.moods
+    remaining = {
+        name: data for name, data in tracks(0, 200).items() if name not in removed
+    }
+    assert after == rebuilt_moods(remaining)
+    assert changes == {
+        **expected_changes(before, after),
+        **{name: (before[name], None) for name in removed},
+    }
+
+
+def test_replacing_a_track_reports_its_own_change():
+    classifier = AudioClassifier(audio_metadata=tracks(0, 100))
+    name = "Effect_0.wav"
+    old = classifier.moods[name]
+    assert old != "mysterious"
+    # Far below the average energy and complexity
+    replacement = {name: dict(zip(MOOD_FEATURES, [-5.0, -5.0, -5.0, 0.0]))}
+    changes = classifier.add(audio_metadata=replacement)
+    assert classifier.moods[name] == "mysterious" == replacement[name]["mood"]
+    assert changes[name] == (old, "mysterious")
+    assert len(classifier) == 100
+
+
+def test_knn_never_relabels_existing_tracks():
+    classifier = AudioClassifier(audio_metadata=tracks(0, 150), model=KNN)
+    before = classifier.moods
+    assert classifier.add(audio_metadata=tracks(150, 200)) == {}
+    assert {name: classifier.moods[name] for name in before} == before
+
+
+def test_unknown_model_is_rejected():
+    with pytest.raises(ValueError):
+        AudioClassifier(model="forest")
+
+
+@pytest.mark.parametrize(
+    "name, function",
+    [
+        ("Theme_Castle(Hurry).wav", "background,hurry"),
+        ("Complete_Level.wav", "victory"),
+        ("Effect_Lost_Life.wav", "game_over,effect"),
+        ("Jingle.wav", ""),
+    ],
+)
+def test_track_function(name, function):
+    assert track_function(name) == function
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+from llm.concurrency import ConcurrencyLimiter
+
+
+def test_stalled_stream_times_out_closes_and_frees_the_slot():
+    closed = []
+
+    async def stalled():
+        try:
+            yield "first"
+            await asyncio.sleep(60)
+            yield "never"
+        finally:
+            closed.append(True)
+
+    async def consume(limiter):
+        chunks = []
+        with pytest.raises(TimeoutError):
+            async for chunk in limiter.stream(stalled()):
+                chunks.append(chunk)
+        return chunks
+
+    limiter = ConcurrencyLimiter(max_concurrency=1, timeout=0.1)
+    chunks = asyncio.run(asyncio.wait_for(consume(limiter), 5))
+    assert chunks == ["first"]
+    assert closed == [True]
+    assert limiter.active == 0 and not limiter._semaphore.locked()
+
+
+def test_stream_passes_every_chunk_through():
+    async def chunks():
+        for chunk in ("a", "b", "c"):
+            yield chunk
+
+    async def consume():
+        limiter = ConcurrencyLimiter(timeout=1.0)
+        return [chunk async for chunk in limiter.stream(chunks())]
+
+    assert asyncio.run(consume()) == ["a", "b", "c"]
@@ -0,0 +1,72 @@
+import math
+import pytest
+from llm.filters import MetadataFilter, MetadataIndex
+
+
+@pytest.fixture(scope="module")
+def index(catalogue):
+    return MetadataIndex(collection=catalogue)
+
+
+def test_parses_keys_without_reading_them_as_modes(index):
+    assert index.parse("Songs in C Major").equals == {"key": {"C Major"}}
+    assert index.parse("Songs in A# minor").equals == {"key": {"A# Minor"}}
+    # Lowercase "a major" is the article, so only the mode is meant
+    assert index.parse("Is there a major track?").equals == {"mode": {"Major"}}
+
+
+def test_parses_labels_and_plurals(index):
+    metadata_filter = index.parse("playful effects")
+    assert metadata_filter.equals == {"mood": {"playful"}, "function": {"effect"}}
+    assert index.filter(metadata_filter) == ["Effect_Coin.wav"]
+    assert index.parse("tell me a joke") is None
+
+
+def test_unknown_values_are_reported(index):
+    metadata_filter = index.parse("tracks in A# Minor or C Minor")
+    assert metadata_filter.equals == {"key": {"A# Minor", "C Minor"}}
+    assert index.unknown_values(metadata_filter) == {"key": {"A# Minor"}}
+    assert index.filter(metadata_filter) == ["Theme_Castle.wav"]
+
+
+@pytest.mark.parametrize(
+    "query, strict, names",
+    [
+        ("tempo above 120", {("tempo", "low")}, ["Theme_Overworld.wav"]),
+        ("tempo of at least 120", set(), ["Theme_Overworld.wav", "Effect_Coin.wav"]),
+        ("under 120 bpm", {("tempo", "high")}, ["Theme_Castle.wav"]),
+        (
+            "between 100 and 120 bpm",
+            set(),
+            ["Theme_Castle.wav", "Effect_Coin.wav"],
+        ),
+    ],
+)
+def test_range_bounds(index, query, strict, names):
+    metadata_filter = index.parse(query)
+    assert metadata_filter.strict == frozenset(strict)
+    assert index.filter(metadata_filter) == names
+
+
+def test_strict_bound_excludes_the_number_itself(index):
+    low, high = index.parse("tempo above 120").ranges["tempo"]
+    assert low == math.nextafter(120.0, math.inf) and high is None
+
+
+@pytest.mark.parametrize(
+    "query, negated",
+    [
+        ("tracks that are not effects", True),
+        ("everything except themes", True),
+        ("songs without bass", True),
+        ("which tracks aren't playful", True),
+        ("notable castle themes", False),
+        ("which tracks are playful", False),
+    ],
+)
+def test_negation(query, negated):
+    assert MetadataIndex.negated(query) is negated
+
+
+def test_empty_filter_returns_the_whole_catalogue(index):
+    assert index.filter(MetadataFilter(equals={}, ranges={})) == index.names
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from mir.fingerprint import (
+    SAMPLING_RATE,
+    FingerprintIndex,
+    reference_fingerprint,
+)
+
+
+def melody(seed: int, seconds: float = 20.0) -> np.ndarray:
+    """A sequence of random tones, different enough per seed to tell tracks apart."""
+    rng = np.random.default_rng(seed)
+    note = int(0.25 * SAMPLING_RATE)
+    t = np.arange(note) / SAMPLING_RATE
+    notes = [
+        np.sin(2 * np.pi * frequency * t) * np.hanning(note)
+        for frequency in rng.uniform(200, 2000, int(seconds / 0.25))
+    ]
+    return (0.5 * np.concatenate(notes)).astype(np.float32)
+
+
+@pytest.fixture(scope="module")
+def tracks():
+    return {f"track_{seed}.wav": melody(seed) for seed in range(3)}
+
+
+@pytest.fixture(scope="module")
+def index(tracks):
+    return FingerprintIndex.from_fingerprints(
+        {name: reference_fingerprint(waveform) for name, waveform in tracks.items()}
+    )
+
+
+def test_clean_clip_is_identified_with_its_offset(tracks, index):
+    start = int(7.3 * SAMPLING_RATE)
+    clip = tracks["track_1.wav"][start : start + 5 * SAMPLING_RATE]
+    match = index.identify(clip)
+    assert match is not None
+    assert match.name == "track_1.wav"
+    assert match.offset_seconds == pytest.approx(7.3, abs=0.05)
+    assert match.confidence > 0.5
+
+
+def test_unrelated_audio_is_not_identified(index):
+    noise = np.random.default_rng(99).standard_normal(5 * SAMPLING_RATE)
+    assert index.identify(noise.astype(np.float32)) is None
+
+
+def test_save_overwrites_in_place(tmp_path, index, tracks):
+    path = str(tmp_path / "fingerprints")
+    index.save(path, settings={"catalogue": "old"})
+    smaller = FingerprintIndex.from_fingerprints(
+        {"track_0.wav": reference_fingerprint(tracks["track_0.wav"])}
+    )
+    smaller.save(path, settings={"catalogue": "new"})
+    assert list(FingerprintIndex.load(path).names) == ["track_0.wav"]
+    assert FingerprintIndex.manifest(path)["settings"] == {"catalogue": "new"}
@@ -0,0 +1,76 @@
+import pytest
+from llm.filters import MetadataIndex
+from llm.intent import COUNT, GREETING, LIST, LOOKUP, OPEN, IntentRouter
+
+
+@pytest.fixture(scope="module")
+def router(catalogue):
+    return IntentRouter(
+        collection=catalogue, metadata_index=MetadataIndex(collection=catalogue)
+    )
+
+
+def reply(router, query):
+    return router.answer(router.classify(query))
+
+
+def test_count_of_one_track_is_singular(router):
+    intent = router.classify("How many tracks are in C Major?")
+    assert (intent.intent, intent.names) == (COUNT, ["Theme_Overworld.wav"])
+    assert router.answer(intent) == f"{GREETING} I have 1 track with key C Major."
+
+
+def test_listing_is_pluralised(router):
+    assert reply(router, "List the effects") == (
+        f"{GREETING} Here is the 1 track with function effect:\n- Effect_Coin.wav"
+    )
+    assert reply(router, "List all playful tracks").startswith(
+        f"{GREETING} Here are the 2 tracks with mood playful:"
+    )
+
+
+def test_key_outside_the_catalogue_has_no_matches(router):
+    intent = router.classify("List the tracks in A# Minor")
+    assert (intent.intent, intent.names) == (LIST, [])
+    assert router.answer(intent) == (
+        f"{GREETING} I don't have any tracks with key A# Minor."
+    )
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "List the tracks that are not effects",
+        "Which tracks except the themes are playful?",
+        "How many tracks aren't in C Minor?",
+        "Which track sounds most tense?",
+    ],
+)
+def test_negated_and_open_questions_go_to_the_llm(router, query):
+    assert router.classify(query).intent == OPEN
+
+
+def test_strict_bound_is_described_and_applied(router):
+    intent = router.classify("Which tracks have a tempo above 120 bpm?")
+    assert intent.names == ["Theme_Overworld.wav"]
+    assert "with tempo above 120" in router.answer(intent)
+    assert router.classify("Which tracks have a tempo of at least 120 bpm?").names == [
+        "Theme_Overworld.wav",
+        "Effect_Coin.wav",
+    ]
+
+
+def test_lookup_answers_from_the_collection(router):
+    intent = router.classify("What is the tempo of Effect_Coin?")
+    assert (intent.intent, intent.names, intent.fields) == (
+        LOOKUP,
+        ["Effect_Coin.wav"],
+        ["tempo"],
+    )
+    assert "The tempo of Effect_Coin.wav is 120 BPM." in router.answer(intent)
+
+
+def test_inclusive_bounds_are_not_superlatives(router):
+    intent = router.classify("Which tracks have a tempo of at most 120 bpm?")
+    assert intent.names == ["Theme_Castle.wav", "Effect_Coin.wav"]
+    assert "with tempo of 120 or less" in router.answer(intent)
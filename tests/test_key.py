@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from mir.key import KEYS, MAJOR_PROFILE, MINOR_PROFILE, PITCHES, KeyEstimator
+
+
+def baseline_detect_key(chromagram: np.ndarray) -> tuple[str, dict[str, float]]:
+    """AudioProcessor._detect_key as it was before KeyEstimator, plus its scores."""
+    chroma_vals = [np.sum(chromagram[i]) for i in range(12)]
+    key_freq = {PITCHES[i]: chroma_vals[i] for i in range(12)}
+    correlations_maj, correlations_min = [], []
+    for i in range(12):
+        estimated_key = [key_freq.get(PITCHES[(i + m) % 12]) for m in range(12)]
+        correlations_maj.append(
+            round(np.corrcoef(list(MAJOR_PROFILE), estimated_key)[1, 0], 3)
+        )
+        correlations_min.append(
+            round(np.corrcoef(list(MINOR_PROFILE), estimated_key)[1, 0], 3)
+        )
+    key_dict = {
+        **{KEYS[i]: correlations_maj[i] for i in range(12)},
+        **{KEYS[i + 12]: correlations_min[i] for i in range(12)},
+    }
+    return max(key_dict, key=key_dict.get), key_dict
+
+
+@pytest.fixture(scope="module")
+def chromagrams() -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    random = [rng.random((12, 40)) for _ in range(200)]
+    # Profile-shaped chroma with noise, so every key is the answer somewhere
+    shaped = [
+        np.roll(profile, shift)[:, None] + rng.random((12, 40))
+        for profile in (MAJOR_PROFILE, MINOR_PROFILE)
+        for shift in range(12)
+    ]
+    return random + shaped
+
+
+def test_matches_the_baseline_estimator(chromagrams):
+    estimator = KeyEstimator()
+    estimate = estimator.estimate(np.stack([c.sum(axis=1) for c in chromagrams]))
+    for chromagram, key, correlations in zip(
+        chromagrams, estimate.keys, estimate.correlations
+    ):
+        baseline_key, baseline_scores = baseline_detect_key(chromagram)
+        assert key == baseline_key
+        np.testing.assert_allclose(
+            correlations, [baseline_scores[k] for k in KEYS], atol=1e-3
+        )
+
+
+def test_single_vector_and_confidence():
+    estimate = KeyEstimator().estimate(np.roll(MINOR_PROFILE, 9))
+    assert estimate.keys == ["A Minor"]
+    assert estimate.confidence > 0
+
+
+def test_windows_match_per_window_estimates():
+    rng = np.random.default_rng(1)
+    chromagram = rng.random((12, 100))
+    estimator = KeyEstimator()
+    windows = estimator.estimate_windows(chromagram, window=30, hop=20)
+    expected = [
+        estimator.estimate(chromagram[:, start : start + 30].sum(axis=1)).keys[0]
+        for start in range(0, 71, 20)
+    ]
+    assert windows.keys == expected
@@ -0,0 +1,41 @@
+import os
+import json
+import pytest
+from pydantic import ValidationError
+from mir.metadata_model import AudioMetadataCollection
+
+
+METADATA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "metadata", "audio_metadata.json"
+)
+
+
+@pytest.fixture
+def saved(tmp_path):
+    with open(METADATA_PATH, "r") as f:
+        bundled = list(json.load(f).values())
+    records = {
+        "a.wav": {**bundled[0], "tempo": 120},
+        "b.wav": bundled[1],
+        "broken.wav": {**bundled[2], "tempo": "fast"},
+    }
+    path = tmp_path / "metadata.json"
+    path.write_text(json.dumps(records))
+    return str(path)
+
+
+def test_open_validates_tracks_only_on_access(saved):
+    collection = AudioMetadataCollection.open(saved)
+    assert len(collection) == 3 and "broken.wav" in collection
+    assert collection["a.wav"].tempo == 120
+    assert collection["a.wav"] is collection["a.wav"]
+    with pytest.raises(ValidationError):
+        collection["broken.wav"]
+
+
+def test_materialize_matches_load(tmp_path, saved):
+    valid = AudioMetadataCollection.validate_records(json.loads(open(saved).read()))
+    path = valid.save(str(tmp_path / "valid.json"))
+    assert AudioMetadataCollection.open(path).materialize() == (
+        AudioMetadataCollection.load(path)
+    )
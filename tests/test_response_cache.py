@@ -0,0 +1,64 @@
+import types
+import pytest
+from llm import response_cache
+from llm.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(
+        response_cache, "time", types.SimpleNamespace(monotonic=lambda: now.value)
+    )
+    return now
+
+
+def test_exact_hit_ignores_case_spacing_and_punctuation(clock):
+    cache = ResponseCache()
+    cache.put("Which tracks are in C Major?", {"answer": "two"}, latency=1.5)
+    assert cache.get_exact("  which tracks are in c major ") == {"answer": "two"}
+    assert cache.get_exact("which tracks are in C minor") is None
+    assert cache.stats["exact_hits"] == 1
+    assert cache.stats["saved_seconds"] == 1.5
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(ttl=60)
+    cache.put("q", {"answer": 1}, latency=1.0, vector=[1.0, 0.0])
+    clock.value += 59
+    assert cache.get_exact("q") == {"answer": 1}
+    clock.value += 2
+    assert cache.get_exact("q") is None
+    assert cache.get_similar([1.0, 0.0]) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", {"answer": "a"}, latency=0.0)
+    cache.put("b", {"answer": "b"}, latency=0.0)
+    # Reading "a" makes "b" the least recently used
+    cache.get_exact("a")
+    cache.put("c", {"answer": "c"}, latency=0.0)
+    assert cache.get_exact("b") is None
+    assert cache.get_exact("a") == {"answer": "a"}
+    assert cache.get_exact("c") == {"answer": "c"}
+
+
+def test_semantic_hit_needs_the_threshold(clock):
+    cache = ResponseCache(threshold=0.95)
+    cache.put("fast tracks", {"answer": "fast"}, latency=0.0, vector=[1.0, 0.0])
+    cache.put("slow tracks", {"answer": "slow"}, latency=0.0, vector=[0.0, 1.0])
+    # cos = 0.98 and 0.8 against the first question
+    assert cache.get_similar([0.98, 0.199]) == {"answer": "fast"}
+    assert cache.get_similar([0.8, 0.6]) is None
+    assert cache.stats["semantic_hits"] == 1 and cache.stats["misses"] == 1
+
+
+def test_version_change_drops_everything(clock):
+    cache = ResponseCache(version="v1")
+    cache.put("q", {"answer": 1}, latency=0.0)
+    cache.validate("v1")
+    assert len(cache) == 1
+    cache.validate("v2")
+    assert len(cache) == 0 and cache.version == "v2"
@@ -0,0 +1,51 @@
+import os
+import pytest
+from mir.metadata_model import AudioMetadataCollection
+from mir.store import FeatureStore
+
+METADATA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "metadata", "audio_metadata.json"
+)
+
+
+@pytest.fixture(scope="module")
+def collection():
+    return AudioMetadataCollection.load(METADATA_PATH)
+
+
+def test_save_round_trips(tmp_path, collection):
+    path = str(tmp_path / "store")
+    FeatureStore.from_collection(collection, settings={"catalogue": "a"}).save(path)
+    store = FeatureStore.load(path)
+    assert list(store.names) == list(collection.keys())
+    assert FeatureStore.manifest(path)["settings"] == {"catalogue": "a"}
+
+
+def test_overwrite_swaps_the_directory(tmp_path, collection):
+    path = str(tmp_path / "store")
+    FeatureStore.from_collection(collection, settings={"catalogue": "old"}).save(path)
+    old = FeatureStore.load(path, mmap=True)
+    old_names = list(old.names)
+
+    smaller = AudioMetadataCollection(root=dict(list(collection.root.items())[:3]))
+    FeatureStore.from_collection(smaller, settings={"catalogue": "new"}).save(path)
+
+    # A reader that mapped the old columns still sees them intact
+    assert list(old.names) == old_names
+    assert len(FeatureStore.load(path)) == 3
+    assert FeatureStore.manifest(path)["settings"] == {"catalogue": "new"}
+    assert os.listdir(tmp_path) == ["store"]
+
+
+def test_failed_save_keeps_the_previous_store(tmp_path, collection, monkeypatch):
+    path = str(tmp_path / "store")
+    FeatureStore.from_collection(collection).save(path)
+
+    def fail(self, path):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(FeatureStore, "_write", fail)
+    with pytest.raises(OSError):
+        FeatureStore.from_collection(collection).save(path)
+    assert len(FeatureStore.load(path)) == len(collection.root)
+    assert os.listdir(tmp_path) == ["store"]
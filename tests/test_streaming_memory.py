@@ -0,0 +1,33 @@
+import os
+import pytest
+from benchmarks.streaming_memory import peak_megabytes, write_long_wav
+from mir.process import extract_features_streaming
+
+# A whole tempogram chunk is 4096 frames (~95 s), so both tracks span several
+# chunks and only per-frame state can make the longer one cost more
+SHORT_MINUTES, LONG_MINUTES = 2, 4
+# Onset envelopes for beat tracking grow by ~0.2 MB a minute; anything
+# chunk-sized leaking between iterations shows up as several MB
+MAX_MB_PER_MINUTE = 1.0
+
+
+@pytest.fixture(scope="module")
+def music_dir(tmp_path_factory):
+    music_dir = tmp_path_factory.mktemp("music")
+    for minutes in (SHORT_MINUTES, LONG_MINUTES):
+        write_long_wav(
+            path=os.path.join(music_dir, f"{minutes}min.wav"), seconds=minutes * 60
+        )
+    # Filter banks and JIT caches are built on first use
+    write_long_wav(path=os.path.join(music_dir, "warmup.wav"), seconds=5)
+    extract_features_streaming(file="warmup.wav", music_dir=str(music_dir))
+    return str(music_dir)
+
+
+def test_streaming_peak_does_not_grow_with_duration(music_dir):
+    short_peak, long_peak = (
+        peak_megabytes(extract_features_streaming, f"{minutes}min.wav", music_dir)
+        for minutes in (SHORT_MINUTES, LONG_MINUTES)
+    )
+    slope = (long_peak - short_peak) / (LONG_MINUTES - SHORT_MINUTES)
+    assert slope < MAX_MB_PER_MINUTE, f"{short_peak:.1f} MB -> {long_peak:.1f} MB"
@@ -0,0 +1,86 @@
+import asyncio
+import numpy as np
+import pytest
+import soundfile as sf
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.web import GeminiApp
+
+
+@pytest.fixture
+def music_dir(tmp_path):
+    directory = tmp_path / "music"
+    directory.mkdir()
+    tone = 0.3 * np.sin(2 * np.pi * 440 * np.arange(22050) / 22050)
+    sf.write(directory / "Tone.wav", tone, 22050)
+    # Outside the music directory, but reachable with "../"
+    (tmp_path / "secret.txt").write_text("secret")
+    return directory
+
+
+@pytest.fixture
+def app(tmp_path, music_dir):
+    return GeminiApp(
+        api_key="unused",
+        audio_metadata_path=str(tmp_path / "unused.json"),
+        music_dir=str(music_dir),
+        transcode_dir=str(tmp_path / "transcodes"),
+    )
+
+
+@pytest.fixture
+def client(app):
+    # No lifespan, so no GeminiClient: /tracks only needs the music directory
+    return TestClient(app.app)
+
+
+def test_full_track_has_validators(client, music_dir):
+    response = client.get("/tracks/Tone.wav")
+    assert response.status_code == 200
+    assert response.content == (music_dir / "Tone.wav").read_bytes()
+    assert response.headers["content-type"] == "audio/wav"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "etag" in response.headers and "last-modified" in response.headers
+
+
+def test_range_request_returns_partial_content(client, music_dir):
+    size = (music_dir / "Tone.wav").stat().st_size
+    response = client.get("/tracks/Tone.wav", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{size}"
+    assert response.content == (music_dir / "Tone.wav").read_bytes()[100:200]
+
+
+@pytest.mark.parametrize("weak", [False, True])
+def test_matching_etag_is_not_modified(client, weak):
+    etag = client.head("/tracks/Tone.wav").headers["etag"]
+    response = client.get(
+        "/tracks/Tone.wav",
+        headers={"If-None-Match": f"W/{etag}" if weak else etag},
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+
+def test_changed_etag_is_served_again(client):
+    response = client.get("/tracks/Tone.wav", headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "name", ["..%2Fsecret.txt", "%2E%2E%2Fsecret.txt", "Missing.wav", "..", "."]
+)
+def test_names_outside_the_catalogue_are_not_found(client, name):
+    assert client.get(f"/tracks/{name}").status_code == 404
+
+
+@pytest.mark.parametrize("name", ["../secret.txt", "../music/Tone.wav"])
+def test_handler_rejects_paths_the_router_would_not_pass(app, name):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(app.track_file(name=name, request=None))
+    assert error.value.status_code == 404
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/tracks/Tone.wav?format=mp3").status_code == 400